@@ -27,3 +27,28 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
             detail="Invalid API Key"
         )
     return api_key_header
+
+
+ADMIN_KEY_NAME = "x-admin-key"
+admin_key_header = APIKeyHeader(name=ADMIN_KEY_NAME, auto_error=False)
+
+# Keys for the /admin endpoints (comma-separated). Unset means the admin API is disabled.
+ADMIN_API_KEYS = {key.strip() for key in os.environ.get("ADMIN_API_KEYS", "").split(",") if key.strip()}
+
+async def get_admin_key(admin_key_header: str = Security(admin_key_header)):
+    if not ADMIN_API_KEYS:
+        raise HTTPException(
+            status_code=403,
+            detail="Admin API is disabled (set ADMIN_API_KEYS)"
+        )
+    if not admin_key_header:
+        raise HTTPException(
+            status_code=401,
+            detail="Missing Admin Key"
+        )
+    if admin_key_header not in ADMIN_API_KEYS:
+        raise HTTPException(
+            status_code=403,
+            detail="Invalid Admin Key"
+        )
+    return admin_key_header
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+import tarfile
+import traceback
+import zipfile
+
+from fastapi import UploadFile
+
+from .models import BatchItemResponse
+from .utils import hash_upload, load_bytes, load_upload
+from .inference_pool import inference_pool
+from .pipeline import AnalysisError, analyze_clip, cached_response
+
+# Items analysed at once per batch request (defaults to one per inference worker)
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", max(inference_pool.workers, 1)))
+# Upper bound on files (including archive members) accepted in one batch request
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 1000))
+# Largest archive member read, uncompressed; bigger members fail without being inflated (zip bombs)
+BATCH_MAX_MEMBER_BYTES = int(os.environ.get("BATCH_MAX_MEMBER_BYTES", 200 * 1024 * 1024))
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def _is_zip(upload: UploadFile) -> bool:
+    head = upload.file.read(4)
+    upload.file.seek(0)
+    return head == b"PK\x03\x04"
+
+
+def _is_tar(upload: UploadFile) -> bool:
+    return (upload.filename or "").lower().endswith(TAR_SUFFIXES)
+
+
+def _read_member(stream, name: str):
+    """An archive member's bytes, or a ValueError if it inflates past BATCH_MAX_MEMBER_BYTES."""
+    with stream:
+        # Sizes in archive headers can lie, so the read itself is bounded
+        data = stream.read(BATCH_MAX_MEMBER_BYTES + 1)
+    if len(data) > BATCH_MAX_MEMBER_BYTES:
+        return ValueError(f"{name} is larger than {BATCH_MAX_MEMBER_BYTES} bytes uncompressed")
+    return data
+
+
+def iter_batch_items(uploads):
+    """
+    Yields (filename, payload) for every clip in the request. payload is the UploadFile
+    itself for plain uploads, the member's bytes for zip/tar archives, or a ValueError
+    for a member over the size limit. Members are read one at a time, when the caller
+    asks for the next item; the reads block, so callers advance this off the event loop.
+    """
+    for upload in uploads:
+        if _is_zip(upload):
+            with zipfile.ZipFile(upload.file) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        yield info.filename, _read_member(archive.open(info), info.filename)
+        elif _is_tar(upload):
+            with tarfile.open(fileobj=upload.file, mode="r:*") as archive:
+                for member in archive:
+                    if member.isfile():
+                        yield member.name, _read_member(archive.extractfile(member), member.name)
+        else:
+            yield upload.filename, upload
+
+
+async def _analyze_item(index: int, filename: str, payload, language, profile=None,
+                        max_seconds=None, explain=None) -> BatchItemResponse:
+    try:
+        if isinstance(payload, ValueError):
+            raise payload
+        if isinstance(payload, bytes):
+            audio_hash = await asyncio.to_thread(lambda: hashlib.sha256(payload).hexdigest())
+        else:
+            audio_hash = await asyncio.to_thread(hash_upload, payload)
+
+        response = await asyncio.to_thread(cached_response, audio_hash, language, profile, max_seconds, explain)
+        if response is None:
+            if isinstance(payload, bytes):
+                source, decode_path = await asyncio.to_thread(load_bytes, payload, filename)
+            else:
+                source, decode_path = await asyncio.to_thread(load_upload, payload)
+            response = await analyze_clip(source, decode_path, audio_hash, language, profile, max_seconds,
+                                          explain)
+
+        return BatchItemResponse(index=index, filename=filename, **response.model_dump())
+
+    except AnalysisError as e:
+        return BatchItemResponse(index=index, filename=filename, status="error", message=e.message)
+    except ValueError as e:
+        return BatchItemResponse(index=index, filename=filename, status="error", message=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        return BatchItemResponse(index=index, filename=filename, status="error",
+                                 message=f"Unexpected error: {str(e)}")
+
+
+async def stream_batch(uploads, language, profile=None, max_seconds=None, explain=None):
+    """
+    Analyses every item concurrently and yields one NDJSON line per item,
+    in completion order. At most BATCH_CONCURRENCY items are in memory or in flight.
+    profile must already be validated with get_classifier (None means the default);
+    max_seconds is the resolved per-item analysis budget; explain must be validated with check_explain.
+    """
+    results = asyncio.Queue()
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_item(index, filename, payload):
+        try:
+            line = await _analyze_item(index, filename, payload, language, profile, max_seconds, explain)
+        finally:
+            limit.release()
+        await results.put(line)
+
+    async def produce():
+        tasks = []
+        index = -1
+        items = iter_batch_items(uploads)
+        try:
+            while True:
+                # Archive members are inflated in a thread, never on the event loop
+                item = await asyncio.to_thread(next, items, None)
+                if item is None:
+                    break
+                index, (filename, payload) = index + 1, item
+                if index >= BATCH_MAX_ITEMS:
+                    await results.put(BatchItemResponse(
+                        index=index, filename=filename, status="error",
+                        message=f"Batch limit of {BATCH_MAX_ITEMS} items exceeded; remaining items skipped"
+                    ))
+                    break
+                await limit.acquire()
+                tasks.append(asyncio.create_task(run_item(index, filename, payload)))
+        except Exception as e:
+            # A corrupt archive fails only the items that could not be read
+            await results.put(BatchItemResponse(
+                index=index + 1, status="error", message=f"Could not read batch item: {str(e)}"
+            ))
+        finally:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await results.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            line = await results.get()
+            if line is None:
+                break
+            yield line.model_dump_json(exclude_none=True) + "\n"
+    finally:
+        producer.cancel()
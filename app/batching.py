@@ -0,0 +1,103 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# A batch is scored as soon as it holds BATCH_MAX_SIZE vectors, or when the
+# oldest vector has waited BATCH_MAX_WAIT_MS, whichever comes first.
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 16))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 5))
+
+
+class MicroBatcher:
+    """
+    Collects feature vectors from concurrent requests and scores them together.
+    score_fn receives an (n, n_features) matrix and returns one result per row. When any
+    queued vector carries an option, score_fn is called as score_fn(X, options) with one
+    option (or None) per row.
+    Scoring runs on a dedicated thread so the event loop stays free.
+    """
+
+    def __init__(self, score_fn, max_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.score_fn = score_fn
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-scoring")
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size = 0
+        self.batch_size_counts = {}
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    async def submit(self, features, option=None):
+        """Queues one feature vector (with an optional per-row option) and waits for its scored result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, option, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._score(batch))
+
+    async def _score(self, batch):
+        started = time.perf_counter()
+        self._record(batch, started)
+
+        X = np.vstack([features for features, _, _, _ in batch])
+        options = [option for _, option, _, _ in batch]
+        args = (X, options) if any(option is not None for option in options) else (X,)
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self.score_fn, *args)
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future, _), result in zip(batch, results):
+            # The caller may have gone away (client disconnect) while we were scoring
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, batch, started):
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+        for _, _, _, enqueued in batch:
+            wait = started - enqueued
+            self.total_wait += wait
+            self.max_wait_seen = max(self.max_wait_seen, wait)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "largest_batch": self.max_batch_size,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "mean_wait_ms": round(1000.0 * self.total_wait / self.items, 3) if self.items else 0.0,
+            "max_wait_seen_ms": round(1000.0 * self.max_wait_seen, 3),
+        }
@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from .feature_extractor import PROFILES, DEFAULT_PROFILE
+
+# In-memory entries kept (least recently used are evicted first)
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 1024))
+# Seconds a cached result stays valid; 0 disables expiry
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 24 * 3600))
+# Optional directory for a persistent tier that survives restarts
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") or None
+# Seconds a namespace's disk tier is kept after it was last written. Pre-fork workers and
+# processes in the middle of a reload share the directory while serving different versions,
+# so another namespace is only removed once nobody has written to it for this long.
+NAMESPACE_GRACE_SECONDS = float(os.environ.get("RESULT_CACHE_NAMESPACE_GRACE", 3600))
+
+
+def evict_stale_namespaces(disk_dir: str, keep: str, grace: float = NAMESPACE_GRACE_SECONDS):
+    """Removes the namespace directories under disk_dir, other than keep, not written to for grace seconds."""
+    if not disk_dir or not os.path.isdir(disk_dir):
+        return
+    cutoff = time.time() - grace
+    for name in os.listdir(disk_dir):
+        path = os.path.join(disk_dir, name)
+        try:
+            stale = name != keep and os.path.isdir(path) and os.path.getmtime(path) < cutoff
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of classification results.
+
+    Entries are keyed by the SHA-256 of the uploaded bytes within a namespace
+    made of the model fingerprint and the extractor version. When the namespace
+    changes (new model or extractor), the memory tier is dropped; disk-tier
+    namespaces nobody has written to for NAMESPACE_GRACE_SECONDS are removed.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL,
+                 disk_dir: str = RESULT_CACHE_DIR):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.namespace = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _switch_namespace(self, namespace: str):
+        # Called with the lock held
+        if namespace == self.namespace:
+            return
+        if self.namespace is not None:
+            print("Result cache invalidated (model or extractor changed)")
+        self.namespace = namespace
+        self._entries.clear()
+        evict_stale_namespaces(self.disk_dir, namespace)
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, self.namespace, f"{key}.json")
+
+    def get(self, key: str, namespace: str):
+        """Returns the cached result dict for key, or None."""
+        with self._lock:
+            self._switch_namespace(namespace)
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            value = self._read_disk(key)
+            if value is not None:
+                self.disk_hits += 1
+                self._store(key, value["created"], value["result"])
+                return value["result"]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, namespace: str, result: dict):
+        with self._lock:
+            self._switch_namespace(namespace)
+            created = time.time()
+            self._store(key, created, result)
+            self._write_disk(key, created, result)
+
+    def _store(self, key, created, result):
+        self._entries[key] = (created, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(value.get("created", 0)):
+            os.remove(path)
+            return None
+        return value
+
+    def _write_disk(self, key, created, result):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "result": result}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Result cache write failed: {e}")
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "disk_tier": bool(self.disk_dir),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def profile_cache_dir(profile: str):
+    return os.path.join(RESULT_CACHE_DIR, profile) if RESULT_CACHE_DIR else None
+
+
+# Global instances: one cache per feature profile, so alternating profiles never
+# invalidate each other; result_cache is the deployment default's
+result_caches = {profile: ResultCache(disk_dir=profile_cache_dir(profile)) for profile in PROFILES}
+result_cache = result_caches[DEFAULT_PROFILE]
@@ -1,76 +1,43 @@
-import librosa
+import io
+import os
+import threading
+import time
 import numpy as np
 import warnings
 
 # Suppress librosa warnings
 warnings.filterwarnings("ignore")
 
-def extract_features(audio_path: str):
-    """
-    Advanced feature extraction for AI voice detection.
-    Extracts MFCCs (with deltas), Spectral features, and HNR.
-    67 features in total for robust detection.
-    """
-    try:
-        # Load audio (downsample to 22050 Hz)
-        y, sr = librosa.load(audio_path, sr=22050)
-        
-        # 1. MFCCs (20 coefficients)
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-        mfcc_mean = np.mean(mfccs, axis=1)
-        mfcc_var = np.var(mfccs, axis=1)
-        
-        # 2. MFCC Deltas (Temporal dynamics)
-        mfcc_delta = librosa.feature.delta(mfccs)
-        mfcc_delta2 = librosa.feature.delta(mfccs, order=2)
-        
-        delta_mean = np.mean(mfcc_delta, axis=1)
-        delta2_mean = np.mean(mfcc_delta2, axis=1)
-
-        # 3. Spectral Features
-        # Centroid (Brightness)
-        cent = librosa.feature.spectral_centroid(y=y, sr=sr)
-        cent_mean = np.mean(cent)
-        cent_var = np.var(cent)
-        
-        # Spectral Flatness (AI voices often have unnatural flatness)
-        flatness = librosa.feature.spectral_flatness(y=y)
-        flat_mean = np.mean(flatness)
-        
-        # 4. Zero Crossing Rate (Micro-jitters)
-        zcr = librosa.feature.zero_crossing_rate(y)
-        zcr_mean = np.mean(zcr)
-        zcr_var = np.var(zcr)
-        
-        # 5. Harmonic-to-Noise Ratio (HNR) - Naturalness check
-        # Librosa doesn't have a direct HNR, but we can estimate via harmonic/percussive ratio
-        harmonic, percussive = librosa.effects.hpss(y)
-        hnr_est = np.mean(harmonic**2) / (np.mean(percussive**2) + 1e-6)
-
-        # 6. Pitch Variance (Human voices have natural drift)
-        pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-        pitch_vals = pitches[magnitudes > np.mean(magnitudes)]
-        pitch_var = np.var(pitch_vals) if len(pitch_vals) > 0 else 0
-
-        # Combine Features
-        # 20 (mfcc_mean) + 20 (mfcc_var) + 20 (delta_mean) + 2 (cent) + 1 (flat) + 2 (zcr) + 1 (hnr) + 1 (pitch)
-        # Note: We prioritize mean and var of core features.
-        # Let's keep it simple: MFCC Mean (20) + MFCC Var (20) + Delta Mean (20) + Spectral (7) = 67 features
-        features = np.hstack([
-            mfcc_mean, mfcc_var,
-            delta_mean,
-            cent_mean, cent_var,
-            flat_mean,
-            zcr_mean, zcr_var,
-            hnr_est,
-            pitch_var
-        ])
-        
-        return features
+# Bump whenever the numerical definition or order of the features changes.
+# Cached features and trained models are only valid for the version that produced them.
+EXTRACTOR_VERSION = "2.0.0"
 
-    except Exception as e:
-        print(f"Error extracting features from {audio_path}: {e}")
-        return None
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 20
+
+# Extraction profiles. "full" is the reference pipeline (median-filter HPSS + piptrack).
+# "fast" replaces those two stages, which feed only hnr_estimate and pitch_variance,
+# with box-filter masks and a per-frame spectral peak. Models are trained per profile.
+PROFILES = ("full", "fast")
+# The first CHEAP_FEATURE_COUNT features (MFCC means/variances and delta means) need
+# only the STFT and the mel pipeline; a cascade's first stage is trained on them
+CHEAP_FEATURE_COUNT = 3 * N_MFCC
+# Profile used when a request does not ask for one
+DEFAULT_PROFILE = os.environ.get("FEATURE_PROFILE", "full")
+# HPSS kernel (frames / bins); same size as librosa's median filter default
+HPSS_KERNEL = 31
+# Search band of the fast pitch estimate (piptrack's defaults)
+PITCH_FMIN = 150.0
+PITCH_FMAX = 4000.0
+
+# Parity with the original per-feature librosa calls (one STFT per feature).
+# Every stage now reads the same STFT, computed with the exact parameters the
+# individual librosa calls used, so the outputs agree to float32 round-off:
+#   np.allclose(new, old, rtol=PARITY_RTOL, atol=PARITY_ATOL)
+PARITY_RTOL = 1e-5
+PARITY_ATOL = 1e-6
 
 FEATURE_NAMES = [
     *[f"mfcc_mean_{i}" for i in range(20)],
@@ -82,3 +49,298 @@ FEATURE_NAMES = [
     "hnr_estimate",
     "pitch_variance"
 ]
+
+
+def profile_version(profile: str = "full") -> str:
+    """Version string of a profile's features (the full profile keeps the plain version)."""
+    return EXTRACTOR_VERSION if profile == "full" else f"{EXTRACTOR_VERSION}+{profile}"
+
+
+def check_profile(profile: str) -> str:
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown feature profile '{profile}' (choose from {', '.join(PROFILES)})")
+    return profile
+
+
+def describe_extractor():
+    """Reports the extractor version, the STFT it is built on and the output order."""
+    return {
+        "version": EXTRACTOR_VERSION,
+        "profiles": list(PROFILES),
+        "sample_rate": SAMPLE_RATE,
+        "n_fft": N_FFT,
+        "hop_length": HOP_LENGTH,
+        "n_features": len(FEATURE_NAMES),
+        "feature_names": list(FEATURE_NAMES),
+    }
+
+
+# Stage names recorded by StageClock, in pipeline order
+STAGES = ("decode", "stft", "mfcc", "centroid", "flatness", "zcr", "hpss", "piptrack", "reduce")
+
+
+class StageClock:
+    """
+    Adds the time since the previous lap() to timings[name], in seconds.
+    Does nothing when timings is None, so the default path pays no timing cost.
+    """
+
+    def __init__(self, timings=None):
+        self.timings = timings
+        self.last = time.perf_counter() if timings is not None else None
+
+    def lap(self, name):
+        if self.timings is None:
+            return
+        now = time.perf_counter()
+        self.timings[name] = self.timings.get(name, 0.0) + (now - self.last)
+        self.last = now
+
+
+_audio_stack_lock = threading.Lock()
+
+
+def audio_stack():
+    """
+    librosa, imported on first use so that importing the app (and answering /ready)
+    does not pay for it. librosa and scipy load their submodules lazily, which is not
+    safe from two threads at once, so the first import of every submodule the
+    extractors use happens here, under a lock.
+    """
+    with _audio_stack_lock:
+        import librosa
+        import librosa.core
+        import librosa.decompose
+        import librosa.feature
+        import librosa.filters
+        import librosa.util
+        import scipy.ndimage
+    return librosa
+
+
+def load_audio(audio_path):
+    """
+    Decodes and resamples a clip to the extractor's sample rate (mono).
+    Accepts a path, a file-like object, or the raw bytes of a WAV/FLAC/OGG file.
+    """
+    librosa = audio_stack()
+    if isinstance(audio_path, (bytes, bytearray)):
+        audio_path = io.BytesIO(audio_path)
+    return librosa.load(audio_path, sr=SAMPLE_RATE)
+
+
+def _fast_hpss_power(S, frames, n_samples):
+    """
+    Mean harmonic and percussive power without median filters or ISTFT.
+    Box filters along time (harmonic) and frequency (percussive) stand in for
+    librosa's median filters, with the same Wiener-style soft masks, and the
+    masked energy is read off the spectrum by Parseval's theorem.
+    """
+    librosa = audio_stack()
+    from scipy.ndimage import uniform_filter1d
+
+    harmonic = uniform_filter1d(S, HPSS_KERNEL, axis=1, mode="reflect")
+    percussive = uniform_filter1d(S, HPSS_KERNEL, axis=0, mode="reflect")
+    harmonic, percussive = harmonic ** 2, percussive ** 2
+    total = harmonic + percussive
+    total[total == 0] = 1.0
+    power = S[:, frames] ** 2
+
+    # One-sided spectrum: every bin but DC and Nyquist stands for two
+    weights = np.full(S.shape[0], 2.0)
+    weights[0] = weights[-1] = 1.0
+    # Frame energy -> signal power for a Hann analysis window at this hop
+    window_energy = np.sum(librosa.filters.get_window("hann", N_FFT) ** 2)
+    scale = N_FFT * window_energy * max(n_samples, 1) / HOP_LENGTH
+
+    def masked_power(mask_num):
+        mask = mask_num[:, frames] / total[:, frames]
+        return float(weights @ (mask ** 2 * power).sum(axis=1)) / scale
+
+    return masked_power(harmonic), masked_power(percussive)
+
+
+def _fast_pitch(S, sr):
+    """Strongest spectral peak per frame in [PITCH_FMIN, PITCH_FMAX), parabolically interpolated."""
+    lo = max(int(np.ceil(PITCH_FMIN * N_FFT / sr)), 1)
+    hi = min(int(np.ceil(PITCH_FMAX * N_FFT / sr)), S.shape[0] - 1)
+    columns = np.arange(S.shape[1])
+    peak = lo + np.argmax(S[lo:hi], axis=0)
+    magnitude = S[peak, columns]
+    left, right = S[peak - 1, columns], S[peak + 1, columns]
+    curvature = left - 2 * magnitude + right
+    shift = np.divide(0.5 * (left - right), curvature, out=np.zeros_like(curvature), where=curvature != 0)
+    pitch = (peak + shift) * sr / N_FFT
+    return pitch[np.newaxis, :], magnitude[np.newaxis, :]
+
+
+def analyze_frames(y, sr=SAMPLE_RATE, core=None, timings=None, profile="full", gate=None):
+    """
+    Frame-level analysis behind the 67 features.
+    A single complex STFT is shared by every spectral stage: the mel/MFCC
+    pipeline, centroid, flatness, HPSS and pitch tracking.
+
+    core=(start, stop) restricts the output to frames centred in that sample range;
+    the samples outside it only serve as context for the filters (used for segments).
+    Pass a dict as timings to have the seconds spent in each of STAGES added to it.
+    profile="fast" computes the HNR and pitch inputs with the cheap estimators;
+    their times are still reported as the "hpss" and "piptrack" stages.
+
+    gate, if given, is called with the cheap features (see CHEAP_FEATURE_COUNT) as
+    soon as they exist; when it returns True the analysis stops there and the
+    result is marked "gated" (features_from_frames then returns only those).
+    """
+    librosa = audio_stack()
+    clock = StageClock(timings)
+    fast = check_profile(profile) == "fast"
+
+    if core is not None:
+        start, stop = core
+        core_frames = slice(-(-start // HOP_LENGTH), -(-stop // HOP_LENGTH))
+    else:
+        start, stop = 0, len(y)
+        core_frames = slice(None)
+
+    # The one STFT per clip (same defaults librosa uses internally)
+    D = librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    S = np.abs(D)
+    clock.lap("stft")
+
+    # 1. MFCCs (20 coefficients) from the power spectrogram
+    mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr)
+    mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+
+    # 2. MFCC Deltas (Temporal dynamics)
+    mfcc_delta = librosa.feature.delta(mfccs)
+    clock.lap("mfcc")
+
+    if gate is not None:
+        cheap = {"mfcc": mfccs[:, core_frames], "delta": mfcc_delta[:, core_frames],
+                 "n_samples": stop - start, "gated": True}
+        if gate(cheap_features(cheap)):
+            return cheap
+
+    # 3. Spectral Features
+    # Centroid (Brightness)
+    cent = librosa.feature.spectral_centroid(S=S, sr=sr)
+    clock.lap("centroid")
+
+    # Spectral Flatness (AI voices often have unnatural flatness)
+    flatness = librosa.feature.spectral_flatness(S=S)
+    clock.lap("flatness")
+
+    # 4. Zero Crossing Rate (Micro-jitters) - time domain, no STFT needed
+    zcr = librosa.feature.zero_crossing_rate(y)
+    clock.lap("zcr")
+
+    # 5. Harmonic-to-Noise Ratio (HNR) - Naturalness check
+    if fast:
+        harmonic_power, percussive_power = _fast_hpss_power(S, core_frames, stop - start)
+    else:
+        # Median-filter HPSS on the shared STFT, resynthesised exactly as librosa.effects.hpss does
+        D_harm, D_perc = librosa.decompose.hpss(D)
+        harmonic = librosa.istft(D_harm, dtype=y.dtype, length=len(y))
+        percussive = librosa.istft(D_perc, dtype=y.dtype, length=len(y))
+        harmonic_power = np.mean(harmonic[start:stop] ** 2)
+        percussive_power = np.mean(percussive[start:stop] ** 2)
+    clock.lap("hpss")
+
+    # 6. Pitch Variance (Human voices have natural drift)
+    if fast:
+        pitches, magnitudes = _fast_pitch(S, sr)
+    else:
+        pitches, magnitudes = librosa.piptrack(S=S, sr=sr)
+    clock.lap("piptrack")
+
+    if core is not None:
+        mfccs, mfcc_delta = mfccs[:, core_frames], mfcc_delta[:, core_frames]
+        cent, flatness, zcr = cent[:, core_frames], flatness[:, core_frames], zcr[:, core_frames]
+        pitches, magnitudes = pitches[:, core_frames], magnitudes[:, core_frames]
+        y = y[start:stop]
+
+    pitch_vals = pitches[magnitudes > np.mean(magnitudes)]
+
+    frames = {
+        "mfcc": mfccs,
+        "delta": mfcc_delta,
+        "centroid": cent,
+        "flatness": flatness,
+        "zcr": zcr,
+        "harmonic_power": harmonic_power,
+        "percussive_power": percussive_power,
+        "n_samples": len(y),
+        "pitch": pitch_vals,
+    }
+    clock.lap("reduce")
+    return frames
+
+
+def cheap_features(frames):
+    """The first CHEAP_FEATURE_COUNT features: MFCC means and variances, delta means."""
+    return np.hstack([
+        np.mean(frames["mfcc"], axis=1), np.var(frames["mfcc"], axis=1),
+        np.mean(frames["delta"], axis=1),
+    ])
+
+
+def features_from_frames(frames):
+    """
+    Reduces analyze_frames() output to the feature vector, in the order of FEATURE_NAMES.
+    Gated analyses only have the cheap features.
+    """
+    if frames.get("gated"):
+        return cheap_features(frames)
+    pitch_vals = frames["pitch"]
+    # MFCC Mean (20) + MFCC Var (20) + Delta Mean (20) + Spectral (7) = 67 features
+    return np.hstack([
+        cheap_features(frames),
+        np.mean(frames["centroid"]), np.var(frames["centroid"]),
+        np.mean(frames["flatness"]),
+        np.mean(frames["zcr"]), np.var(frames["zcr"]),
+        frames["harmonic_power"] / (frames["percussive_power"] + 1e-6),
+        np.var(pitch_vals) if len(pitch_vals) > 0 else 0
+    ])
+
+
+def compute_features(y, sr=SAMPLE_RATE, timings=None, profile="full", gate=None):
+    """Computes all 67 features from a decoded signal (one STFT per clip), or the cheap ones if gated."""
+    frames = analyze_frames(y, sr, timings=timings, profile=profile, gate=gate)
+    clock = StageClock(timings)
+    features = features_from_frames(frames)
+    clock.lap("reduce")
+    return features
+
+
+def extract_features(audio_path: str, timings=None, profile: str = "full", max_seconds: float = None,
+                     gate=None):
+    """
+    Advanced feature extraction for AI voice detection.
+    Extracts MFCCs (with deltas), Spectral features, and HNR.
+    67 features in total for robust detection.
+    Pass a dict as timings to collect per-stage seconds (see STAGES) and the
+    analysed audio length under "audio_seconds". profile selects the extraction
+    profile (see PROFILES); features of different profiles are not interchangeable.
+    max_seconds caps the audio analysed: longer clips are sampled as evenly spread
+    windows read with seeks (see streaming.extract_window_features).
+    gate enables early exit after the cheap features (see analyze_frames); the
+    result then has CHEAP_FEATURE_COUNT entries. Budgeted window analysis never gates.
+    """
+    try:
+        if max_seconds:
+            from .streaming import extract_window_features
+            features, analyzed = extract_window_features(audio_path, max_seconds, timings=timings, profile=profile)
+            if timings is not None:
+                timings["audio_seconds"] = analyzed
+            return features
+
+        clock = StageClock(timings)
+        y, sr = load_audio(audio_path)
+        clock.lap("decode")
+        if timings is not None:
+            timings["audio_seconds"] = len(y) / sr
+        return compute_features(y, sr, timings=timings, profile=profile, gate=gate)
+
+    except Exception as e:
+        source = audio_path if isinstance(audio_path, str) else "in-memory audio"
+        print(f"Error extracting features from {source}: {e}")
+        return None
@@ -0,0 +1,380 @@
+"""
+Perceptual fingerprints for near-duplicate clips.
+
+Re-encoded, re-sampled or trimmed copies of a clip have different bytes, so the
+result cache (keyed by SHA-256) misses them. A fingerprint is a set of spectral
+peak landmarks: pairs of prominent time-frequency peaks hashed as
+(frequency 1, frequency 2, time gap), each with the time of its first peak. The
+peaks survive lossy coding and volume changes, and since a hash only encodes
+the gap between two peaks, a trimmed copy shares most hashes with the original
+at one constant time offset.
+
+FingerprintIndex is an inverted index from hash to (clip, time) of previously
+classified clips. A query votes for (clip, time offset) pairs; a clip whose best
+offset lines up most of the query's hashes, and covers most of the stored clip's,
+is a match, and its stored verdict is returned. Clips are fingerprinted whole (at a
+low sample rate, alongside feature extraction), so clips that only share a
+section, such as a common intro, never match; clips longer than
+FINGERPRINT_MAX_SECONDS are not fingerprinted at all.
+"""
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from .cache import evict_stale_namespaces
+from .feature_extractor import PROFILES, DEFAULT_PROFILE, audio_stack
+
+# Clips kept in each profile's index (least recently matched are evicted first; 0 = fingerprinting off)
+FINGERPRINT_INDEX_SIZE = int(os.environ.get("FINGERPRINT_INDEX_SIZE", 0))
+# Landmarks kept in each profile's index, 10 bytes each (the default is ~40 MB, about 2000 20 s clips)
+FINGERPRINT_MAX_POSTINGS = int(os.environ.get("FINGERPRINT_MAX_POSTINGS", 4_000_000))
+# Optional directory the index is persisted to, so it survives restarts
+FINGERPRINT_DIR = os.environ.get("FINGERPRINT_DIR") or None
+# Share of the query's landmarks that must line up with a stored clip for a match
+FINGERPRINT_SIMILARITY = float(os.environ.get("FINGERPRINT_SIMILARITY", 0.65))
+# Share of the stored clip's landmarks the aligned ones must cover as well, so neither
+# clip can be a small part of the other
+FINGERPRINT_COVERAGE = float(os.environ.get("FINGERPRINT_COVERAGE", 0.5))
+# Aligned landmarks a match needs at least, so very short clips never match by chance
+FINGERPRINT_MIN_MATCHES = int(os.environ.get("FINGERPRINT_MIN_MATCHES", 20))
+# Longest clip fingerprinted (landmark times are uint16 frames, so at most ~260 s)
+FINGERPRINT_MAX_SECONDS = min(float(os.environ.get("FINGERPRINT_MAX_SECONDS", 120)), 260.0)
+
+# Bump whenever landmark hashes change; stored fingerprints of other versions are ignored
+FINGERPRINT_VERSION = 2
+SAMPLE_RATE = 8000
+N_FFT = 1024
+# A fine hop keeps peak times stable when a copy is trimmed by a fraction of a hop
+HOP_LENGTH = 32
+# Peaks are local maxima over this many (frequency bins, frames)
+PEAK_NEIGHBORHOOD = (25, 105)
+# Peaks below this level relative to the clip's loudest bin are ignored
+PEAK_FLOOR_DB = -50.0
+# Strongest peaks kept per second of audio
+PEAKS_PER_SECOND = 20
+# Each peak is paired with the next FAN_OUT peaks that start within MAX_GAP frames
+FAN_OUT = 5
+MAX_GAP = 504
+# Hashes quantise the gap (frames) and frequencies (bins) by these steps, which absorbs
+# the one-frame and one-bin jitter of peaks in re-encoded or trimmed copies
+GAP_STEP = 8
+FREQ_STEP = 2
+# Bins below ~60 Hz carry hum and rumble, not voice
+MIN_BIN = 8
+# Rows the recent segment of the index holds before it is merged into the main one
+MERGE_ROWS = 50_000
+
+
+def _load(source):
+    librosa = audio_stack()
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    # One hop past the limit tells a clip that is too long from one that fits exactly
+    y, _ = librosa.load(source, sr=SAMPLE_RATE, mono=True, duration=FINGERPRINT_MAX_SECONDS + HOP_LENGTH / SAMPLE_RATE)
+    return y if len(y) <= FINGERPRINT_MAX_SECONDS * SAMPLE_RATE else None
+
+
+def landmarks(y):
+    """(hashes, times) of a mono SAMPLE_RATE signal, as uint32 and uint16 arrays."""
+    librosa = audio_stack()
+    from scipy.ndimage import maximum_filter
+
+    empty = np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+    if len(y) < N_FFT:
+        return empty
+    S = librosa.amplitude_to_db(np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)), ref=np.max)
+    S[:MIN_BIN] = PEAK_FLOOR_DB - 1
+    peaks = (S == maximum_filter(S, size=PEAK_NEIGHBORHOOD, mode="constant", cval=-np.inf)) & (S > PEAK_FLOOR_DB)
+    freqs, frames = np.nonzero(peaks)
+    if len(frames) < 2:
+        return empty
+
+    keep = max(2, int(PEAKS_PER_SECOND * len(y) / SAMPLE_RATE))
+    strongest = np.argsort(S[freqs, frames])[::-1][:keep]
+    order = strongest[np.lexsort((freqs[strongest], frames[strongest]))]
+    freqs, frames = (freqs[order] // FREQ_STEP).astype(np.uint32), frames[order].astype(np.int64)
+
+    hashes, times = [], []
+    for k in range(1, FAN_OUT + 1):
+        gap = frames[k:] - frames[:-k]
+        pair = (gap >= 1) & (gap <= MAX_GAP)
+        anchor = np.nonzero(pair)[0]
+        # 9 + 9 + 6 bits
+        hashes.append((freqs[anchor] << 15) | (freqs[anchor + k] << 6) | (gap[pair] // GAP_STEP).astype(np.uint32))
+        times.append(frames[anchor])
+    return np.concatenate(hashes).astype(np.uint32), np.concatenate(times).astype(np.uint16)
+
+
+def fingerprint_in_worker(source):
+    """
+    Fingerprint of a clip (the raw bytes of an in-memory upload or a file path), as
+    (hashes, times) lists ready for FingerprintIndex; runs in the inference pool.
+    Returns None for audio that cannot be decoded or is longer than FINGERPRINT_MAX_SECONDS,
+    which then goes through extraction as usual.
+    """
+    try:
+        y = _load(source)
+        if y is None:
+            return None
+        hashes, times = landmarks(y)
+    except Exception as e:
+        print(f"Fingerprint Error: {e}")
+        return None
+    return hashes.tolist(), times.tolist()
+
+
+class FingerprintIndex:
+    """
+    Inverted index of landmark hashes to the clips they came from, with each clip's
+    verdict. Like ResultCache, entries belong to a namespace (model version and
+    extractor) and are dropped when it changes; results from budgeted analyses are
+    only matched by requests with the same budget.
+
+    Postings are (hash, clip, time) rows in flat numpy arrays sorted by hash (10 bytes
+    a landmark) and looked up with binary search. New clips go to a small sorted
+    segment that is merged into the main one once it grows; evicted clips are masked
+    out and their rows dropped when they make up a large part of the arrays.
+    """
+
+    def __init__(self, max_entries: int = FINGERPRINT_INDEX_SIZE, disk_dir: str = FINGERPRINT_DIR,
+                 similarity: float = FINGERPRINT_SIMILARITY, min_matches: int = FINGERPRINT_MIN_MATCHES,
+                 max_postings: int = FINGERPRINT_MAX_POSTINGS, coverage: float = FINGERPRINT_COVERAGE):
+        self.max_entries = max_entries
+        self.max_postings = max_postings
+        self.disk_dir = disk_dir
+        self.similarity = similarity
+        self.coverage = coverage
+        self.min_matches = min_matches
+        self.namespace = None
+        self._lock = threading.Lock()
+        self._clear()
+
+        self.matches = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _clear(self):
+        self._entries = OrderedDict()  # clip id -> entry dict
+        self._ids = {}  # (audio hash, budget) -> clip id
+        self._next_id = 0
+        self._live = np.zeros(0, dtype=bool)  # by clip id
+        self._n_hashes = np.zeros(0, dtype=np.int64)  # by clip id
+        self._main = _empty_segment()
+        self._recent = _empty_segment()
+        self._postings = 0  # live rows
+        self._dead = 0  # rows of evicted clips still in the arrays
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _switch_namespace(self, namespace: str):
+        # Called with the lock held
+        if namespace == self.namespace:
+            return
+        self.namespace = namespace
+        self._clear()
+        if self.disk_dir:
+            evict_stale_namespaces(self.disk_dir, namespace)
+            self._load_disk()
+
+    def _disk_path(self, audio_hash: str, budget) -> str:
+        name = f"{audio_hash}-{budget:g}s" if budget else audio_hash
+        return os.path.join(self.disk_dir, self.namespace, f"{name}.json")
+
+    def _load_disk(self):
+        directory = os.path.join(self.disk_dir, self.namespace)
+        if not os.path.isdir(directory):
+            return
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json")]
+        # Oldest first, so the most recently used end up at the recent end of the LRU order
+        for path in sorted(paths, key=os.path.getmtime):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if stored.get("version") != FINGERPRINT_VERSION:
+                    continue
+                self._add(stored["audio_hash"], stored.get("budget"), stored["hashes"], stored["times"],
+                          stored["result"])
+            except (OSError, ValueError, KeyError):
+                continue
+        if self._entries:
+            print(f"Fingerprint index loaded {len(self._entries)} clips from {directory}")
+
+    def _add(self, audio_hash, budget, hashes, times, result):
+        # Called with the lock held
+        key = (audio_hash, budget)
+        if key in self._ids:
+            self._drop(self._ids[key], remove_file=False)
+        pairs = np.unique(np.stack([np.asarray(hashes, dtype=np.int64), np.asarray(times, dtype=np.int64)]), axis=1)
+        clip = self._next_id
+        self._next_id += 1
+        if clip >= len(self._live):
+            grow = max(64, len(self._live))
+            self._live = np.concatenate([self._live, np.zeros(grow, dtype=bool)])
+            self._n_hashes = np.concatenate([self._n_hashes, np.zeros(grow, dtype=np.int64)])
+        self._live[clip] = True
+        self._n_hashes[clip] = pairs.shape[1]
+        self._entries[clip] = {"audio_hash": audio_hash, "budget": budget, "result": result}
+        self._ids[key] = clip
+        self._postings += pairs.shape[1]
+        self._recent = _merge(self._recent, (pairs[0].astype(np.uint32),
+                                             np.full(pairs.shape[1], clip, dtype=np.uint32),
+                                             pairs[1].astype(np.uint16)))
+        if len(self._recent[0]) > MERGE_ROWS:
+            self._main = _merge(self._main, self._recent)
+            self._recent = _empty_segment()
+        while self._entries and (len(self._entries) > self.max_entries or self._postings > self.max_postings):
+            oldest = next(iter(self._entries))
+            self._drop(oldest, remove_file=True)
+            self.evictions += 1
+
+    def _drop(self, clip, remove_file: bool):
+        entry = self._entries.pop(clip)
+        self._ids.pop((entry["audio_hash"], entry["budget"]), None)
+        self._live[clip] = False
+        self._postings -= self._n_hashes[clip]
+        self._dead += self._n_hashes[clip]
+        if self._dead > max(MERGE_ROWS, self._postings):
+            # Most rows belong to evicted clips: rewrite the arrays without them
+            self._main = _merge(*(_live_rows(segment, self._live) for segment in (self._main, self._recent)))
+            self._recent = _empty_segment()
+            self._dead = 0
+        if remove_file and self.disk_dir:
+            try:
+                os.remove(self._disk_path(entry["audio_hash"], entry["budget"]))
+            except OSError:
+                pass
+
+    def _votes(self, hashes, times):
+        """(clip, time offset) pairs of the stored landmarks sharing a hash with the query, as arrays."""
+        clips, offsets = [], []
+        # Same dtype as the postings, or searchsorted converts the whole array on every call
+        hashes = hashes.astype(np.uint32)
+        for segment_hashes, segment_clips, segment_times in (self._main, self._recent):
+            left = np.searchsorted(segment_hashes, hashes, side="left")
+            counts = np.searchsorted(segment_hashes, hashes, side="right") - left
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Row positions of every match: each query hash's run [left, left + count)
+            starts = np.repeat(left - np.cumsum(counts) + counts, counts)
+            rows = starts + np.arange(total)
+            clips.append(segment_clips[rows].astype(np.int64))
+            offsets.append(segment_times[rows].astype(np.int64) - np.repeat(times, counts))
+        if not clips:
+            return None, None
+        clips, offsets = np.concatenate(clips), np.concatenate(offsets)
+        live = self._live[clips]
+        return clips[live], offsets[live]
+
+    def lookup(self, fingerprint, namespace: str, budget=None):
+        """
+        Best stored clip matching fingerprint: (result dict, matched audio hash, similarity),
+        or None. Similarity is the share of the query's landmarks that line up at one time
+        offset; they must also cover self.coverage of the stored clip's. Blocks (a namespace switch reads the disk
+        tier); async callers run it in a thread.
+        """
+        if not self.enabled or not fingerprint:
+            return None
+        hashes, times = fingerprint
+        query = np.unique(np.stack([np.asarray(hashes, dtype=np.int64), np.asarray(times, dtype=np.int64)]), axis=1)
+        with self._lock:
+            self._switch_namespace(namespace)
+            best = None
+            clips, offsets = self._votes(query[0], query[1])
+            if clips is not None and len(clips):
+                # One key per (clip, offset); offsets span [-65535, 65535]
+                keys, counts = np.unique((clips << 17) | (offsets + 65536), return_counts=True)
+                # Trims that are not a whole number of hops move peaks by one frame either way;
+                # keys of the same clip one offset apart are neighbours in sorted order
+                aligned = counts.copy()
+                adjacent = np.diff(keys) == 1
+                aligned[1:] += np.where(adjacent, counts[:-1], 0)
+                aligned[:-1] += np.where(adjacent, counts[1:], 0)
+                candidate_clips = keys >> 17
+                similarity = aligned / max(1, query.shape[1])
+                coverage = aligned / np.maximum(1, self._n_hashes[candidate_clips])
+                passing = (aligned >= self.min_matches) & (similarity >= self.similarity) & (coverage >= self.coverage)
+                for i in np.nonzero(passing)[0][np.argsort(-similarity[passing], kind="stable")]:
+                    if self._entries[int(candidate_clips[i])]["budget"] == budget:
+                        best = (int(candidate_clips[i]), float(similarity[i]))
+                        break
+
+            if best is None:
+                self.misses += 1
+                return None
+            clip, similarity = best
+            self._entries.move_to_end(clip)
+            self.matches += 1
+            entry = self._entries[clip]
+            return entry["result"], entry["audio_hash"], min(1.0, similarity)
+
+    def put(self, audio_hash: str, fingerprint, namespace: str, result: dict, budget=None):
+        """Indexes a classified clip's fingerprint with its result. Blocks like lookup."""
+        if not self.enabled or not fingerprint or not fingerprint[0]:
+            return
+        hashes, times = fingerprint
+        with self._lock:
+            self._switch_namespace(namespace)
+            self._add(audio_hash, budget, hashes, times, result)
+            self._write_disk(audio_hash, budget, hashes, times, result)
+
+    def _write_disk(self, audio_hash, budget, hashes, times, result):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(audio_hash, budget)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": FINGERPRINT_VERSION, "created": time.time(), "audio_hash": audio_hash, "budget": budget,
+                           "hashes": hashes, "times": times, "result": result}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Fingerprint index write failed: {e}")
+
+    def stats(self):
+        return {
+            "clips": len(self._entries),
+            "max_clips": self.max_entries,
+            "postings": int(self._postings),
+            "max_postings": self.max_postings,
+            "memory_bytes": int(sum(a.nbytes for a in (*self._main, *self._recent))),
+            "disk_tier": bool(self.disk_dir),
+            "matches": self.matches,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _empty_segment():
+    return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+
+
+def _merge(*segments):
+    """One (hashes, clips, times) segment with the rows of all segments, sorted by hash."""
+    hashes, clips, times = (np.concatenate(columns) for columns in zip(*segments))
+    order = np.argsort(hashes, kind="stable")
+    return hashes[order], clips[order], times[order]
+
+
+def _live_rows(segment, live):
+    keep = live[segment[1]]
+    return tuple(column[keep] for column in segment)
+
+
+def profile_fingerprint_dir(profile: str):
+    return os.path.join(FINGERPRINT_DIR, profile) if FINGERPRINT_DIR else None
+
+
+# Global instances: one index per feature profile, like the result caches
+fingerprint_indexes = {
+    profile: FingerprintIndex(disk_dir=profile_fingerprint_dir(profile)) for profile in PROFILES
+}
+fingerprint_index = fingerprint_indexes[DEFAULT_PROFILE]
@@ -0,0 +1,196 @@
+"""
+Flat-array inference engine for the StandardScaler + RandomForest pipeline.
+
+sklearn spends most of a single-row predict_proba in Python dispatch and per-tree
+calls. CompiledForest copies every tree into shared flat arrays (feature index,
+threshold, children, leaf probabilities) and walks all trees for all rows at once
+with vectorised NumPy indexing, one step per tree level.
+
+The scaler is folded into the split thresholds. sklearn decides a split with
+float32((x - mean) / scale) <= threshold. That function of x is monotone, so the
+rows going left are exactly those with x <= T for one raw-space double T. T is
+found per node by bisection over the ordered doubles, which makes the folded
+comparison decide exactly like sklearn's. Leaf probabilities are normalised and
+accumulated tree by tree in sklearn's order, so predict_proba is bit-identical.
+
+contributions() attributes a prediction to features along the decision paths: each
+split credits its feature with the change in class probability between the node and
+the child taken. Those changes are precomputed per node, so attributions cost one
+more traversal of the same arrays.
+"""
+import numpy as np
+
+_SIGN = np.int64(-0x8000000000000000)
+
+
+def _ordered(x):
+    """Maps doubles to int64 keys with the same ordering (-0.0 and 0.0 share a key)."""
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & ~_SIGN), bits)
+
+
+def _from_ordered(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return np.where(keys < 0, (-keys) | _SIGN, keys).view(np.float64)
+
+
+def _fold_thresholds(threshold, mean, scale):
+    """Largest raw x per node with float32((x - mean) / scale) <= threshold."""
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32).astype(np.float64) <= threshold
+
+    guess = threshold * scale + mean
+    width = 1e-6 * (np.abs(guess) + scale) + 1e-300
+    lo, hi = guess - width, guess + width
+    # Widen any bracket that does not straddle the boundary
+    for _ in range(64):
+        bad_lo, bad_hi = ~goes_left(lo), goes_left(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        width = np.where(bad_lo | bad_hi, width * 1e3, width)
+        lo = np.where(bad_lo, guess - width, lo)
+        hi = np.where(bad_hi, guess + width, hi)
+    else:
+        raise ValueError("Could not bracket folded thresholds")
+
+    # Invariant: goes_left(lo) and not goes_left(hi)
+    lo_key, hi_key = _ordered(lo), _ordered(hi)
+    while True:
+        open_gap = hi_key - lo_key > 1
+        if not open_gap.any():
+            return _from_ordered(lo_key)
+        mid_key = lo_key + (hi_key - lo_key) // 2
+        left = goes_left(_from_ordered(mid_key))
+        lo_key = np.where(open_gap & left, mid_key, lo_key)
+        hi_key = np.where(open_gap & ~left, mid_key, hi_key)
+
+
+class CompiledForest:
+    """Array-backed equivalent of pipeline.predict_proba for scaler + forest pipelines."""
+
+    def __init__(self, feature, threshold, left, right, leaf_proba, roots, depth, n_features, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.depth = depth
+        self.n_features = n_features
+        self.classes_ = classes
+        # Change in class probabilities when leaving each node to the left / right child (0 at leaves)
+        self.left_delta = leaf_proba[left] - leaf_proba
+        self.right_delta = leaf_proba[right] - leaf_proba
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Builds the engine from a Pipeline([('scaler', StandardScaler), ('clf', forest)]).
+        Raises ValueError for any other shape of model.
+        """
+        from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+
+        steps = getattr(pipeline, "named_steps", {})
+        scaler, forest = steps.get("scaler"), steps.get("clf")
+        if len(steps) != 2 or not isinstance(scaler, StandardScaler) \
+                or not isinstance(forest, (RandomForestClassifier, ExtraTreesClassifier)):
+            raise ValueError("Only scaler + random forest pipelines can be compiled")
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Multi-output forests are not supported")
+
+        n_features = forest.n_features_in_
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        n_classes = forest.n_classes_
+
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left < 0
+            node_ids = np.arange(n)
+
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.intp)
+            threshold = np.full(n, np.inf)
+            internal = ~is_leaf
+            threshold[internal] = _fold_thresholds(
+                tree.threshold[internal], mean[feature[internal]], scale[feature[internal]]
+            )
+            # Leaves point at themselves so extra traversal steps are no-ops
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba = proba / normalizer
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            probas.append(proba)
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            leaf_proba=np.concatenate(probas),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            n_features=n_features,
+            classes=forest.classes_,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf node (global index) reached by every row in every tree: shape (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        node = np.repeat(self.roots[np.newaxis, :], len(X), axis=0)
+        rows = np.arange(len(X))[:, np.newaxis]
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def contributions(self, X, class_index: int = 1):
+        """
+        Decision-path attributions for one class: (bias, contributions) where bias is the
+        forest's mean root probability and contributions has shape (n_rows, n_features).
+        bias + contributions.sum(axis=1) equals predict_proba(X)[:, class_index] up to rounding.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        node = np.repeat(self.roots[np.newaxis, :], len(X), axis=0)
+        rows = np.arange(len(X))[:, np.newaxis]
+        cells = (rows * self.n_features).repeat(self.n_trees, axis=1)
+        total = np.zeros(len(X) * self.n_features)
+        for _ in range(self.depth):
+            feature = self.feature[node]
+            go_left = X[rows, feature] <= self.threshold[node]
+            delta = np.where(go_left, self.left_delta[node, class_index], self.right_delta[node, class_index])
+            total += np.bincount((cells + feature).ravel(), weights=delta.ravel(), minlength=total.size)
+            node = np.where(go_left, self.left[node], self.right[node])
+        bias = self.leaf_proba[self.roots, class_index].mean()
+        return bias, total.reshape(len(X), self.n_features) / self.n_trees
+
+    def predict_proba(self, X):
+        proba = self.leaf_proba[self.apply(X)]
+        # Accumulate tree by tree (cumsum is sequential), exactly like the forest's += loop
+        total = np.cumsum(proba, axis=1)[:, -1, :]
+        total /= self.n_trees
+        return total
@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+# Number of inference processes. 0 runs inference on a single background thread
+# of the API process instead (useful for tests and very small containers).
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", os.cpu_count() or 1))
+# Requests admitted at once (running + waiting). Anything beyond this is rejected with 503.
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", max(INFERENCE_WORKERS, 1) * 4))
+# Seconds suggested to clients in the Retry-After header when the queue is full
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", 5))
+# multiprocessing start method for the pool (platform default when unset)
+INFERENCE_START_METHOD = os.environ.get("INFERENCE_START_METHOD") or None
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue has no free slot."""
+
+    def __init__(self, depth: int):
+        super().__init__(f"Inference queue is full ({depth} requests in flight)")
+        self.depth = depth
+
+
+def extract_in_worker(audio_path, collect_timings: bool = False, profile: str = "full", max_seconds: float = None,
+                      model_version: str = None):
+    """
+    Decodes and extracts features inside a pool process.
+    audio_path is a temp file path or the raw bytes of an in-memory upload.
+    Scoring happens back in the API process, where requests are micro-batched.
+    Returns (features, analyzed_seconds, timings); timings carries the per-stage
+    seconds back to the API process for its metrics, or is None when collect_timings is off.
+    With the cascade on, a confident first stage stops extraction early and features
+    holds only the cheap features (CHEAP_FEATURE_COUNT entries). model_version names
+    the version whose first stage gates, so a reload in the API process mid-request
+    does not mix versions.
+    """
+    from .feature_extractor import extract_features
+    from .classifier import classifiers
+    classifier = classifiers[profile]
+    cascade = classifier.cascade_threshold > 0 and not max_seconds and classifier.ensure_loaded()
+    gate = classifier.cascade_gate(classifier.bundle_for(model_version)) if cascade else None
+    timings = {}
+    features = extract_features(audio_path, timings=timings, profile=profile, max_seconds=max_seconds, gate=gate)
+    if features is None:
+        raise ValueError("Could not extract features from audio")
+    return features, timings.get("audio_seconds"), timings if collect_timings else None
+
+
+def segments_in_worker(audio_path: str, segment_seconds: float, collect_timings: bool = False,
+                       profile: str = "full"):
+    """
+    Streams a long recording through the extractor segment by segment.
+    Returns (segments, aggregate, duration, timings) like extract_in_worker.
+    """
+    from .streaming import extract_segment_features
+    timings = {} if collect_timings else None
+    segments, aggregate, duration = extract_segment_features(audio_path, segment_seconds, timings=timings,
+                                                           profile=profile)
+    if timings is not None:
+        timings["audio_seconds"] = duration
+    return segments, aggregate, duration, timings
+
+
+class InferencePool:
+    """
+    Runs blocking feature extraction off the event loop with a bounded admission queue.
+    All bookkeeping happens on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, capacity: int = INFERENCE_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = capacity
+        self.depth = 0
+        self.rejected = 0
+        self._executor = None
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.workers > 0:
+            context = multiprocessing.get_context(INFERENCE_START_METHOD)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @contextmanager
+    def admit(self):
+        """Reserves a queue slot for the duration of a request, or raises QueueFullError."""
+        if self.depth >= self.capacity:
+            self.rejected += 1
+            raise QueueFullError(self.depth)
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+
+    async def run(self, fn, *args):
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge file); replace the pool for the next request
+            print("Inference pool broken, restarting workers")
+            self.shutdown()
+            raise
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_depth": self.depth,
+            "queue_capacity": self.capacity,
+            "rejected": self.rejected,
+        }
+
+
+# Global instance
+inference_pool = InferencePool()
@@ -0,0 +1,451 @@
+"""
+Asynchronous detection jobs backed by a local SQLite queue.
+
+POST /api/jobs stores the upload and a queued row, and answers at once with a job
+ID; job workers (JOB_WORKERS asyncio tasks per API process) claim rows, run the
+same pipeline as /api/voice-detection and store the result, which
+GET /api/jobs/{id} returns. Both the uploads and the queue live in JOB_STORE_DIR,
+so queued work survives a restart.
+
+A claim is a lease: the worker renews it while the job runs, and a job whose lease
+expired (its process died) is claimed again, up to JOB_MAX_ATTEMPTS times. The
+attempt number identifies the claim, so a worker whose job was claimed again can no
+longer renew, release or finish it.
+Claims happen in IMMEDIATE transactions, so the pre-fork workers of one machine
+can share the queue. A submission of the same audio with the same options and
+callback as a job that is still waiting or running, or that succeeded on the model
+serving now, is answered with that job.
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import time
+import traceback
+import uuid
+from urllib.parse import urlsplit
+
+# Directory holding the queue database and the uploads waiting to be analysed
+JOB_STORE_DIR = os.environ.get("JOB_STORE_DIR") or os.path.join(os.path.dirname(__file__), 'jobs')
+# Concurrent jobs per API process (0 = this process only accepts jobs; another one runs them)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Seconds a claim is valid without renewal; a worker that died loses its jobs after this
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", 60))
+# Claims per job before it is failed (a job that crashes its worker is not retried forever)
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+# Seconds finished jobs (and their results) are kept for polling and deduplication
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+# Seconds an idle worker waits before looking for new jobs
+JOB_POLL_SECONDS = 0.5
+# Attempts to deliver a completion callback, with exponential backoff from CALLBACK_BACKOFF_SECONDS
+CALLBACK_ATTEMPTS = 3
+CALLBACK_BACKOFF_SECONDS = 1.0
+CALLBACK_TIMEOUT_SECONDS = 10.0
+# Comma-separated hosts callbacks may go to; when unset, any host that resolves to public addresses only
+CALLBACK_ALLOWED_HOSTS = {h.strip().lower() for h in os.environ.get("CALLBACK_ALLOWED_HOSTS", "").split(",") if h.strip()}
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedup_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    audio_hash TEXT NOT NULL,
+    filename TEXT,
+    upload_path TEXT,
+    language TEXT,
+    profile TEXT,
+    max_seconds REAL,
+    explain TEXT,
+    callback_url TEXT,
+    callback_status TEXT,
+    result TEXT,
+    cache_namespace TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    leased_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_by_dedup_key ON jobs (dedup_key);
+"""
+
+
+def dedup_key(audio_hash: str, profile, max_seconds, explain) -> str:
+    """Jobs with the same audio and options produce the same result."""
+    return f"{audio_hash}|{profile or ''}|{max_seconds or ''}|{explain or ''}"
+
+
+def check_callback_url(url: str):
+    """
+    Raises ValueError unless url is an http(s) URL the server may POST to: a host in
+    CALLBACK_ALLOWED_HOSTS or, without an allowlist, one whose every address is public
+    (no loopback, private, link-local or cloud metadata targets). Resolves the host, so
+    it blocks; it is checked again before each delivery, in case the name now points elsewhere.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if CALLBACK_ALLOWED_HOSTS:
+        if host not in CALLBACK_ALLOWED_HOSTS:
+            raise ValueError(f"callback_url host '{host}' is not allowed")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or None, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host '{host}' cannot be resolved")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"callback_url host '{host}' resolves to a non-public address")
+
+
+class JobQueue:
+    """The durable queue (one SQLite file) and this process's job workers."""
+
+    def __init__(self, directory: str = JOB_STORE_DIR, workers: int = JOB_WORKERS):
+        self.directory = directory
+        self.workers = workers
+        self.callback_transport = None  # httpx transport override (tests)
+        self._schema_ready = None
+        self._tasks = []
+
+    @property
+    def db_path(self) -> str:
+        return os.path.join(self.directory, "jobs.sqlite3")
+
+    def _connect(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Autocommit; multi-statement changes open their own IMMEDIATE transaction
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        if self._schema_ready != self.db_path:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._schema_ready = self.db_path
+        return connection
+
+    def find(self, key: str, callback_url=None, namespace=None, connection=None):
+        """
+        The newest job that answers a submission with this dedup key and callback: one
+        still queued or running, or one that succeeded on the model with cache namespace
+        namespace (results of other versions are stale). None if there is none.
+        """
+        own = connection is None
+        connection = connection or self._connect()
+        try:
+            return connection.execute(
+                "SELECT * FROM jobs WHERE dedup_key = ? AND callback_url IS ?"
+                " AND (status IN (?, ?) OR (status = ? AND cache_namespace = ?))"
+                " ORDER BY created_at DESC LIMIT 1",
+                (key, callback_url, QUEUED, RUNNING, SUCCEEDED, namespace),
+            ).fetchone()
+        finally:
+            if own:
+                connection.close()
+
+    def get(self, job_id: str):
+        connection = self._connect()
+        try:
+            return connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            connection.close()
+
+    def upload_path(self, job_id: str, filename) -> str:
+        suffix = os.path.splitext(filename or "")[1] or ".bin"
+        return os.path.join(self.directory, "uploads", f"{job_id}{suffix}")
+
+    def submit(self, upload_file, audio_hash: str, language=None, profile=None, max_seconds=None,
+               explain=None, callback_url=None, namespace=None):
+        """
+        Queues an upload (a FastAPI UploadFile) and returns (job row, deduplicated).
+        The upload is copied into the store before the job row is committed.
+        namespace is the serving model's cache namespace, which finished jobs must match to be reused.
+        """
+        key = dedup_key(audio_hash, profile, max_seconds, explain)
+        existing = self.find(key, callback_url, namespace)
+        if existing is not None:
+            return existing, True
+
+        job_id = uuid.uuid4().hex
+        path = self.upload_path(job_id, upload_file.filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(upload_file.file, buffer)
+
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # Re-checked inside the transaction: a concurrent submission of the same clip may have won
+            existing = self.find(key, callback_url, namespace, connection)
+            if existing is None:
+                connection.execute(
+                    "INSERT INTO jobs (id, dedup_key, status, audio_hash, filename, upload_path, language, profile,"
+                    " max_seconds, explain, callback_url, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, key, QUEUED, audio_hash, upload_file.filename, path, language, profile, max_seconds,
+                     explain, callback_url, time.time()),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            os.remove(path)
+            raise
+        finally:
+            connection.close()
+        if existing is not None:
+            os.remove(path)
+            return existing, True
+        return self.get(job_id), False
+
+    def claim(self):
+        """
+        Leases the oldest queued job (or one whose lease expired) to the caller and
+        returns it, or None. Jobs out of attempts are failed instead of claimed.
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            while True:
+                job = connection.execute(
+                    "SELECT * FROM jobs WHERE status = ? OR (status = ? AND leased_until < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now),
+                ).fetchone()
+                if job is None or job["attempts"] < JOB_MAX_ATTEMPTS:
+                    break
+                connection.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, leased_until = NULL WHERE id = ?",
+                    (FAILED, f"Gave up after {job['attempts']} attempts", now, job["id"]),
+                )
+                self._remove_upload(job)
+            if job is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, leased_until = ?"
+                    " WHERE id = ?",
+                    (RUNNING, now, now + JOB_LEASE_SECONDS, job["id"]),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return self.get(job["id"]) if job is not None else None
+
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        connection = self._connect()
+        try:
+            connection.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        finally:
+            connection.close()
+
+    def _update_claimed(self, job, **fields) -> bool:
+        """Updates a job only while it is still held by the claim job was returned for; False if it is not."""
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ? AND attempts = ? AND status = ?",
+                (*fields.values(), job["id"], job["attempts"], RUNNING),
+            )
+            return cursor.rowcount > 0
+        finally:
+            connection.close()
+
+    def renew(self, job) -> bool:
+        """Extends a claimed job's lease; False if the lease was lost."""
+        return self._update_claimed(job, leased_until=time.time() + JOB_LEASE_SECONDS)
+
+    def release(self, job) -> bool:
+        """Puts a claimed job back in the queue without counting the attempt (shutdown, busy pool)."""
+        return self._update_claimed(job, status=QUEUED, attempts=max(job["attempts"] - 1, 0), leased_until=None)
+
+    def finish(self, job, result: dict = None, error: str = None, namespace: str = None) -> bool:
+        """
+        Records a claimed job's outcome; namespace is the cache namespace of the model that
+        produced result. Returns False, and leaves the job and its upload alone, if the
+        lease was lost and the job claimed again meanwhile.
+        """
+        finished = self._update_claimed(job, status=FAILED if error else SUCCEEDED, error=error,
+                                        result=json.dumps(result) if result is not None else None,
+                                        cache_namespace=namespace, finished_at=time.time(), leased_until=None)
+        if finished:
+            self._remove_upload(job)
+        return finished
+
+    @staticmethod
+    def _remove_upload(job):
+        if job["upload_path"] and os.path.exists(job["upload_path"]):
+            os.remove(job["upload_path"])
+
+    def purge(self, retention: float = JOB_RETENTION_SECONDS):
+        """Deletes finished jobs older than retention seconds."""
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                               (SUCCEEDED, FAILED, time.time() - retention))
+        finally:
+            connection.close()
+
+    def stats(self):
+        """Queue depth and the age of the oldest waiting job, for autoscaling."""
+        now = time.time()
+        connection = self._connect()
+        try:
+            counts = dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = connection.execute("SELECT MIN(created_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        finally:
+            connection.close()
+        return {
+            "workers": self.workers,
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "succeeded": counts.get(SUCCEEDED, 0),
+            "failed": counts.get(FAILED, 0),
+            "oldest_queued_seconds": round(now - oldest, 1) if oldest else 0.0,
+        }
+
+    # Workers
+
+    def start(self):
+        """Starts this process's job workers on the running event loop."""
+        if self._tasks or self.workers <= 0:
+            return
+        self.purge()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        while True:
+            try:
+                if not await self.process_next():
+                    await asyncio.sleep(JOB_POLL_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # A broken store must not kill the worker; the job's lease expires and it is retried
+                traceback.print_exc()
+                await asyncio.sleep(JOB_POLL_SECONDS)
+
+    async def process_next(self) -> bool:
+        """Claims and runs one job; False when the queue is empty."""
+        job = await asyncio.to_thread(self.claim)
+        if job is None:
+            return False
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            outcome = await self._run(job)
+        except asyncio.CancelledError:
+            # Shutting down: the job goes back to the queue for the next process
+            await asyncio.to_thread(self.release, job)
+            raise
+        finally:
+            heartbeat.cancel()
+        if outcome is None:
+            await asyncio.to_thread(self.release, job)
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            return True
+        if not await asyncio.to_thread(self.finish, job, *outcome):
+            print(f"Job {job['id']} was claimed again after its lease ran out; dropping this attempt's outcome")
+            return True
+        if job["callback_url"]:
+            await self._notify(job["id"])
+        return True
+
+    async def _heartbeat(self, job):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            if not await asyncio.to_thread(self.renew, job):
+                return
+
+    async def _run(self, job):
+        """
+        (result, error, cache namespace) for a claimed job, or None to retry it later
+        (the inference queue is full). The stored upload is decoded in place.
+        """
+        from .classifier import classifiers, DEFAULT_PROFILE
+        from .inference_pool import inference_pool, QueueFullError
+        from .pipeline import AnalysisError, analyze_clip, cached_response
+        from .utils import DECODE_PATH_FILE
+
+        args = (job["language"], job["profile"], job["max_seconds"], job["explain"])
+        try:
+            response = await asyncio.to_thread(cached_response, job["audio_hash"], *args)
+            if response is None:
+                with inference_pool.admit():
+                    response = await analyze_clip(job["upload_path"], DECODE_PATH_FILE, job["audio_hash"], *args)
+        except QueueFullError:
+            return None
+        except (AnalysisError, ValueError, OSError) as e:
+            return None, getattr(e, "message", None) or str(e), None
+        # Only a result of the version serving now may answer later submissions
+        classifier = classifiers[job["profile"] or DEFAULT_PROFILE]
+        namespace = classifier.cache_namespace if classifier.model_version == response.modelVersion else None
+        return response.model_dump(), None, namespace
+
+    async def _notify(self, job_id: str):
+        """POSTs the finished job's status document to its callback URL, with retries."""
+        import httpx
+
+        job = await asyncio.to_thread(self.get, job_id)
+        try:
+            await asyncio.to_thread(check_callback_url, job["callback_url"])
+        except ValueError as e:
+            print(f"Callback for job {job_id} not sent: {e}")
+            await asyncio.to_thread(self._update, job_id, callback_status="blocked")
+            return
+        payload = job_document(job)
+        status = None
+        async with httpx.AsyncClient(timeout=CALLBACK_TIMEOUT_SECONDS, transport=self.callback_transport) as client:
+            for attempt in range(CALLBACK_ATTEMPTS):
+                try:
+                    response = await client.post(job["callback_url"], json=payload)
+                    status = str(response.status_code)
+                    if response.status_code < 500:
+                        break
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                if attempt + 1 < CALLBACK_ATTEMPTS:
+                    await asyncio.sleep(CALLBACK_BACKOFF_SECONDS * 2 ** attempt)
+        if status != "200":
+            print(f"Callback for job {job_id} to {job['callback_url']} ended with {status}")
+        await asyncio.to_thread(self._update, job_id, callback_status=status)
+
+
+def _timestamp(seconds):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds)) if seconds else None
+
+
+def job_document(job) -> dict:
+    """A job row as the fields of JobStatusResponse."""
+    return {
+        "status": "success",
+        "jobId": job["id"],
+        "jobStatus": job["status"],
+        "createdAt": _timestamp(job["created_at"]),
+        "startedAt": _timestamp(job["started_at"]),
+        "finishedAt": _timestamp(job["finished_at"]),
+        "attempts": job["attempts"],
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "message": job["error"],
+        "callbackStatus": job["callback_status"],
+    }
+
+
+# Global instance
+job_queue = JobQueue()
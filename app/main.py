@@ -1,14 +1,74 @@
-from fastapi import FastAPI, Depends, File, UploadFile, Form
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
-from .models import VoiceAnalysisResponse
-from .auth import get_api_key
-from .utils import save_upload_file, cleanup_file
-from .classifier import classifier
+from fastapi import FastAPI, Depends, File, UploadFile, Form, Request
+from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, StreamingResponse, PlainTextResponse
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from .models import (
+    VoiceAnalysisResponse, SegmentedAnalysisResponse, ModelReloadRequest, ModelReloadResponse,
+    JobSubmitResponse, JobStatusResponse
+)
+from .auth import get_api_key, get_admin_key
+from .utils import load_upload, hash_upload, save_upload_file
+from .cache import result_cache
+from .fingerprint import fingerprint_index
+from .classifier import (
+    classifier, classifiers, get_classifier, check_explain, ProfileUnavailableError, ModelReloadError
+)
+from .feature_extractor import DEFAULT_PROFILE
+from . import model_registry
+from .metrics import metrics, MetricsMiddleware
+from .inference_pool import inference_pool, QueueFullError, RETRY_AFTER_SECONDS
+from .pipeline import batcher, analyze_clip, analyze_segments, cached_response, AnalysisError
+from .batch_detection import stream_batch, BATCH_MAX_ITEMS
+from .jobs import job_queue, job_document, check_callback_url
+from .streaming import SEGMENT_SECONDS, MIN_SEGMENT_SECONDS, MIN_BUDGET_SECONDS, effective_budget
+from contextlib import asynccontextmanager, ExitStack
+import asyncio
+import time
 import traceback
 import os
 from typing import Optional
 
-app = FastAPI(title="AI Voice Detection API", version="1.0")
+
+async def _staged_startup():
+    # Load and warm up off the event loop so /health and /ready answer meanwhile.
+    # The pool is started afterwards so forked workers inherit the compiled kernels.
+    await asyncio.to_thread(classifier.startup)
+    inference_pool.start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup = asyncio.create_task(_staged_startup())
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    startup.cancel()
+    inference_pool.shutdown()
+
+
+app = FastAPI(title="AI Voice Detection API", version="1.0", lifespan=lifespan)
+
+
+def _profile_error(pe: ProfileUnavailableError):
+    return JSONResponse(status_code=400, content={"status": "error", "message": str(pe)})
+
+
+def _budget_error():
+    return JSONResponse(
+        status_code=400,
+        content={"status": "error", "message": f"max_seconds must be at least {MIN_BUDGET_SECONDS}"}
+    )
+
+
+def _explain_error(ve: ValueError):
+    return JSONResponse(status_code=400, content={"status": "error", "message": str(ve)})
+
+
+def _busy_response(qe: QueueFullError):
+    return JSONResponse(
+        status_code=503,
+        content={"status": "error", "message": "Server busy, please retry later"},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS), "X-Queue-Depth": str(qe.depth)}
+    )
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -20,57 +80,336 @@ async def root():
 async def detect_voice(
     file: UploadFile = File(...),
     language: Optional[str] = Form("English"),
+    profile: Optional[str] = Form(None),
+    max_seconds: Optional[float] = Form(None),
+    explain: Optional[str] = Form(None),
     api_key: str = Depends(get_api_key)
 ):
-    temp_path = None
+    """
+    profile selects the feature extraction profile ("full" or "fast");
+    the deployment's FEATURE_PROFILE is used when it is omitted.
+    max_seconds caps the audio analysed (evenly spread windows of a longer clip);
+    the deployment's ANALYSIS_BUDGET_SECONDS is a ceiling on it.
+    explain is "none", "summary" (one-sentence explanation) or "full" (plus per-feature
+    attributions); the deployment's EXPLAIN_DEFAULT is used when it is omitted.
+    """
     try:
-        # 1. Save Uploaded File
-        try:
-            temp_path = save_upload_file(file)
-        except ValueError as ve:
-            return JSONResponse(
-                status_code=400,
-                content={"status": "error", "message": str(ve)}
-            )
+        get_classifier(profile)
+    except ProfileUnavailableError as pe:
+        return _profile_error(pe)
+    try:
+        explain = check_explain(explain)
+    except ValueError as ve:
+        return _explain_error(ve)
+    if max_seconds is not None and max_seconds < MIN_BUDGET_SECONDS:
+        return _budget_error()
+    budget = effective_budget(max_seconds)
 
-        # 2. Predict
-        try:
-            label, confidence, explanation = classifier.predict_voice(temp_path)
-        except Exception as e:
-            print(f"Prediction Error: {e}")
-            traceback.print_exc()
-            return JSONResponse(
-                status_code=500,
-                content={"status": "error", "message": "Internal processing error during analysis"}
-            )
-
-        if label is None:
-             return JSONResponse(
-                status_code=500,
-                content={"status": "error", "message": "Model not initialized properly"}
-            )
-        
-        # 3. Construct Response
-        return VoiceAnalysisResponse(
-            status="success",
-            language=language,
-            classification=label,
-            confidenceScore=round(confidence, 2),
-            explanation=explanation
+    try:
+        # 0. Resubmitted clips are answered from the cache without a queue slot
+        metrics.upload_bytes.observe(file.size or 0)
+        audio_hash = await asyncio.to_thread(hash_upload, file)
+        cached = await asyncio.to_thread(cached_response, audio_hash, language, profile, budget, explain)
+        if cached is not None:
+            return cached
+
+        with inference_pool.admit():
+            # 1. Read the upload (in memory when soundfile can decode it, else a temp file)
+            try:
+                started = time.perf_counter()
+                source, decode_path = await asyncio.to_thread(load_upload, file)
+                metrics.observe_stage("upload", time.perf_counter() - started)
+            except ValueError as ve:
+                return JSONResponse(
+                    status_code=400,
+                    content={"status": "error", "message": str(ve)}
+                )
+
+            # 2. Predict: extract in the inference pool, then score in a micro-batch
+            # 3. Construct Response (temp files are cleaned up by analyze_clip)
+            return await analyze_clip(source, decode_path, audio_hash, language, profile, budget, explain)
+
+    except AnalysisError as ae:
+        return JSONResponse(
+            status_code=ae.status_code,
+            content={"status": "error", "message": ae.message}
         )
 
+    except QueueFullError as qe:
+        return _busy_response(qe)
+
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": f"Unexpected error: {str(e)}"}
         )
-        
-    finally:
-        # 4. Cleanup
-        if temp_path:
-            cleanup_file(temp_path)
+
+@app.post("/api/voice-detection/segments", response_model=SegmentedAnalysisResponse)
+async def detect_voice_segments(
+    file: UploadFile = File(...),
+    language: Optional[str] = Form("English"),
+    segment_seconds: Optional[float] = Form(SEGMENT_SECONDS),
+    profile: Optional[str] = Form(None),
+    explain: Optional[str] = Form(None),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Streaming analysis for long recordings: the file is decoded block by block with
+    constant memory, and every segment gets its own classification alongside the
+    aggregate verdict for the whole recording. explain applies to the aggregate.
+    """
+    if segment_seconds is None or segment_seconds < MIN_SEGMENT_SECONDS:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": f"segment_seconds must be at least {MIN_SEGMENT_SECONDS}"}
+        )
+    try:
+        get_classifier(profile)
+    except ProfileUnavailableError as pe:
+        return _profile_error(pe)
+    try:
+        explain = check_explain(explain)
+    except ValueError as ve:
+        return _explain_error(ve)
+
+    try:
+        with inference_pool.admit():
+            # The upload is streamed from disk, never fully decoded in memory
+            try:
+                metrics.upload_bytes.observe(file.size or 0)
+                started = time.perf_counter()
+                temp_path = await asyncio.to_thread(save_upload_file, file)
+                metrics.observe_stage("upload", time.perf_counter() - started)
+            except ValueError as ve:
+                return JSONResponse(
+                    status_code=400,
+                    content={"status": "error", "message": str(ve)}
+                )
+            return await analyze_segments(temp_path, language, segment_seconds, profile, explain)
+
+    except AnalysisError as ae:
+        return JSONResponse(
+            status_code=ae.status_code,
+            content={"status": "error", "message": ae.message}
+        )
+
+    except QueueFullError as qe:
+        return _busy_response(qe)
+
+    except Exception as e:
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": f"Unexpected error: {str(e)}"}
+        )
+
+@app.post("/api/voice-detection/batch")
+async def detect_voice_batch(request: Request, api_key: str = Depends(get_api_key)):
+    """
+    Accepts many 'files' (audio, or zip/tar archives of audio) in one multipart request
+    and streams one JSON line per clip (application/x-ndjson) as soon as it is classified.
+    Each line has the single-detection response fields plus 'index' and 'filename'.
+    """
+    # The form is parsed here rather than through File(...) parameters so the uploads
+    # stay open while the response streams; they are closed when the stream ends.
+    form = await request.form(max_files=BATCH_MAX_ITEMS, max_fields=BATCH_MAX_ITEMS)
+    uploads = [v for v in form.getlist("files") if isinstance(v, StarletteUploadFile)]
+    language = form.get("language") or "English"
+    profile = form.get("profile") or None
+    try:
+        get_classifier(profile)
+    except ProfileUnavailableError as pe:
+        await form.close()
+        return _profile_error(pe)
+    try:
+        explain = check_explain(form.get("explain") or None)
+    except ValueError as ve:
+        await form.close()
+        return _explain_error(ve)
+    try:
+        max_seconds = float(form["max_seconds"]) if form.get("max_seconds") else None
+    except ValueError:
+        max_seconds = 0.0
+    if max_seconds is not None and max_seconds < MIN_BUDGET_SECONDS:
+        await form.close()
+        return _budget_error()
+    budget = effective_budget(max_seconds)
+    if not uploads:
+        await form.close()
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": "No files provided (use the 'files' field)"}
+        )
+
+    # The whole batch takes one admission slot; its items share BATCH_CONCURRENCY workers
+    slot = ExitStack()
+    try:
+        slot.enter_context(inference_pool.admit())
+    except QueueFullError as qe:
+        await form.close()
+        return _busy_response(qe)
+
+    async def body():
+        try:
+            async for line in stream_batch(uploads, language, profile, budget, explain):
+                yield line
+        finally:
+            slot.close()
+            await form.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(
+    request: Request,
+    file: UploadFile = File(...),
+    language: Optional[str] = Form("English"),
+    profile: Optional[str] = Form(None),
+    max_seconds: Optional[float] = Form(None),
+    explain: Optional[str] = Form(None),
+    callback_url: Optional[str] = Form(None),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Queues a clip for analysis and answers at once (202) with the job ID; poll
+    GET /api/jobs/{jobId} for the result. Options are those of /api/voice-detection.
+    callback_url, if given, receives the final job status as a JSON POST; it must be a
+    public host, or one in CALLBACK_ALLOWED_HOSTS.
+    Resubmitting a clip with the same options and callback returns the existing job while
+    it is pending, or once it has succeeded on the model serving now.
+    """
+    try:
+        selected = get_classifier(profile)
+    except ProfileUnavailableError as pe:
+        return _profile_error(pe)
+    try:
+        explain = check_explain(explain)
+    except ValueError as ve:
+        return _explain_error(ve)
+    if max_seconds is not None and max_seconds < MIN_BUDGET_SECONDS:
+        return _budget_error()
+    if callback_url:
+        try:
+            await asyncio.to_thread(check_callback_url, callback_url)
+        except ValueError as ve:
+            return JSONResponse(status_code=400, content={"status": "error", "message": str(ve)})
+    budget = effective_budget(max_seconds)
+
+    try:
+        metrics.upload_bytes.observe(file.size or 0)
+        audio_hash = await asyncio.to_thread(hash_upload, file)
+        job, deduplicated = await asyncio.to_thread(
+            job_queue.submit, file, audio_hash, language, profile, budget, explain, callback_url,
+            selected.cache_namespace
+        )
+    except Exception as e:
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": f"Failed to queue job: {str(e)}"}
+        )
+    return JobSubmitResponse(
+        status="success",
+        jobId=job["id"],
+        jobStatus=job["status"],
+        deduplicated=deduplicated,
+        statusUrl=str(request.url_for("job_status", job_id=job["id"]))
+    )
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+def job_status(job_id: str, api_key: str = Depends(get_api_key)):
+    """Status of a queued job, with the analysis once it has succeeded."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Unknown job"})
+    return job_document(job)
+
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness probe: 200 once the model is loaded and warmed up, 503 before that
+    (or if loading failed), so traffic is only routed to warm instances.
+    """
+    status = classifier.status()
+    return JSONResponse(status_code=200 if classifier.ready else 503, content=status)
 
 @app.get("/health")
 def health_check():
-    return {"status": "running", "message": "AI Voice Detection API is active"}
+    return {
+        "status": "degraded" if classifier.state == "failed" else "running",
+        "message": "AI Voice Detection API is active",
+        "model": classifier.status(),
+        "profiles": {profile: c.state for profile, c in classifiers.items()},
+        "inference": inference_pool.stats(),
+        "batching": batcher.stats(),
+        "cache": result_cache.stats(),
+        "fingerprints": fingerprint_index.stats(),
+        "jobs": job_queue.stats()
+    }
+
+@app.get("/admin/models")
+def list_models(admin_key: str = Depends(get_admin_key)):
+    """Registry versions with their metadata, and the version each profile is serving."""
+    return {
+        "registry": model_registry.REGISTRY_DIR,
+        "serving": {profile: c.model_version for profile, c in classifiers.items()},
+        "versions": [entry.metadata for entry in model_registry.list_versions()],
+    }
+
+@app.post("/admin/models/reload", response_model=ModelReloadResponse)
+async def reload_model(body: ModelReloadRequest, admin_key: str = Depends(get_admin_key)):
+    """
+    Loads a registry version in the background, validates it on the probe clip and
+    swaps it in; requests in flight finish on the previous version. 409 if the
+    candidate is rejected, in which case the previous version keeps serving.
+    """
+    profile = body.profile or DEFAULT_PROFILE
+    if profile not in classifiers:
+        return _profile_error(ProfileUnavailableError(f"Unknown feature profile '{profile}'"))
+    target = classifiers[profile]
+    previous = target.model_version
+    try:
+        bundle = await asyncio.to_thread(target.reload, body.version)
+    except ModelReloadError as e:
+        return JSONResponse(status_code=409, content=ModelReloadResponse(
+            status="error", profile=profile, previousVersion=previous, modelVersion=previous, message=str(e)
+        ).dict())
+    return ModelReloadResponse(
+        status="success",
+        profile=profile,
+        previousVersion=previous,
+        modelVersion=bundle.version,
+        reloadMs=target.timings.get("reload_ms")
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus scrape endpoint (404 when METRICS_ENABLED=0)."""
+    if not metrics.enabled:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Metrics are disabled"})
+    pool, cache, fingerprints = inference_pool.stats(), result_cache.stats(), fingerprint_index.stats()
+    jobs = job_queue.stats()
+    return PlainTextResponse(
+        metrics.render(counters={
+            "voice_api_queue_rejected_total": ("Requests rejected with 503", pool["rejected"]),
+            "voice_api_cache_hits_total": ("Result cache hits", cache["hits"] + cache["disk_hits"]),
+            "voice_api_cache_misses_total": ("Result cache misses", cache["misses"]),
+            "voice_api_fingerprint_matches_total": ("Near-duplicate clips answered from the fingerprint index",
+                                                    fingerprints["matches"]),
+        }, gauges={
+            "voice_api_queue_depth": ("Requests admitted to the inference queue", pool["queue_depth"]),
+            "voice_api_queue_capacity": ("Inference queue capacity", pool["queue_capacity"]),
+            "voice_api_job_queue_depth": ("Asynchronous jobs waiting for a worker", jobs["queued"]),
+            "voice_api_job_queue_oldest_age_seconds": ("Age of the oldest waiting asynchronous job",
+                                                       jobs["oldest_queued_seconds"]),
+            "voice_api_jobs_running": ("Asynchronous jobs being analysed", jobs["running"]),
+            "voice_api_model_ready": ("1 once the model is loaded and warmed up", int(classifier.ready)),
+        }),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+# Installed last so it can label requests by the routes defined above
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware, endpoints=[route.path for route in app.routes])
@@ -0,0 +1,224 @@
+"""
+Prometheus text-format metrics without a client library.
+
+Metrics are plain counters, gauges and cumulative histograms guarded by a lock.
+With METRICS_ENABLED=0 every observe/inc returns immediately, the request
+middleware is not installed and /metrics answers 404.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = tuple(16384 * 4 ** i for i in range(8))  # 16 KiB .. 256 MiB
+AUDIO_SECONDS_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Pipeline stages timed around the feature extractor, in request order
+PIPELINE_STAGES = ("upload", "decode", "extract", "inference", "explanation")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value, *label_values):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        if not self.registry.enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, n)) for key, (counts, total, n) in self._values.items())
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+class Metrics:
+    """The service's metric registry."""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+
+        self.requests = Counter(self, "voice_api_requests_total",
+                                "HTTP requests by endpoint, outcome and status code",
+                                ("endpoint", "outcome", "status"))
+        self.in_flight = Gauge(self, "voice_api_requests_in_flight",
+                               "HTTP requests currently being served", ("endpoint",))
+        self.request_seconds = Histogram(self, "voice_api_request_duration_seconds",
+                                         "Time to the response start, per endpoint", ("endpoint",))
+        self.stage_seconds = Histogram(self, "voice_api_stage_duration_seconds",
+                                       "Time spent per pipeline stage: " + ", ".join(PIPELINE_STAGES),
+                                       ("stage",))
+        self.feature_stage_seconds = Histogram(self, "voice_api_feature_stage_duration_seconds",
+                                               "Time spent per feature extractor stage", ("stage",))
+        self.upload_bytes = Histogram(self, "voice_api_upload_bytes",
+                                      "Size of uploaded audio files", buckets=BYTES_BUCKETS)
+        self.audio_seconds = Histogram(self, "voice_api_audio_duration_seconds",
+                                       "Duration of analysed audio", buckets=AUDIO_SECONDS_BUCKETS)
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.stage_seconds.observe(seconds, stage)
+
+    def observe_extraction(self, timings):
+        """
+        Records a timings dict filled by the feature extractor (see feature_extractor.STAGES).
+        Decode counts as its own pipeline stage; the remaining stages make up 'extract'.
+        """
+        if not self.enabled or not timings:
+            return
+        extract = 0.0
+        for stage, seconds in timings.items():
+            if stage == "audio_seconds":
+                self.audio_seconds.observe(seconds)
+            elif stage == "decode":
+                self.observe_stage("decode", seconds)
+            else:
+                self.feature_stage_seconds.observe(seconds, stage)
+                extract += seconds
+        self.observe_stage("extract", extract)
+
+    def render(self, gauges=None, counters=None):
+        """
+        Prometheus text exposition. gauges adds point-in-time {name: (help, value)} readings;
+        counters adds running totals kept elsewhere (names end in _total), in the same form.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for kind, readings in (("counter", counters), ("gauge", gauges)):
+            for name, (help_text, value) in (readings or {}).items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _outcome(status: int) -> str:
+    if status < 400:
+        return "success"
+    if status == 503:
+        return "rejected"
+    return "client_error" if status < 500 else "error"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests, in-flight requests and time to response start."""
+
+    def __init__(self, app, registry=None, endpoints=()):
+        self.app = app
+        self.registry = registry or metrics
+        # Only known paths get their own label; anything else is 'other' (bounded cardinality)
+        self.endpoints = set(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        endpoint = path if path in self.endpoints else "other"
+        registry = self.registry
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                registry.request_seconds.observe(time.perf_counter() - started, endpoint)
+            await send(message)
+
+        registry.in_flight.inc(endpoint)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight.dec(endpoint)
+            registry.requests.inc(endpoint, _outcome(status), str(status))
+
+
+# Global instance
+metrics = Metrics()
@@ -0,0 +1,163 @@
+"""
+Directory of versioned model artifacts.
+
+Each version is a directory holding the trained pipeline, an optional cascade
+first stage and a metadata.json describing it:
+
+    model_registry/
+        v20260301-120000/
+            model.joblib
+            stage1.joblib        (optional)
+            metadata.json        {"version", "feature_profile", "n_features",
+                                  "extractor_version", "trained_at", "metrics"}
+            model_selection.json (optional: the training-time candidate table)
+        active.json              {"full": "v20260301-120000"}  (pins set by reloads)
+
+Versions are written to a temporary directory and renamed into place, so a
+reader never sees a half-written version.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR") or os.path.join(os.path.dirname(__file__), 'model_registry')
+
+MODEL_FILE = "model.joblib"
+STAGE1_FILE = "stage1.joblib"
+METADATA_FILE = "metadata.json"
+ACTIVE_FILE = "active.json"
+
+
+class ModelVersion:
+    """A version directory in the registry."""
+
+    def __init__(self, path: str, metadata: dict):
+        self.path = path
+        self.metadata = metadata
+
+    @property
+    def version(self) -> str:
+        return self.metadata["version"]
+
+    @property
+    def profile(self) -> str:
+        return self.metadata.get("feature_profile", "full")
+
+    @property
+    def model_path(self) -> str:
+        return os.path.join(self.path, MODEL_FILE)
+
+    @property
+    def stage1_path(self):
+        path = os.path.join(self.path, STAGE1_FILE)
+        return path if os.path.exists(path) else None
+
+
+def list_versions(profile: str = None, registry_dir: str = None):
+    """Complete versions, oldest first, optionally only those of one feature profile."""
+    registry_dir = registry_dir or REGISTRY_DIR
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = []
+    for name in os.listdir(registry_dir):
+        path = os.path.join(registry_dir, name)
+        if name.startswith(".") or not os.path.exists(os.path.join(path, MODEL_FILE)):
+            continue
+        try:
+            with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+                entry = ModelVersion(path, json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Skipping registry entry {name}: {e}")
+            continue
+        if profile is None or entry.profile == profile:
+            versions.append(entry)
+    return sorted(versions, key=lambda v: (v.metadata.get("trained_at", ""), v.version))
+
+
+def get_version(version: str, registry_dir: str = None) -> ModelVersion:
+    """Raises KeyError if the registry has no such version."""
+    for entry in list_versions(registry_dir=registry_dir):
+        if entry.version == version:
+            return entry
+    raise KeyError(f"Model version '{version}' is not in the registry")
+
+
+def _read_active(registry_dir: str):
+    try:
+        with open(os.path.join(registry_dir, ACTIVE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def active_version(profile: str, registry_dir: str = None):
+    """The pinned version for a profile if it still exists, else the newest one, else None."""
+    registry_dir = registry_dir or REGISTRY_DIR
+    versions = list_versions(profile, registry_dir)
+    pinned = _read_active(registry_dir).get(profile)
+    for entry in versions:
+        if entry.version == pinned:
+            return entry
+    return versions[-1] if versions else None
+
+
+def set_active(profile: str, version: str, registry_dir: str = None):
+    """Pins a profile's version so restarts keep serving it."""
+    registry_dir = registry_dir or REGISTRY_DIR
+    active = _read_active(registry_dir)
+    active[profile] = version
+    fd, temp_path = tempfile.mkstemp(dir=registry_dir, prefix=".active-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(active, f, indent=2)
+    os.replace(temp_path, os.path.join(registry_dir, ACTIVE_FILE))
+
+
+def new_version_name(profile: str = None) -> str:
+    """
+    Timestamp to the millisecond plus the profile, e.g. v20260301-120000-123-full, so
+    trainers saving in the same second (or `--profile all`) never collide; names of one
+    profile still sort by time.
+    """
+    now = time.time()
+    name = f"{time.strftime('v%Y%m%d-%H%M%S', time.gmtime(now))}-{int(now * 1000) % 1000:03d}"
+    return f"{name}-{profile}" if profile else name
+
+
+def save_version(model, metadata: dict, stage1=None, registry_dir: str = None, reports: dict = None) -> ModelVersion:
+    """
+    Writes a new version (model, optional cascade first stage, metadata) and returns it.
+    metadata must contain at least feature_profile; version and trained_at are filled in.
+    reports maps extra JSON file names to their contents, written into the version too.
+    """
+    import joblib
+
+    registry_dir = registry_dir or REGISTRY_DIR
+    os.makedirs(registry_dir, exist_ok=True)
+    metadata = dict(metadata)
+    if "version" not in metadata:
+        metadata["version"] = new_version_name(metadata.get("feature_profile"))
+        while os.path.exists(os.path.join(registry_dir, metadata["version"])):
+            time.sleep(0.001)
+            metadata["version"] = new_version_name(metadata.get("feature_profile"))
+    metadata.setdefault("trained_at", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+    final_path = os.path.join(registry_dir, metadata["version"])
+    if os.path.exists(final_path):
+        raise ValueError(f"Model version '{metadata['version']}' already exists")
+
+    temp_path = tempfile.mkdtemp(dir=registry_dir, prefix=".incoming-")
+    try:
+        joblib.dump(model, os.path.join(temp_path, MODEL_FILE))
+        if stage1 is not None:
+            joblib.dump(stage1, os.path.join(temp_path, STAGE1_FILE))
+        with open(os.path.join(temp_path, METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+        for name, report in (reports or {}).items():
+            with open(os.path.join(temp_path, name), "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        os.rename(temp_path, final_path)
+    except BaseException:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    return ModelVersion(final_path, metadata)
@@ -1,5 +1,11 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Literal
+from typing import List, Optional, Literal
+
+
+class FeatureAttribution(BaseModel):
+    feature: str
+    value: float
+    contribution: float # Change in P(HUMAN) along the forest's decision paths
 
 
 class VoiceAnalysisResponse(BaseModel):
@@ -8,4 +14,66 @@ class VoiceAnalysisResponse(BaseModel):
     classification: Optional[Literal["AI_GENERATED", "HUMAN"]] = None
     confidenceScore: Optional[float] = None
     explanation: Optional[str] = None
+    decodePath: Optional[Literal["memory", "tempfile", "file"]] = None
+    featureProfile: Optional[str] = None
+    analyzedSeconds: Optional[float] = None # Audio actually analysed (less than the clip under a budget)
+    cascadeStage: Optional[Literal[1, 2]] = None # Which cascade stage decided, when the cascade is on
+    modelVersion: Optional[str] = None # Model registry version that scored the clip
+    attributionBase: Optional[float] = None # With explain=full: P(HUMAN) before any feature is seen
+    attributions: Optional[List[FeatureAttribution]] = None # With explain=full, largest first
+    matchedFingerprint: Optional[str] = None # SHA-256 of the earlier clip this near-duplicate was matched to
+    fingerprintSimilarity: Optional[float] = None # Share of fingerprint landmarks the two clips have in common
+    cached: Optional[bool] = None
     message: Optional[str] = None # For error cases
+
+
+class BatchItemResponse(VoiceAnalysisResponse):
+    index: int
+    filename: Optional[str] = None
+
+
+class SegmentResult(BaseModel):
+    start: float
+    end: float
+    classification: Optional[Literal["AI_GENERATED", "HUMAN"]] = None
+    confidenceScore: Optional[float] = None
+
+
+class SegmentedAnalysisResponse(VoiceAnalysisResponse):
+    durationSeconds: Optional[float] = None
+    segments: List[SegmentResult] = []
+
+
+class ModelReloadRequest(BaseModel):
+    profile: Optional[str] = None # Default: the deployment's feature profile
+    version: Optional[str] = None # Default: the newest registry version for the profile
+
+
+class ModelReloadResponse(BaseModel):
+    status: Literal["success", "error"]
+    profile: str
+    previousVersion: Optional[str] = None
+    modelVersion: Optional[str] = None
+    reloadMs: Optional[float] = None
+    message: Optional[str] = None
+
+
+class JobSubmitResponse(BaseModel):
+    status: Literal["success", "error"]
+    jobId: str
+    jobStatus: Literal["queued", "running", "succeeded", "failed"]
+    deduplicated: bool = False # True when an earlier job for the same clip and options answers this one
+    statusUrl: str
+
+
+class JobStatusResponse(BaseModel):
+    status: Literal["success", "error"]
+    jobId: str
+    jobStatus: Literal["queued", "running", "succeeded", "failed"]
+    createdAt: Optional[str] = None
+    startedAt: Optional[str] = None
+    finishedAt: Optional[str] = None
+    attempts: int = 0
+    result: Optional[VoiceAnalysisResponse] = None
+    message: Optional[str] = None # Why the job failed
+    callbackStatus: Optional[str] = None # HTTP status (or error) of the last completion callback
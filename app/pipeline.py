@@ -0,0 +1,272 @@
+import asyncio
+import time
+import traceback
+
+from .models import VoiceAnalysisResponse, SegmentedAnalysisResponse, SegmentResult, FeatureAttribution
+from .utils import cleanup_file, DECODE_PATH_TEMPFILE
+from .cache import result_caches
+from .fingerprint import fingerprint_indexes, fingerprint_in_worker
+from .classifier import classifiers, EXPLAIN_MODES, check_explain
+from .feature_extractor import DEFAULT_PROFILE, CHEAP_FEATURE_COUNT
+from .inference_pool import inference_pool, extract_in_worker, segments_in_worker
+from .batching import MicroBatcher
+from .metrics import metrics
+
+# Scores feature vectors from concurrent requests in shared predict_proba calls
+# (one batcher per feature profile, since each profile has its own model)
+batchers = {profile: MicroBatcher(c.score_batch) for profile, c in classifiers.items()}
+batcher = batchers[DEFAULT_PROFILE]
+
+
+class AnalysisError(Exception):
+    """A per-clip failure, carrying the HTTP status it maps to."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def _cache_key(audio_hash: str, max_seconds):
+    # A budgeted analysis looks at different audio than a full one, so it is cached apart
+    return f"{audio_hash}-{max_seconds:g}s" if max_seconds else audio_hash
+
+
+def _explain_fields(explain: str, explanation, attributions):
+    """Response fields for an explain mode: attributions are only returned with explain=full."""
+    if explain == "none":
+        explanation = None
+    if explain != "full" or attributions is None:
+        return {"explanation": explanation}
+    return {
+        "explanation": explanation,
+        "attributionBase": round(attributions["base"], 4),
+        "attributions": [FeatureAttribution(**item) for item in attributions["features"]],
+    }
+
+
+def _stored_response(stored: dict, language, profile: str, explain: str, **fields):
+    """
+    Response for a stored result (result cache or fingerprint index), or None if it was
+    explained in less detail than explain asks for.
+    """
+    if EXPLAIN_MODES.index(stored.get("explain", "summary")) < EXPLAIN_MODES.index(explain):
+        return None
+    return VoiceAnalysisResponse(
+        status="success",
+        language=language,
+        classification=stored["classification"],
+        confidenceScore=round(stored["confidence"], 2),
+        **_explain_fields(explain, stored["explanation"], stored.get("attributions")),
+        featureProfile=profile,
+        analyzedSeconds=stored.get("analyzed_seconds"),
+        cascadeStage=stored.get("cascade_stage"),
+        modelVersion=stored.get("model_version"),
+        matchedFingerprint=stored.get("matched_fingerprint"),
+        fingerprintSimilarity=stored.get("fingerprint_similarity"),
+        cached=True,
+        **fields
+    )
+
+
+def cached_response(audio_hash: str, language, profile: str = None, max_seconds: float = None,
+                    explain: str = None):
+    """
+    Returns a response for a previously classified clip, or None. A cached result is
+    only served if it was explained in at least as much detail as explain asks for.
+    """
+    profile = profile or DEFAULT_PROFILE
+    explain = check_explain(explain)
+    namespace = classifiers[profile].cache_namespace
+    key = _cache_key(audio_hash, max_seconds)
+    cached = result_caches[profile].get(key, namespace) if namespace else None
+    if cached is None:
+        return None
+    return _stored_response(cached, language, profile, explain)
+
+
+async def _fingerprint_match(source, decode_path, audio_hash, language, profile, max_seconds, explain, bundle):
+    """
+    Fingerprints the clip and looks it up among clips classified before. Returns
+    (response or None, fingerprint); a near-duplicate's stored verdict is also cached
+    under this clip's hash, so resubmitting it is an exact cache hit. Runs while the
+    clip's features are extracted: in a second pool process when there is one, else
+    on a thread, so it never queues behind (or ahead of) the extraction.
+    """
+    index = fingerprint_indexes[profile]
+    if not index.enabled:
+        return None, None
+    started = time.perf_counter()
+    if inference_pool.workers > 1:
+        fingerprint = await inference_pool.run(fingerprint_in_worker, source)
+    else:
+        fingerprint = await asyncio.to_thread(fingerprint_in_worker, source)
+    metrics.observe_stage("fingerprint", time.perf_counter() - started)
+    if bundle is None:
+        return None, fingerprint
+    match = await asyncio.to_thread(index.lookup, fingerprint, bundle.cache_namespace, max_seconds)
+    if match is None:
+        return None, fingerprint
+    stored, matched_hash, similarity = match
+    stored = dict(stored, matched_fingerprint=matched_hash, fingerprint_similarity=round(similarity, 3))
+    response = _stored_response(stored, language, profile, explain, decodePath=decode_path)
+    if response is not None:
+        await asyncio.to_thread(result_caches[profile].put, _cache_key(audio_hash, max_seconds),
+                                bundle.cache_namespace, stored)
+    return response, fingerprint
+
+
+def _discard(task):
+    """Cancels a task whose result is no longer needed, without logging it if it already failed."""
+    if not task.cancel() and not task.cancelled():
+        task.exception()
+
+
+async def analyze_clip(source, decode_path: str, audio_hash: str, language,
+                       profile: str = None, max_seconds: float = None,
+                       explain: str = None) -> VoiceAnalysisResponse:
+    """
+    Extracts features in the inference pool while fingerprinting the clip; a
+    near-duplicate of a clip classified before is answered from the fingerprint index
+    as soon as the lookup hits (the extraction is dropped). Otherwise the features are
+    scored in a micro-batch and the result is cached and indexed. The caller owns
+    admission control and the response shape for errors; failures are raised as AnalysisError.
+    profile must already be validated with get_classifier (None means the default).
+    max_seconds is the resolved analysis budget (streaming.effective_budget), or None.
+    explain is the explanation detail (classifier.EXPLAIN_MODES; None means the default).
+    Temp files (decode_path == "tempfile") are removed here.
+    """
+    profile = profile or DEFAULT_PROFILE
+    explain = check_explain(explain)
+    classifier = classifiers[profile]
+    # The version serving now gates in the worker and scores a cheap-feature row,
+    # even if a reload swaps in another one meanwhile
+    bundle = classifier.bundle
+    try:
+        extraction = asyncio.ensure_future(inference_pool.run(
+            extract_in_worker, source, metrics.enabled, profile, max_seconds,
+            bundle.version if bundle else None
+        ))
+        try:
+            try:
+                matched, fingerprint = await _fingerprint_match(
+                    source, decode_path, audio_hash, language, profile, max_seconds, explain, bundle
+                )
+            except BaseException:
+                _discard(extraction)
+                raise
+            if matched is not None:
+                # Not started yet: never runs; already running: its result is discarded
+                _discard(extraction)
+                return matched
+            features, analyzed_seconds, timings = await extraction
+            metrics.observe_extraction(timings)
+            if len(features) == CHEAP_FEATURE_COUNT:
+                # Decided by the cascade's first stage: a small forest, scored on a thread
+                # (explain=full computes attributions, and a missing bundle loads the model)
+                cascade_stage = 1
+                scored = await asyncio.to_thread(classifier.score_batch, features.reshape(1, -1), explain, bundle)
+                label, confidence, explanation, model_version, attributions = scored[0]
+            else:
+                cascade_stage = 2 if classifier.stage1 is not None and not max_seconds else None
+                label, confidence, explanation, model_version, attributions = await batchers[profile].submit(
+                    features, explain
+                )
+        except Exception as e:
+            print(f"Prediction Error: {e}")
+            traceback.print_exc()
+            raise AnalysisError(500, "Internal processing error during analysis")
+    finally:
+        if decode_path == DECODE_PATH_TEMPFILE:
+            cleanup_file(source)
+
+    if label is None:
+        raise AnalysisError(500, "Model not initialized properly")
+
+    # Read after scoring: the model may have been loaded lazily by this request.
+    # A result from a version that has since been swapped out is not cached.
+    serving = classifier.bundle
+    if serving is not None and serving.version == model_version:
+        result = {
+            "classification": label,
+            "confidence": confidence,
+            "explanation": explanation,
+            "explain": explain,
+            "attributions": attributions,
+            "analyzed_seconds": analyzed_seconds,
+            "cascade_stage": cascade_stage,
+            "model_version": model_version
+        }
+        namespace = serving.cache_namespace
+        # Both write their disk tiers, and the index may load one on a namespace switch
+        await asyncio.to_thread(result_caches[profile].put, _cache_key(audio_hash, max_seconds), namespace, result)
+        await asyncio.to_thread(fingerprint_indexes[profile].put, audio_hash, fingerprint, namespace, result,
+                                max_seconds)
+
+    return VoiceAnalysisResponse(
+        status="success",
+        language=language,
+        classification=label,
+        confidenceScore=round(confidence, 2),
+        **_explain_fields(explain, explanation, attributions),
+        decodePath=decode_path,
+        featureProfile=profile,
+        analyzedSeconds=round(analyzed_seconds, 3) if analyzed_seconds is not None else None,
+        cascadeStage=cascade_stage,
+        modelVersion=model_version,
+        cached=False
+    )
+
+
+async def analyze_segments(temp_path: str, language, segment_seconds: float,
+                           profile: str = None, explain: str = None) -> SegmentedAnalysisResponse:
+    """
+    Streams a recording from disk in the inference pool and classifies every segment
+    plus the aggregate of the whole recording. The temp file is removed here.
+    explain applies to the aggregate verdict; segments are never explained.
+    """
+    profile = profile or DEFAULT_PROFILE
+    explain = check_explain(explain)
+    try:
+        try:
+            segments, aggregate, duration, timings = await inference_pool.run(
+                segments_in_worker, temp_path, segment_seconds, metrics.enabled, profile
+            )
+            metrics.observe_extraction(timings)
+            # All rows go through the micro-batcher together, so they share predict_proba calls
+            rows = [features for _, _, features in segments] + [aggregate]
+            options = ["none"] * len(segments) + [explain]
+            results = await asyncio.gather(*(
+                batchers[profile].submit(row, option) for row, option in zip(rows, options)
+            ))
+        except Exception as e:
+            print(f"Segmented Prediction Error: {e}")
+            traceback.print_exc()
+            raise AnalysisError(500, "Internal processing error during analysis")
+    finally:
+        cleanup_file(temp_path)
+
+    label, confidence, explanation, model_version, attributions = results[-1]
+    if label is None:
+        raise AnalysisError(500, "Model not initialized properly")
+
+    return SegmentedAnalysisResponse(
+        status="success",
+        language=language,
+        classification=label,
+        confidenceScore=round(confidence, 2),
+        **_explain_fields(explain, explanation, attributions),
+        decodePath=DECODE_PATH_TEMPFILE,
+        featureProfile=profile,
+        modelVersion=model_version,
+        durationSeconds=round(duration, 3),
+        segments=[
+            SegmentResult(
+                start=round(start, 3),
+                end=round(end, 3),
+                classification=seg_label,
+                confidenceScore=round(seg_confidence, 2)
+            )
+            for (start, end, _), (seg_label, seg_confidence, _, _, _) in zip(segments, results)
+        ]
+    )
@@ -0,0 +1,228 @@
+"""
+Pre-fork multi-worker serving (start.py with WEB_WORKERS > 1).
+
+The parent imports the app, loads and warms up every trained profile's model,
+then forks the workers. The workers share the model, the compiled forest and the
+numba-compiled librosa kernels copy-on-write (model arrays are memory-mapped as
+well), and all accept on one listening socket. Each worker is pinned to its own
+slice of the CPUs and its BLAS/OpenMP/numba pools are capped to that slice, so
+adding workers does not oversubscribe the machine.
+
+Nothing here imports numpy before serve() has set the thread caps.
+"""
+import gc
+import os
+import signal
+import socket
+import time
+
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", 1))
+# Pin each worker to a disjoint slice of the CPUs this process may use (Linux only)
+WORKER_CPU_AFFINITY = os.environ.get("WORKER_CPU_AFFINITY", "1") != "0"
+# Thread-pool size variables read by OpenMP, OpenBLAS, MKL and numba when they load
+THREAD_LIMIT_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMBA_NUM_THREADS")
+# Seconds between checks for exited workers and signals
+SUPERVISE_INTERVAL = 0.5
+# A worker that exits within WORKER_STABLE_SECONDS of starting has crashed on startup: it is
+# respawned after a delay doubling from WORKER_RESPAWN_BACKOFF up to WORKER_RESPAWN_BACKOFF_MAX,
+# and its slot is given up after WORKER_CRASH_LIMIT such crashes in a row
+WORKER_STABLE_SECONDS = float(os.environ.get("WORKER_STABLE_SECONDS", 30))
+WORKER_RESPAWN_BACKOFF = float(os.environ.get("WORKER_RESPAWN_BACKOFF", 1))
+WORKER_RESPAWN_BACKOFF_MAX = float(os.environ.get("WORKER_RESPAWN_BACKOFF_MAX", 60))
+WORKER_CRASH_LIMIT = int(os.environ.get("WORKER_CRASH_LIMIT", 5))
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_slices(cpus, workers: int):
+    """Splits cpus into one contiguous slice per worker; extra workers share single cores round-robin."""
+    if workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+    return [cpus[i * len(cpus) // workers:(i + 1) * len(cpus) // workers] for i in range(workers)]
+
+
+def limit_threads(threads: int):
+    """Caps the native thread pools, unless the environment already does. Must run before numpy is imported."""
+    for name in THREAD_LIMIT_VARS:
+        os.environ.setdefault(name, str(threads))
+
+
+def preload():
+    """Imports the app and loads every profile that has a model, so workers inherit them warm."""
+    from . import main
+    from .classifier import classifiers
+    for classifier in classifiers.values():
+        if classifier.available():
+            classifier.startup()
+    return main.app
+
+
+def reload_models():
+    """Brings the parent's models up to the registry's active versions before workers are replaced."""
+    from . import model_registry
+    from .classifier import ModelReloadError, classifiers
+    for profile, classifier in classifiers.items():
+        entry = model_registry.active_version(profile)
+        if entry is None or entry.version == classifier.model_version:
+            continue
+        try:
+            classifier.reload(entry.version)
+        except ModelReloadError as e:
+            print(f"Keeping model {classifier.model_version} ({profile} profile): {e}")
+
+
+class Supervisor:
+    """
+    Forks the workers, replaces any that die (backing off from workers that crash on
+    startup), and stops or rolls them on signals. target(slot) is what a worker runs;
+    the default serves the app with uvicorn.
+    """
+
+    def __init__(self, app, sock, cpu_sets, config, target=None):
+        self.app = app
+        self.sock = sock
+        self.cpu_sets = cpu_sets
+        self.config = config
+        self.target = target or self._serve
+        self.children = {}  # pid -> worker slot
+        self.retiring = set()
+        self.started = {}  # slot -> monotonic start time of its current worker
+        self.crashes = {}  # slot -> startup crashes in a row
+        self.respawn_at = {}  # slot -> monotonic time its next worker is due
+        self.abandoned = set()
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)
+        self.children[pid] = slot
+        self.started[slot] = time.monotonic()
+        print(f"Worker {slot} started (pid {pid}, cpus {self.cpu_sets[slot] if WORKER_CPU_AFFINITY else 'any'})")
+
+    def _run_worker(self, slot: int):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        if WORKER_CPU_AFFINITY and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cpu_sets[slot])
+        code = 0
+        try:
+            self.target(slot)
+        except BaseException as e:
+            print(f"Worker {slot} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _serve(self, slot: int):
+        import uvicorn
+        uvicorn.Server(uvicorn.Config(self.app, **self.config)).run(sockets=[self.sock])
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+        self.respawn_at.clear()
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+
+    def _on_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def roll(self):
+        """Replaces every worker with one forked from the current parent; old ones finish their requests."""
+        reload_models()
+        gc.freeze()
+        for pid, slot in list(self.children.items()):
+            if pid in self.retiring:
+                continue
+            self.spawn(slot)
+            self.retiring.add(pid)
+            os.kill(pid, signal.SIGTERM)
+
+    def _on_exit(self, pid: int, status: int):
+        slot = self.children.pop(pid)
+        if pid in self.retiring:
+            self.retiring.discard(pid)
+            return
+        if self.stopping:
+            return
+        if time.monotonic() - self.started[slot] >= WORKER_STABLE_SECONDS:
+            self.crashes[slot] = 0
+            print(f"Worker {slot} (pid {pid}) exited with status {status}, restarting")
+            self.respawn_at[slot] = time.monotonic()
+            return
+        self.crashes[slot] = self.crashes.get(slot, 0) + 1
+        if self.crashes[slot] >= WORKER_CRASH_LIMIT:
+            print(f"Worker {slot} crashed on startup {self.crashes[slot]} times in a row; giving up on it")
+            self.abandoned.add(slot)
+            return
+        delay = min(WORKER_RESPAWN_BACKOFF_MAX, WORKER_RESPAWN_BACKOFF * 2 ** (self.crashes[slot] - 1))
+        print(f"Worker {slot} (pid {pid}) crashed on startup with status {status}, restarting in {delay:g}s")
+        self.respawn_at[slot] = time.monotonic() + delay
+
+    def run(self, workers: int) -> bool:
+        """Supervises until stopped (True), or until every slot was given up after crash loops (False)."""
+        handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)}
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        try:
+            for slot in range(workers):
+                self.spawn(slot)
+
+            while self.children or self.respawn_at:
+                if self.reload_requested and not self.stopping:
+                    self.reload_requested = False
+                    print("SIGHUP: reloading models and replacing workers")
+                    self.roll()
+                for slot, due in list(self.respawn_at.items()):
+                    if time.monotonic() >= due:
+                        del self.respawn_at[slot]
+                        self.spawn(slot)
+                # Only our own workers are reaped, never other children of this process
+                reaped = False
+                for pid in list(self.children):
+                    try:
+                        done, status = os.waitpid(pid, os.WNOHANG)
+                    except ChildProcessError:
+                        done, status = pid, -1  # Already reaped by someone else
+                    if done:
+                        self._on_exit(pid, status)
+                        reaped = True
+                if not reaped:
+                    time.sleep(SUPERVISE_INTERVAL)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        return self.stopping
+
+
+def serve(host: str, port: int, workers: int = WEB_WORKERS, **config):
+    """Pre-fork server: preload in this process, then run `workers` uvicorn workers on one socket."""
+    cpus = available_cpus()
+    cpu_sets = cpu_slices(cpus, workers)
+    limit_threads(max(1, len(cpus) // workers))
+    # Each worker extracts on its own background thread; the workers are the parallelism
+    os.environ.setdefault("INFERENCE_WORKERS", "0")
+
+    started = time.perf_counter()
+    app = preload()
+    # Keep the preloaded objects out of the collector so it never dirties their shared pages
+    gc.freeze()
+    print(f"Preloaded app and models in {time.perf_counter() - started:.1f}s; forking {workers} workers")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    try:
+        stopped = Supervisor(app, sock, cpu_sets, config).run(workers)
+    finally:
+        sock.close()
+    if not stopped:
+        raise SystemExit("Every worker crashed on startup repeatedly; see the log above")
@@ -0,0 +1,313 @@
+"""
+Bounded-memory analysis of long recordings.
+
+Audio is decoded block by block, resampled with a streaming resampler and cut
+into fixed-length segments. Each segment is analysed with the shared-STFT
+extractor and classified on its own, while a FeatureAccumulator merges the
+per-segment statistics into features for the whole recording. Only a few
+segments are held in memory, whatever the recording length.
+
+With an analysis budget, extract_window_features() instead reads only a few
+evenly spread windows with seek-based partial reads, so the cost of a request
+is bounded by the budget rather than the upload length.
+
+Segment lengths are whole STFT hops and each segment is analysed with a little
+audio from its neighbours as context, so its frames are the frames a full-file
+analysis would produce. Frame statistics are merged with Chan's parallel
+mean/variance update. The aggregate therefore matches extract_features() on the
+whole file up to round-off, except pitch_variance, whose magnitude threshold is
+computed per segment.
+"""
+import io
+import os
+
+import numpy as np
+import soundfile as sf
+
+from .feature_extractor import (
+    SAMPLE_RATE, HOP_LENGTH, N_MFCC, StageClock, analyze_frames, audio_stack, features_from_frames, compute_features,
+    load_audio
+)
+
+# Requested segment length; the actual length is rounded to whole hops (~23 ms)
+SEGMENT_SECONDS = 10.0
+# A trailing piece shorter than this is folded into the previous segment
+MIN_SEGMENT_SECONDS = 1.0
+# Frames read from the decoder per block
+BLOCK_FRAMES = 65536
+# Neighbouring audio analysed on each side of a segment so that the STFT padding,
+# the MFCC delta window and the HPSS median filter (31 frames) see real signal at
+# segment edges. Frames centred in the context are dropped.
+CONTEXT_SAMPLES = 16 * HOP_LENGTH
+
+# Deployment-wide ceiling on seconds of audio analysed per clip (0 = whole clip).
+# Requests may ask for less, never more.
+ANALYSIS_BUDGET_SECONDS = float(os.environ.get("ANALYSIS_BUDGET_SECONDS", 0))
+# Smallest budget a request may ask for
+MIN_BUDGET_SECONDS = 1.0
+# Target length of each window read when a budget applies
+WINDOW_SECONDS = 5.0
+
+
+class RunningMoments:
+    """Count, mean and sum of squared deviations per row, mergeable across batches."""
+
+    def __init__(self, dim: int = 1):
+        self.count = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros(dim)
+
+    def update(self, values):
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        n = values.shape[-1]
+        if n == 0:
+            return
+        mean = values.mean(axis=-1)
+        m2 = ((values - mean[:, None]) ** 2).sum(axis=-1)
+
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count else np.zeros_like(self.m2)
+
+
+class FeatureAccumulator:
+    """Merges analyze_frames() output from consecutive segments into one feature vector."""
+
+    def __init__(self):
+        self.mfcc = RunningMoments(N_MFCC)
+        self.delta = RunningMoments(N_MFCC)
+        self.centroid = RunningMoments()
+        self.flatness = RunningMoments()
+        self.zcr = RunningMoments()
+        self.pitch = RunningMoments()
+        self.harmonic_energy = 0.0
+        self.percussive_energy = 0.0
+        self.n_samples = 0
+
+    def add(self, frames):
+        self.mfcc.update(frames["mfcc"])
+        self.delta.update(frames["delta"])
+        self.centroid.update(frames["centroid"])
+        self.flatness.update(frames["flatness"])
+        self.zcr.update(frames["zcr"])
+        self.pitch.update(frames["pitch"])
+        n = frames["n_samples"]
+        self.harmonic_energy += float(frames["harmonic_power"]) * n
+        self.percussive_energy += float(frames["percussive_power"]) * n
+        self.n_samples += n
+
+    def features(self):
+        n = max(self.n_samples, 1)
+        return np.hstack([
+            self.mfcc.mean, self.mfcc.var,
+            self.delta.mean,
+            self.centroid.mean[0], self.centroid.var[0],
+            self.flatness.mean[0],
+            self.zcr.mean[0], self.zcr.var[0],
+            (self.harmonic_energy / n) / (self.percussive_energy / n + 1e-6),
+            self.pitch.var[0]
+        ])
+
+
+def _native_blocks(audio_path):
+    """Yields (sample_rate, mono float32 block) straight from the decoder."""
+    try:
+        sound_file = sf.SoundFile(audio_path)
+    except Exception:
+        sound_file = None
+
+    if sound_file is not None:
+        with sound_file:
+            for block in sound_file.blocks(blocksize=BLOCK_FRAMES, dtype="float32", always_2d=True):
+                yield sound_file.samplerate, block.mean(axis=1)
+        return
+
+    # Formats libsndfile cannot read (e.g. MP3 on older builds) stream through audioread/ffmpeg
+    import audioread
+    librosa = audio_stack()
+    with audioread.audio_open(audio_path) as source:
+        for buffer in source:
+            block = librosa.util.buf_to_float(buffer, dtype=np.float32)
+            yield source.samplerate, block.reshape(-1, source.channels).mean(axis=1)
+
+
+def _raw_segments(audio_path, segment_seconds):
+    """Yields (start_seconds, end_seconds, y) segments at SAMPLE_RATE."""
+    # Whole hops, so every segment's frames land on the same grid as a full-file analysis
+    segment_len = max(int(round(segment_seconds * SAMPLE_RATE / HOP_LENGTH)), 1) * HOP_LENGTH
+    min_len = int(MIN_SEGMENT_SECONDS * SAMPLE_RATE)
+
+    resampler = None
+    pending, pending_len = [], 0
+    position = 0
+    held = None  # the last full segment, kept until we know whether a short tail follows
+
+    def resampled(native_sr, block, last=False):
+        nonlocal resampler
+        if native_sr == SAMPLE_RATE:
+            return block
+        if resampler is None:
+            import soxr
+            resampler = soxr.ResampleStream(native_sr, SAMPLE_RATE, 1, dtype="float32", quality="HQ")
+        return resampler.resample_chunk(block, last=last)
+
+    native_sr = SAMPLE_RATE
+    for native_sr, block in _native_blocks(audio_path):
+        pending.append(resampled(native_sr, block))
+        pending_len += len(pending[-1])
+        while pending_len >= segment_len:
+            buffer = np.concatenate(pending)
+            segment, rest = buffer[:segment_len], buffer[segment_len:]
+            pending, pending_len = [rest], len(rest)
+            if held is not None:
+                yield held
+            held = (position / SAMPLE_RATE, (position + segment_len) / SAMPLE_RATE, segment)
+            position += segment_len
+
+    if resampler is not None:
+        pending.append(resampled(native_sr, np.zeros(0, dtype=np.float32), last=True))
+    tail = np.concatenate(pending) if pending else np.zeros(0, dtype=np.float32)
+
+    if held is not None and len(tail) < min_len:
+        start, _, segment = held
+        merged = np.concatenate([segment, tail])
+        yield start, start + len(merged) / SAMPLE_RATE, merged
+        return
+    if held is not None:
+        yield held
+    if len(tail) > 0:
+        yield position / SAMPLE_RATE, (position + len(tail)) / SAMPLE_RATE, tail
+
+
+def iter_segments(audio_path, segment_seconds: float = SEGMENT_SECONDS):
+    """
+    Yields (start_seconds, end_seconds, y, core) where y is the segment padded with up
+    to CONTEXT_SAMPLES of its neighbours on each side and core is the (start, stop)
+    sample range of the segment itself inside y.
+    """
+    previous, current = None, None
+    for segment in _raw_segments(audio_path, segment_seconds):
+        if current is not None:
+            yield _with_context(previous, current, segment)
+        previous, current = current, segment
+    if current is not None:
+        yield _with_context(previous, current, None)
+
+
+def _with_context(previous, current, following):
+    start, end, y = current
+    before = previous[2][-CONTEXT_SAMPLES:] if previous is not None else y[:0]
+    after = following[2][:CONTEXT_SAMPLES] if following is not None else y[:0]
+    return start, end, np.concatenate([before, y, after]), (len(before), len(before) + len(y))
+
+
+def extract_segment_features(audio_path, segment_seconds: float = SEGMENT_SECONDS, timings=None,
+                             profile: str = "full"):
+    """
+    Streams a recording and returns (segments, aggregate_features, duration_seconds),
+    where segments is a list of (start, end, features) for per-segment classification.
+    timings, if given, accumulates the extractor's per-stage seconds over all segments.
+    """
+    accumulator = FeatureAccumulator()
+    segments = []
+    duration = 0.0
+    for start, end, y, core in iter_segments(audio_path, segment_seconds):
+        frames = analyze_frames(y, SAMPLE_RATE, core=core, timings=timings, profile=profile)
+        accumulator.add(frames)
+        segments.append((start, end, features_from_frames(frames)))
+        duration = end
+
+    if not segments:
+        raise ValueError("Could not decode any audio")
+    return segments, accumulator.features(), duration
+
+
+def effective_budget(requested=None, ceiling=None):
+    """
+    Seconds of audio to analyse for a request: the smaller of the requested budget and
+    the deployment ceiling (ANALYSIS_BUDGET_SECONDS), or None for the whole clip.
+    """
+    ceiling = ANALYSIS_BUDGET_SECONDS if ceiling is None else ceiling
+    budgets = [b for b in (requested, ceiling) if b]
+    return min(budgets) if budgets else None
+
+
+def plan_windows(duration: float, budget: float, window_seconds: float = WINDOW_SECONDS):
+    """
+    (start, length) windows in seconds, evenly spread over the clip and adding up to budget.
+    Each window sits in the middle of its share of the clip.
+    """
+    count = max(1, int(round(budget / window_seconds)))
+    length = budget / count
+    stride = duration / count
+    return [(i * stride + (stride - length) / 2, length) for i in range(count)]
+
+
+def _read_windows(source, windows):
+    """Yields (sample_rate, mono float32 window) using seeks, so only the windows are decoded."""
+    with sf.SoundFile(source) as sound_file:
+        sr = sound_file.samplerate
+        for start, length in windows:
+            sound_file.seek(int(start * sr))
+            block = sound_file.read(int(round(length * sr)), dtype="float32", always_2d=True)
+            yield sr, block.mean(axis=1)
+
+
+def _source_info(source):
+    try:
+        info = sf.info(source)
+        return info.frames / info.samplerate
+    except Exception:
+        return None
+    finally:
+        if isinstance(source, io.IOBase):
+            source.seek(0)
+
+
+def extract_window_features(audio_path, max_seconds: float, timings=None, profile: str = "full"):
+    """
+    Features from at most max_seconds of audio. Returns (features, analyzed_seconds).
+
+    Clips no longer than the budget are analysed whole (identical to extract_features).
+    Longer ones are analysed as evenly spread windows whose frame statistics are
+    merged with FeatureAccumulator. Formats libsndfile cannot seek are decoded
+    fully first, which bounds the analysis cost but not the decode.
+    """
+    librosa = audio_stack()
+    clock = StageClock(timings)
+    source = io.BytesIO(audio_path) if isinstance(audio_path, (bytes, bytearray)) else audio_path
+    duration = _source_info(source)
+
+    if duration is not None and duration <= max_seconds:
+        y, sr = load_audio(source)
+        clock.lap("decode")
+        return compute_features(y, sr, timings=timings, profile=profile), len(y) / sr
+
+    if duration is not None:
+        blocks = _read_windows(source, plan_windows(duration, max_seconds))
+    else:
+        y_full, sr = load_audio(source)
+        if len(y_full) <= max_seconds * sr:
+            clock.lap("decode")
+            return compute_features(y_full, sr, timings=timings, profile=profile), len(y_full) / sr
+        blocks = ((sr, y_full[int(start * sr):int((start + length) * sr)])
+                  for start, length in plan_windows(len(y_full) / sr, max_seconds))
+
+    accumulator = FeatureAccumulator()
+    for native_sr, block in blocks:
+        y = librosa.resample(block, orig_sr=native_sr, target_sr=SAMPLE_RATE) if native_sr != SAMPLE_RATE else block
+        clock.lap("decode")
+        if len(y) == 0:
+            continue
+        accumulator.add(analyze_frames(y, SAMPLE_RATE, timings=timings, profile=profile))
+        clock = StageClock(timings)
+
+    if accumulator.n_samples == 0:
+        raise ValueError("Could not decode any audio")
+    return accumulator.features(), accumulator.n_samples / SAMPLE_RATE
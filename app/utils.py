@@ -1,24 +1,43 @@
 import base64
+import hashlib
+import io
 import tempfile
 import os
 import uuid
 
 import shutil
+import soundfile as sf
 from fastapi import UploadFile
 
+# Containers libsndfile decodes natively, recognised by their magic bytes.
+# Anything else (e.g. MP3) goes through a temporary file so librosa can hand it to ffmpeg.
+IN_MEMORY_SIGNATURES = {
+    b"RIFF": "wav",
+    b"fLaC": "flac",
+    b"OggS": "ogg",
+}
+
+DECODE_PATH_MEMORY = "memory"
+DECODE_PATH_TEMPFILE = "tempfile"
+# A file the caller keeps (e.g. a queued job's stored upload), decoded in place
+DECODE_PATH_FILE = "file"
+
+def _temp_audio_path(filename) -> str:
+    # distinct temporary file name, keeping the extension so ffmpeg can sniff the format
+    suffix = os.path.splitext(filename or "")[1]
+    if not suffix:
+         suffix = ".tmp"
+
+    temp_filename = f"temp_audio_{uuid.uuid4()}{suffix}"
+    return os.path.join(tempfile.gettempdir(), temp_filename)
+
 def save_upload_file(upload_file: UploadFile) -> str:
     """
     Saves an uploaded file to a temporary location.
     Returns the path to the temporary file.
     """
     try:
-        # distinct temporary file name
-        suffix = os.path.splitext(upload_file.filename)[1]
-        if not suffix:
-             suffix = ".tmp"
-
-        temp_filename = f"temp_audio_{uuid.uuid4()}{suffix}"
-        temp_path = os.path.join(tempfile.gettempdir(), temp_filename)
+        temp_path = _temp_audio_path(upload_file.filename)
         
         with open(temp_path, "wb") as buffer:
             shutil.copyfileobj(upload_file.file, buffer)
@@ -31,3 +50,49 @@ def cleanup_file(path: str):
     """Removes the temporary file."""
     if os.path.exists(path):
         os.remove(path)
+
+def _decodable_in_memory(data: bytes) -> bool:
+    if data[:4] not in IN_MEMORY_SIGNATURES:
+        return False
+    try:
+        # Header-only probe; confirms libsndfile can decode it without a disk copy
+        sf.info(io.BytesIO(data))
+        return True
+    except Exception:
+        return False
+
+def load_upload(upload_file: UploadFile):
+    """
+    Prepares an upload for decoding.
+    Returns (source, decode_path): the raw bytes for WAV/FLAC/OGG, which are decoded
+    straight from memory, or the path of a temporary file for everything else.
+    """
+    buffer = upload_file.file
+    if buffer.read(4) in IN_MEMORY_SIGNATURES:
+        buffer.seek(0)
+        data = buffer.read()
+        if _decodable_in_memory(data):
+            return data, DECODE_PATH_MEMORY
+    buffer.seek(0)
+    return save_upload_file(upload_file), DECODE_PATH_TEMPFILE
+
+def load_bytes(data: bytes, filename: str):
+    """Same as load_upload, for audio that is already in memory (e.g. an archive member)."""
+    if _decodable_in_memory(data):
+        return data, DECODE_PATH_MEMORY
+    try:
+        temp_path = _temp_audio_path(filename)
+        with open(temp_path, "wb") as buffer:
+            buffer.write(data)
+        return temp_path, DECODE_PATH_TEMPFILE
+    except Exception as e:
+        raise ValueError(f"Failed to save audio: {str(e)}")
+
+def hash_upload(upload_file: UploadFile) -> str:
+    """SHA-256 of the uploaded bytes; leaves the buffer rewound for the next reader."""
+    digest = hashlib.sha256()
+    buffer = upload_file.file
+    for chunk in iter(lambda: buffer.read(1024 * 1024), b""):
+        digest.update(chunk)
+    buffer.seek(0)
+    return digest.hexdigest()
@@ -1,13 +1,30 @@
 import requests
+import argparse
+import asyncio
 import base64
+import csv
+import json
 import os
+import random
 import sys
+import time
 
 # CONFIGURATION
 API_URL = "http://127.0.0.1:8000/api/voice-detection"
 API_KEY = "sk_test_123456789"
 FILE_PATH = "sample_audio.mp3" # <--- REPLACE THIS WITH YOUR MP3 FILE PATH
 
+# Bulk mode
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+CONCURRENCY = 8
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.5   # first retry delay, doubled per attempt (plus jitter)
+MAX_BACKOFF_SECONDS = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REQUEST_TIMEOUT = 300.0
+CSV_FIELDS = ("path", "status_code", "status", "classification", "confidenceScore", "explanation",
+              "modelVersion", "featureProfile", "cached", "attempts", "elapsed_ms", "error")
+
 def test_audio_file(file_path):
     if not os.path.exists(file_path):
         print(f"Error: File not found at '{file_path}'")
@@ -51,7 +68,196 @@ def test_audio_file(file_path):
         except Exception as e:
             print(f"❌ Request Error: {e}")
 
+# ---------------------------------------------------------------------------
+# Bulk mode: many files over one pooled keep-alive connection set
+# ---------------------------------------------------------------------------
+
+def collect_files(source):
+    """
+    Audio files to upload: every audio file under a directory (recursively), or the
+    paths listed in a manifest (one per line, or a CSV with a 'path' column).
+    Relative manifest paths are resolved against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(source)
+            for name in names if name.lower().endswith(AUDIO_EXTENSIONS)
+        )
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline="", encoding="utf-8") as f:
+        if source.lower().endswith(".csv"):
+            paths = [row["path"] for row in csv.DictReader(f) if row.get("path")]
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    return [p if os.path.isabs(p) else os.path.join(base, p) for p in paths]
+
+
+def completed_paths(output):
+    """Paths already classified successfully in an earlier run's output (those are skipped)."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, newline="", encoding="utf-8") as f:
+        if output.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = []
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash; that file is sent again
+        for row in rows:
+            if str(row.get("status_code")) == "200":
+                done.add(row["path"])
+    return done
+
+
+class ResultWriter:
+    """Appends one CSV or JSONL row per finished file and flushes it immediately."""
+
+    def __init__(self, output):
+        self.csv = output.lower().endswith(".csv")
+        new = not os.path.exists(output) or os.path.getsize(output) == 0
+        self._file = open(output, "a", newline="", encoding="utf-8")
+        if self.csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            if new:
+                self._writer.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self._writer.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def retry_delay(attempt, retry_after=None):
+    """Exponential backoff with jitter; a server Retry-After wins when it is longer."""
+    delay = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+async def upload(client, path, url, api_key, form, max_attempts=MAX_ATTEMPTS):
+    """Sends one file, retrying 429/5xx responses and connection errors. Returns its result row."""
+    import httpx
+
+    data = await asyncio.to_thread(read_file, path)
+    started = time.perf_counter()
+    for attempt in range(1, max_attempts + 1):
+        # Only the last attempt's response is recorded
+        row = {"path": path, "attempts": attempt}
+        retry_after = None
+        try:
+            response = await client.post(
+                url,
+                files={"file": (os.path.basename(path), data, "application/octet-stream")},
+                data=form,
+                headers={"x-api-key": api_key},
+            )
+            row["status_code"] = response.status_code
+            try:
+                body = response.json()
+                row.update(body if isinstance(body, dict) else {"error": str(body)})
+            except ValueError:
+                row["error"] = response.text[:200]
+            if response.status_code not in RETRY_STATUSES:
+                break
+            retry_after = response.headers.get("Retry-After")
+        except httpx.TransportError as e:
+            row.update(status_code=None, error=f"{type(e).__name__}: {e}")
+        if attempt < max_attempts:
+            await asyncio.sleep(retry_delay(attempt, retry_after))
+    row["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    if row.get("status_code") != 200 and not row.get("error"):
+        row["error"] = row.get("message") or row.get("detail")
+    return row
+
+
+async def run_bulk(paths, output, url=API_URL, api_key=API_KEY, concurrency=CONCURRENCY,
+                   language="English", profile=None, max_attempts=MAX_ATTEMPTS, transport=None):
+    """
+    Uploads paths with `concurrency` requests in flight over one keep-alive connection pool,
+    appending each result to output as it finishes. Files already classified in output are
+    skipped, so an interrupted run resumes. Returns {"sent", "succeeded", "failed", "skipped", "seconds"}.
+    """
+    import httpx
+
+    done = completed_paths(output)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} files: {len(paths) - len(todo)} already done, {len(todo)} to send "
+          f"({concurrency} concurrent)")
+    form = {"language": language, **({"profile": profile} if profile else {})}
+    stats = {"sent": 0, "succeeded": 0, "failed": 0, "skipped": len(paths) - len(todo)}
+    pending = iter(todo)
+    writer = ResultWriter(output)
+    started = time.perf_counter()
+
+    async def worker(client):
+        # Workers pull from one shared iterator, so at most `concurrency` files are read at once
+        for path in pending:
+            try:
+                row = await upload(client, path, url, api_key, form, max_attempts)
+            except OSError as e:
+                row = {"path": path, "status_code": None, "attempts": 0, "error": str(e)}
+            writer.write(row)
+            stats["sent"] += 1
+            stats["succeeded" if row.get("status_code") == 200 else "failed"] += 1
+            if stats["sent"] % 50 == 0 or stats["sent"] == len(todo):
+                elapsed = time.perf_counter() - started
+                print(f"  [{stats['sent']}/{len(todo)}] {stats['sent'] / elapsed:.1f} files/s, "
+                      f"{stats['failed']} failed")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT, transport=transport) as client:
+            await asyncio.gather(*(worker(client) for _ in range(max(1, concurrency))))
+    finally:
+        writer.close()
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def bulk_main(argv):
+    parser = argparse.ArgumentParser(description="Classify many audio files concurrently")
+    parser.add_argument("source", help="Directory to walk, or a manifest (.txt: one path per line; .csv: 'path' column)")
+    parser.add_argument("--output", default="results.jsonl",
+                        help="Results file, .jsonl or .csv; appended to, and re-runs skip files already in it")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Requests in flight")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--api-key", default=API_KEY)
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--profile", help="Feature profile to request (default: the server's)")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                        help="Attempts per file on 429/5xx responses and connection errors")
+    args = parser.parse_args(argv)
+
+    paths = collect_files(args.source)
+    stats = asyncio.run(run_bulk(paths, args.output, args.url, args.api_key, args.concurrency,
+                                 args.language, args.profile, args.max_attempts))
+    rate = stats["sent"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"\n✅ {stats['succeeded']} classified, ❌ {stats['failed']} failed, {stats['skipped']} skipped "
+          f"in {stats['seconds']}s ({rate:.1f} files/s). Results: {args.output}")
+    return 1 if stats["failed"] else 0
+
 if __name__ == "__main__":
+    # Bulk mode: python client.py --bulk data/ --output results.jsonl --concurrency 16
+    if len(sys.argv) > 1 and sys.argv[1] == "--bulk":
+        sys.exit(bulk_main(sys.argv[2:]))
+
     # Allow passing file path as argument: python client.py my_voice.mp3
     target_file = FILE_PATH
     if len(sys.argv) > 1:
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+# Ensure we can import from app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.classifier import EXPLAIN_MODES
+from app.feature_extractor import extract_features, STAGES, EXTRACTOR_VERSION, PROFILES
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BASE_DIR, 'ml_tools', 'benchmarks', 'baseline.json')
+
+# Synthetic clip lengths in seconds
+DURATIONS = (1, 10, 60, 600)
+# Clips are written at a typical upload rate so decode includes resampling
+NATIVE_SAMPLE_RATE = 44100
+# Repeats per clip are capped so each clip costs about this many seconds of audio
+REPEAT_BUDGET_SECONDS = 60
+REPEATS = 5
+# A stage regresses when it is this fraction slower than the baseline...
+DEFAULT_THRESHOLD = 0.25
+# ...and at least this many milliseconds slower (ignores noise on sub-ms stages)
+MIN_DELTA_MS = 2.0
+
+
+def synthetic_clip(seconds: float, sr: int = NATIVE_SAMPLE_RATE, seed: int = 0):
+    """Voice-like test signal: a drifting harmonic tone in syllable-sized bursts plus breath noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    f0 = 140 + 15 * np.sin(2 * np.pi * 0.3 * t) + 4 * np.sin(2 * np.pi * 5.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3.0 * t) ** 2
+    y = 0.2 * voiced * envelope + 0.01 * rng.normal(size=len(t))
+    return (y / np.max(np.abs(y)) * 0.8).astype(np.float32)
+
+
+def repeats_for(seconds: float, repeats: int = REPEATS) -> int:
+    return max(1, min(repeats, int(REPEAT_BUDGET_SECONDS // seconds)))
+
+
+def median_ms(fn, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000.0)
+
+
+def time_stages(path: str, repeats: int, profile: str = "full"):
+    """Median milliseconds per extract_features stage, plus the extraction total."""
+    runs = []
+    for _ in range(repeats):
+        timings = {}
+        started = time.perf_counter()
+        if extract_features(path, timings=timings, profile=profile) is None:
+            raise RuntimeError(f"Feature extraction failed for {path}")
+        timings["extract_total"] = time.perf_counter() - started
+        runs.append(timings)
+    return {stage: float(np.median([run.get(stage, 0.0) for run in runs]) * 1000.0)
+            for stage in (*STAGES, "extract_total")}
+
+
+def time_classifier(classifier, path: str, repeats: int):
+    """
+    predict_voice end to end (in-process), the explanation step on its own, and
+    score_batch on the clip's features in every explain mode (summary and full add
+    the decision-path attributions and the explanation built from them).
+    """
+    results = {"predict_voice": median_ms(lambda: classifier.predict_voice(path), repeats)}
+
+    features = extract_features(path, profile=classifier.profile).reshape(1, -1)
+    scaled = classifier._scale(features)[0]
+    label, confidence, _ = classifier.predict_batch(features)[0]
+    results["explanation"] = median_ms(
+        lambda: classifier._generate_dynamic_explanation(scaled, label, confidence), 200
+    )
+    for mode in EXPLAIN_MODES:
+        results[f"score_{mode}"] = median_ms(lambda: classifier.score_batch(features, explain=mode), 200)
+    return results
+
+
+def api_client():
+    """In-process client with inference on a background thread and the result cache and fingerprint index disabled."""
+    from fastapi.testclient import TestClient
+    from app import main, pipeline
+    from app.cache import ResultCache
+    from app.feature_extractor import PROFILES
+    from app.fingerprint import FingerprintIndex
+    from app.inference_pool import inference_pool
+
+    inference_pool.workers = 0
+    # Every request must run the full pipeline, so nothing may be answered from the cache
+    pipeline.result_caches = {profile: ResultCache(max_entries=0, disk_dir=None) for profile in PROFILES}
+    pipeline.fingerprint_indexes = {profile: FingerprintIndex(max_entries=0, disk_dir=None) for profile in PROFILES}
+    return TestClient(main.app)
+
+
+def time_api(client, path: str, repeats: int, profile: str = "full"):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    def post():
+        response = client.post(
+            "/api/voice-detection",
+            files={"file": (os.path.basename(path), data, "audio/wav")},
+            data={"profile": profile},
+            headers={"x-api-key": "sk_test_123456789"},
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/voice-detection returned {response.status_code}: {response.text}")
+
+    return {"end_to_end": median_ms(post, repeats)}
+
+
+def environment(profile: str = "full"):
+    import librosa
+    import sklearn
+    return {
+        "profile": profile,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "sklearn": sklearn.__version__,
+        "extractor_version": EXTRACTOR_VERSION,
+    }
+
+
+def run(durations=DURATIONS, repeats=REPEATS, api=True, profile="full"):
+    """
+    Runs every stage for every clip length; returns {"environment", "clips": {"10s": {stage: ms}}}.
+    The classifier and API are only timed when the profile has a trained model.
+    """
+    from app.classifier import classifiers
+
+    results = {"environment": environment(profile), "clips": {}}
+    classifier = classifiers[profile]
+    has_model = classifier.available()
+    if not has_model:
+        print(f"No model for the '{profile}' profile; timing feature extraction only.")
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = {}
+        for seconds in durations:
+            paths[seconds] = os.path.join(workdir, f"synthetic_{seconds}s.wav")
+            sf.write(paths[seconds], synthetic_clip(seconds), NATIVE_SAMPLE_RATE)
+
+        # Load and warm up before timing, so neither model loading nor numba
+        # compilation is billed to the first clip (the API lifespan then has nothing to do)
+        if has_model:
+            classifier.startup()
+        extract_features(paths[min(durations)], profile=profile)
+
+        client = api_client() if api and has_model else None
+        try:
+            if client is not None:
+                client.__enter__()
+            for seconds in durations:
+                n = repeats_for(seconds, repeats)
+                print(f"Benchmarking {seconds}s clip ({n} repeats)...")
+                clip = time_stages(paths[seconds], n, profile)
+                if has_model:
+                    clip.update(time_classifier(classifier, paths[seconds], n))
+                if client is not None:
+                    clip.update(time_api(client, paths[seconds], n, profile))
+                results["clips"][f"{seconds}s"] = clip
+        finally:
+            if client is not None:
+                client.__exit__(None, None, None)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """Returns [(clip, stage, baseline_ms, current_ms)] for every stage slower than allowed."""
+    regressions = []
+    for clip, stages in results["clips"].items():
+        for stage, current in stages.items():
+            base = baseline.get("clips", {}).get(clip, {}).get(stage)
+            if base is None:
+                continue
+            if current > base * (1 + threshold) and current - base > min_delta_ms:
+                regressions.append((clip, stage, base, current))
+    return regressions
+
+
+def print_table(results, baseline=None):
+    clips = list(results["clips"])
+    stages = list(next(iter(results["clips"].values())))
+    print(f"\n{'stage (ms)':<16}" + "".join(f"{clip:>14}" for clip in clips))
+    for stage in stages:
+        cells = []
+        for clip in clips:
+            current = results["clips"][clip][stage]
+            base = (baseline or {}).get("clips", {}).get(clip, {}).get(stage)
+            change = f" {(current / base - 1) * 100:+4.0f}%" if base else ""
+            cells.append(f"{current:.2f}{change}".rjust(14))
+        print(f"{stage:<16}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark for the detection pipeline.")
+    parser.add_argument("--durations", type=float, nargs="+", default=list(DURATIONS),
+                        help="Synthetic clip lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Maximum timed runs per clip")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against "
+                                           "(default: ml_tools/benchmarks/baseline.json, baseline_<profile>.json for other profiles)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    parser.add_argument("--skip-api", action="store_true", help="Do not time /api/voice-detection")
+    parser.add_argument("--profile", choices=PROFILES, default="full", help="Feature profile to benchmark")
+    args = parser.parse_args()
+
+    if args.baseline is None:
+        args.baseline = BASELINE_PATH if args.profile == "full" else BASELINE_PATH.replace(".json", f"_{args.profile}.json")
+    durations = [int(d) if float(d).is_integer() else d for d in args.durations]
+    results = run(durations, args.repeats, api=not args.skip_api, profile=args.profile)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != results["environment"]:
+            print("Note: baseline was recorded in a different environment; comparisons are approximate.")
+
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"\n❌ {len(regressions)} stage(s) regressed by more than {args.threshold:.0%}:")
+        for clip, stage, base, current in regressions:
+            print(f"  {clip:>6} {stage:<14} {base:10.2f} ms -> {current:10.2f} ms")
+        sys.exit(1)
+    print(f"\n✅ No stage regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
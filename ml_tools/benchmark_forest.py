@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+# Ensure we can import from app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.forest_engine import CompiledForest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(BASE_DIR, 'app', 'model.joblib')
+
+BATCH_SIZES = (1, 8, 64)
+REPEATS = 200
+
+
+def time_call(fn, X, repeats=REPEATS):
+    fn(X)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - started)
+    return np.median(timings) * 1000.0
+
+
+def benchmark(model_path=MODEL_PATH):
+    """Compares sklearn and compiled-forest predict_proba latency at several batch sizes."""
+    model = joblib.load(model_path)
+    started = time.perf_counter()
+    engine = CompiledForest.from_pipeline(model)
+    print(f"Compiled {engine.n_trees} trees ({len(engine.feature)} nodes, depth {engine.depth}) "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    scaler = model.named_steps['scaler']
+    rng = np.random.default_rng(0)
+
+    print(f"\n{'batch':>6} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8} {'identical':>10}")
+    for batch_size in BATCH_SIZES:
+        X = scaler.mean_ + scaler.scale_ * rng.normal(size=(batch_size, len(scaler.mean_)))
+        identical = np.array_equal(model.predict_proba(X), engine.predict_proba(X))
+        sklearn_ms = time_call(model.predict_proba, X)
+        compiled_ms = time_call(engine.predict_proba, X)
+        print(f"{batch_size:>6} {sklearn_ms:>12.3f} {compiled_ms:>12.3f} "
+              f"{sklearn_ms / compiled_ms:>7.1f}x {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH)
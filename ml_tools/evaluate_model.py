@@ -1,54 +1,263 @@
+import argparse
+import json
 import os
 import sys
 import glob
+import time
 import joblib
 import numpy as np
 
 # Ensure we can import from app
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from app.feature_extractor import extract_features
-from app.classifier import classifier
+from app.feature_extractor import PROFILES, STAGES, CHEAP_FEATURE_COUNT
+from app import model_registry
+from app.classifier import classifiers, DEFAULT_PROFILE, STAGE1_MODEL_PATH
+from ml_tools.feature_store import extract_many
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
+REPORT_DIR = os.path.join(BASE_DIR, 'ml_tools', 'reports')
+
+LABELS = np.array(["AI_GENERATED", "HUMAN"])  # Label 0 = AI_GENERATED, 1 = HUMAN
+# Cascade thresholds reported by cascade_report()
+CASCADE_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+# Extractor stages a clip decided by the cascade's first stage pays for
+CHEAP_STAGES = ("decode", "stft", "mfcc")
+# Equal-width bins of P(HUMAN) for the reliability table
+CALIBRATION_BINS = 10
+
+
+def dataset_files(data_dir=DATA_DIR):
+    """(paths, truths) for data_dir/human and data_dir/ai, truth 1 = HUMAN, 0 = AI_GENERATED."""
+    paths, truths = [], []
+    for folder, truth in (("human", 1), ("ai", 0)):
+        for pattern in ("*.mp3", "*.wav"):
+            found = sorted(glob.glob(os.path.join(data_dir, folder, pattern)))
+            paths += found
+            truths += [truth] * len(found)
+    return paths, np.array(truths, dtype=int)
+
+
+def quality_report(truths, human_prob, bins=CALIBRATION_BINS):
+    """
+    Confusion matrix, per-class precision/recall, ROC AUC and calibration of P(HUMAN)
+    for binary truths (1 = HUMAN). Predictions use the API's rule: HUMAN unless P(AI) > P(HUMAN).
+    """
+    from sklearn.metrics import brier_score_loss, confusion_matrix, precision_recall_fscore_support, roc_auc_score
+
+    predicted = (human_prob >= 0.5).astype(int)
+    matrix = confusion_matrix(truths, predicted, labels=[0, 1])
+    precision, recall, f1, support = precision_recall_fscore_support(
+        truths, predicted, labels=[0, 1], zero_division=0
+    )
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    which = np.clip(np.digitize(human_prob, edges[1:-1]), 0, bins - 1)
+    reliability = []
+    for b in range(bins):
+        members = which == b
+        if members.any():
+            reliability.append({
+                "bin": [round(float(edges[b]), 2), round(float(edges[b + 1]), 2)],
+                "count": int(members.sum()),
+                "mean_predicted": float(human_prob[members].mean()),
+                "fraction_human": float(truths[members].mean()),
+            })
+    ece = sum(r["count"] * abs(r["mean_predicted"] - r["fraction_human"]) for r in reliability) / len(truths)
+
+    return {
+        "n_files": int(len(truths)),
+        "accuracy": float(np.mean(predicted == truths)),
+        "confusion_matrix": {
+            "labels": LABELS.tolist(),
+            "rows_true_cols_predicted": matrix.tolist(),
+        },
+        "per_class": {
+            label: {"precision": float(precision[i]), "recall": float(recall[i]),
+                    "f1": float(f1[i]), "support": int(support[i])}
+            for i, label in enumerate(LABELS)
+        },
+        # Undefined with a single class in the set
+        "roc_auc": float(roc_auc_score(truths, human_prob)) if len(set(truths.tolist())) == 2 else None,
+        "calibration": {
+            "brier_score": float(brier_score_loss(truths, human_prob, pos_label=1)),
+            "expected_calibration_error": float(ece),
+            "reliability": reliability,
+        },
+    }
+
+
+def evaluate(profile=DEFAULT_PROFILE, data_dir=DATA_DIR, workers=None, use_store=True,
+             model_version=None, output=None):
+    """
+    Validates a feature profile's model on a labelled set: features are extracted on a
+    process pool (reusing the feature store), then the whole matrix is scored in one
+    batched predict_proba call. Prints and returns the report, and writes it as JSON.
+    model_version evaluates a registry version without serving it (default: the serving one).
+    """
+    classifier = classifiers[profile]
+    bundle = classifier.bundle_for(model_version)
+    if bundle is None:
+        print(f"No model to evaluate for the '{profile}' profile: {classifier.error}")
+        return None
+    print(f"Feature profile: {profile}, model version: {bundle.version}")
+
+    paths, truths = dataset_files(data_dir)
+    print(f"Human files: {int(np.sum(truths == 1))}")
+    print(f"AI files: {int(np.sum(truths == 0))}")
+    if not paths:
+        return None
+
+    timings = {}
+    started = time.perf_counter()
+    features = extract_many(paths, workers=workers, use_store=use_store, profile=profile, timings=timings)
+    extract_seconds = time.perf_counter() - started
+
+    ok = [i for i, path in enumerate(paths) if features.get(path) is not None]
+    failed = [path for path in paths if features.get(path) is None]
+    if not ok:
+        print("Error: No valid features extracted.")
+        return None
+    X = np.array([features[paths[i]] for i in ok])
+    truths = truths[ok]
+
+    started = time.perf_counter()
+    human_prob = bundle.predict_proba(X)[:, 1]
+    inference_seconds = time.perf_counter() - started
+
+    report = {
+        "profile": profile,
+        "model_version": bundle.version,
+        "data_dir": os.path.abspath(data_dir),
+        "failed_files": failed,
+        **quality_report(truths, human_prob),
+        "throughput": throughput_report(paths, timings, extract_seconds, inference_seconds, len(ok), workers),
+        "misclassified": [
+            {"file": paths[i], "truth": str(LABELS[t]), "human_probability": round(float(p), 4)}
+            for i, t, p in zip(ok, truths, human_prob) if (p >= 0.5) != bool(t)
+        ],
+        "cascade": cascade_report(bundle, X, truths, [paths[i] for i in ok], timings, model_version),
+    }
+
+    print_report(report)
+    output = output or os.path.join(REPORT_DIR, f"evaluation_{profile}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
+    return report
+
+
+def throughput_report(paths, timings, extract_seconds, inference_seconds, n_scored, workers):
+    """Wall-clock extraction and batched inference rates; per-file stage means cover freshly extracted files."""
+    per_file = [sum(t.get(stage, 0.0) for stage in STAGES) for t in timings.values()]
+    return {
+        "workers": workers or os.cpu_count(),
+        "files_extracted": len(timings),
+        "files_from_store": len(paths) - len(timings),
+        "extract_wall_seconds": round(extract_seconds, 3),
+        "extract_files_per_second": round(len(timings) / extract_seconds, 2) if timings else None,
+        "extract_ms_per_file": round(float(np.mean(per_file)) * 1000, 1) if per_file else None,
+        "extract_stage_ms": {
+            stage: round(float(np.mean([t.get(stage, 0.0) for t in timings.values()])) * 1000, 2)
+            for stage in STAGES
+        } if timings else None,
+        "inference_ms": round(inference_seconds * 1000, 3),
+        "inference_files_per_second": round(n_scored / max(inference_seconds, 1e-9), 1),
+    }
+
+
+def cascade_report(bundle, X, truths, paths, timings, model_version=None, thresholds=CASCADE_THRESHOLDS):
+    """
+    Accuracy, first-stage share and (when every file was timed) mean extraction cost per
+    clip at each cascade threshold: clips whose first-stage confidence reaches the
+    threshold pay only for the cheap stages. The first stage is the one stored with the
+    evaluated registry version, if any.
+    """
+    entry = (model_registry.get_version(model_version) if model_version and bundle.metadata
+             else model_registry.active_version(bundle.profile))
+    stage1_path = entry.stage1_path if entry is not None and entry.stage1_path else STAGE1_MODEL_PATH
+    if not os.path.exists(stage1_path):
+        print(f"\nNo cascade first stage at {stage1_path}; train one with train_model.py.")
+        return None
+
+    stage1 = joblib.load(stage1_path)
+    full_pred = np.argmax(bundle.predict_proba(X), axis=1)
+    proba1 = stage1.predict_proba(X[:, :CHEAP_FEATURE_COUNT])
+    stage1_pred, stage1_conf = np.argmax(proba1, axis=1), proba1.max(axis=1)
+
+    timed = all(path in timings for path in paths)
+    if timed:
+        full_costs = np.array([sum(timings[path].get(s, 0.0) for s in STAGES) for path in paths])
+        cheap_costs = np.array([sum(timings[path].get(s, 0.0) for s in CHEAP_STAGES) for path in paths])
+    else:
+        print("\nExtraction costs need fresh timings; rerun with --no-feature-store for the cost columns.")
+
+    rows = [{"threshold": None, "accuracy": float(np.mean(full_pred == truths)), "stage1_share": 0.0,
+             "mean_extract_ms": float(full_costs.mean() * 1000) if timed else None}]
+    for threshold in thresholds:
+        gated = stage1_conf >= threshold
+        pred = np.where(gated, stage1_pred, full_pred)
+        rows.append({
+            "threshold": threshold,
+            "accuracy": float(np.mean(pred == truths)),
+            "stage1_share": float(gated.mean()),
+            "mean_extract_ms": float(np.where(gated, cheap_costs, full_costs).mean() * 1000) if timed else None,
+        })
+    return rows
+
+
+def print_report(report):
+    failed = report["failed_files"]
+    print(f"\nOverall Accuracy: {report['accuracy']:.2%} on {report['n_files']} files"
+          + (f" ({len(failed)} failed extraction)" if failed else ""))
+    auc = report["roc_auc"]
+    print(f"ROC AUC: {auc:.4f}" if auc is not None else "ROC AUC: n/a (single class)")
+
+    header = "true / predicted"
+    print(f"\n{header:<18}{'AI_GENERATED':>14}{'HUMAN':>10}")
+    for label, row in zip(LABELS, report["confusion_matrix"]["rows_true_cols_predicted"]):
+        print(f"{label:<18}{row[0]:>14}{row[1]:>10}")
+
+    print(f"\n{'class':<14}{'precision':>10}{'recall':>8}{'f1':>8}{'support':>9}")
+    for label, s in report["per_class"].items():
+        print(f"{label:<14}{s['precision']:>10.2%}{s['recall']:>8.2%}{s['f1']:>8.2%}{s['support']:>9}")
+
+    calibration = report["calibration"]
+    print(f"\nBrier score: {calibration['brier_score']:.4f}   "
+          f"ECE: {calibration['expected_calibration_error']:.4f}")
+    print(f"{'P(HUMAN) bin':<14}{'count':>7}{'predicted':>11}{'observed':>10}")
+    for r in calibration["reliability"]:
+        bin_range = f"{r['bin'][0]:.1f}-{r['bin'][1]:.1f}"
+        print(f"{bin_range:<14}{r['count']:>7}{r['mean_predicted']:>11.2f}{r['fraction_human']:>10.2f}")
+
+    t = report["throughput"]
+    print(f"\nExtraction: {t['files_extracted']} files in {t['extract_wall_seconds']:.1f}s "
+          f"on {t['workers']} workers ({t['files_from_store']} from the feature store)")
+    if t["extract_ms_per_file"] is not None:
+        print(f"  {t['extract_files_per_second']:.2f} files/s, {t['extract_ms_per_file']:.1f} ms of extraction per file")
+    print(f"Inference: {report['n_files']} files in {t['inference_ms']:.2f} ms "
+          f"({t['inference_files_per_second']:.0f} files/s, one batched predict_proba)")
+
+    if report["cascade"]:
+        print(f"\n{'threshold':>10} {'accuracy':>9} {'stage 1':>8} {'mean ms':>9} {'saving':>7}")
+        full_ms = report["cascade"][0]["mean_extract_ms"]
+        for row in report["cascade"]:
+            threshold = "off" if row["threshold"] is None else f"{row['threshold']:.2f}"
+            cost = row["mean_extract_ms"]
+            cost_cells = f"{cost:>9.1f} {1 - cost / full_ms:>7.0%}" if cost is not None else f"{'-':>9} {'-':>7}"
+            print(f"{threshold:>10} {row['accuracy']:>9.2%} {row['stage1_share']:>8.0%} {cost_cells}")
 
-def evaluate():
-    human_files = glob.glob(os.path.join(DATA_DIR, 'human', '*.mp3')) + \
-                  glob.glob(os.path.join(DATA_DIR, 'human', '*.wav'))
-    
-    ai_files = glob.glob(os.path.join(DATA_DIR, 'ai', '*.mp3')) + \
-               glob.glob(os.path.join(DATA_DIR, 'ai', '*.wav'))
-    
-    print(f"Human files: {len(human_files)}")
-    print(f"AI files: {len(ai_files)}")
-    
-    results = []
-    
-    print("\nEvaluating Human Files (Expected: HUMAN)")
-    for f in human_files:
-        name = os.path.basename(f)
-        try:
-            label, conf, _ = classifier.predict_voice(f)
-            correct = (label == "HUMAN")
-            results.append(correct)
-            print(f"  {name}: {label} ({conf:.2f}) {'✅' if correct else '❌'}")
-        except Exception as e:
-            print(f"  {name}: ERROR {e}")
-
-    print("\nEvaluating AI Files (Expected: AI_GENERATED)")
-    for f in ai_files:
-        name = os.path.basename(f)
-        try:
-            label, conf, _ = classifier.predict_voice(f)
-            correct = (label == "AI_GENERATED")
-            results.append(correct)
-            print(f"  {name}: {label} ({conf:.2f}) {'✅' if correct else '❌'}")
-        except Exception as e:
-            print(f"  {name}: ERROR {e}")
-            
-    if results:
-        accuracy = sum(results) / len(results)
-        print(f"\nOverall Accuracy: {accuracy:.2%}")
 
 if __name__ == "__main__":
-    evaluate()
+    parser = argparse.ArgumentParser(description="Evaluate the AI voice detection model")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help="Feature profile (and model) to evaluate")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Labelled set with human/ and ai/ folders (default: data)")
+    parser.add_argument("--model-version", help="Registry version to evaluate (default: the one the API would serve)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Feature extraction processes (default: one per CPU)")
+    parser.add_argument("--no-feature-store", action="store_true",
+                        help="Re-extract every file instead of reusing data/.feature_store (also times every file)")
+    parser.add_argument("--output", help="JSON report path (default: ml_tools/reports/evaluation_<profile>.json)")
+    args = parser.parse_args()
+    evaluate(args.profile, args.data_dir, args.workers, not args.no_feature_store, args.model_version, args.output)
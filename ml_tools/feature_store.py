@@ -0,0 +1,208 @@
+import glob
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+# Ensure we can import from app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.feature_extractor import extract_features, EXTRACTOR_VERSION, profile_version
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURE_STORE_DIR = os.path.join(BASE_DIR, 'data', '.feature_store')
+
+# Extracted rows are written to a new chunk file every FLUSH_EVERY files,
+# so an interrupted run loses at most that many extractions.
+FLUSH_EVERY = 50
+# Extractions queued per worker process; also bounds the files retried one by one after a worker dies
+IN_FLIGHT_PER_WORKER = 4
+
+
+def file_key(path: str, version: str = EXTRACTOR_VERSION) -> str:
+    """Identifies one file's features: path, size, mtime and extractor version."""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{version}"
+
+
+class FeatureStore:
+    """
+    On-disk cache of extracted feature vectors, stored as append-only npz chunks.
+    Only successful extractions are stored; files that failed are retried next run.
+    """
+
+    def __init__(self, directory: str = FEATURE_STORE_DIR):
+        self.directory = directory
+        self._rows = {}
+        self._pending = {}
+        self._load()
+
+    def _load(self):
+        for path in sorted(glob.glob(os.path.join(self.directory, "chunk_*.npz"))):
+            try:
+                with np.load(path, allow_pickle=False) as chunk:
+                    for key, row in zip(chunk["keys"], chunk["features"]):
+                        # NaN rows are failures recorded by older versions; those files are retried
+                        if not np.isnan(row).all():
+                            self._rows[str(key)] = row
+            except Exception as e:
+                # A chunk cut short by a crash is skipped; its files are re-extracted
+                print(f"Skipping unreadable feature chunk {path}: {e}")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def get(self, key):
+        """Returns the stored row. Raises KeyError if absent."""
+        return self._rows[key]
+
+    def put(self, key, features):
+        row = np.asarray(features, dtype=np.float64)
+        self._rows[key] = row
+        self._pending[key] = row
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"chunk_{time.time_ns()}_{os.getpid()}"
+        temp_path = os.path.join(self.directory, f".{name}.tmp.npz")
+        np.savez(temp_path,
+                 keys=np.array(list(self._pending.keys())),
+                 features=np.vstack(list(self._pending.values())))
+        # Atomic rename: readers never see a half-written chunk
+        os.replace(temp_path, os.path.join(self.directory, f"{name}.npz"))
+        self._pending = {}
+
+    def compact(self, keep_keys=None):
+        """Rewrites the store as a single chunk, optionally keeping only keep_keys."""
+        self.flush()
+        old_chunks = glob.glob(os.path.join(self.directory, "chunk_*.npz"))
+        keys = [k for k in self._rows if keep_keys is None or k in keep_keys]
+        self._rows = {k: self._rows[k] for k in keys}
+        self._pending = dict(self._rows)
+        self.flush()
+        for path in old_chunks:
+            os.remove(path)
+
+
+def pool_map(fn, paths, workers: int = None, *args):
+    """
+    Runs fn(path, *args) for each path on a process pool and yields (path, future) as the
+    calls finish, with IN_FLIGHT_PER_WORKER calls queued per worker. If a worker process
+    dies (OOM kill, a crashing decoder) the pool breaks and every call in it fails, so the
+    pool is replaced: the calls that were in flight are retried one at a time, each in its
+    own process, and the rest continue on a fresh pool. A path whose call kills its worker
+    on its own is yielded with future None.
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = iter(paths)
+    suspects = []
+    while True:
+        for path in suspects:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(fn, path, *args)
+                try:
+                    future.result()
+                except BrokenProcessPool:
+                    future = None
+                except Exception:
+                    pass
+            yield path, future
+        suspects = []
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        in_flight = {}
+        try:
+            while not suspects:
+                for path in pending:
+                    try:
+                        in_flight[executor.submit(fn, path, *args)] = path
+                    except BrokenProcessPool:
+                        suspects.append(path)
+                        break
+                    if len(in_flight) >= workers * IN_FLIGHT_PER_WORKER:
+                        break
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = in_flight.pop(future)
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        suspects.append(path)
+                    else:
+                        yield path, future
+            suspects.extend(in_flight.values())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if not suspects:
+            return
+        print(f"    ⚠️  A worker process died; retrying {len(suspects)} files one at a time")
+
+
+def _extract_timed(path: str, profile: str):
+    timings = {}
+    return extract_features(path, timings=timings, profile=profile), timings
+
+
+def extract_many(paths, store_dir: str = FEATURE_STORE_DIR, workers: int = None, use_store: bool = True,
+                 profile: str = "full", timings: dict = None):
+    """
+    Extracts features for every path on a process pool, reusing and filling the feature store.
+    Returns {path: features or None}. Safe to interrupt: finished files are kept and a re-run
+    only extracts what is missing (failures included). Each feature profile has its own
+    entries in the store.
+    timings, if given, receives {path: per-stage seconds} for the files extracted in this run.
+    """
+    store = FeatureStore(store_dir) if use_store else None
+    keys = {path: file_key(path, profile_version(profile)) for path in paths}
+    results = {}
+    todo = []
+    for path in paths:
+        if store is not None and keys[path] in store:
+            results[path] = store.get(keys[path])
+        else:
+            todo.append(path)
+
+    print(f"Features ({profile} profile): {len(results)} cached, {len(todo)} to extract")
+    if not todo:
+        return results
+
+    started = time.time()
+    extracted = 0
+    try:
+        for i, (path, future) in enumerate(pool_map(_extract_timed, todo, workers, profile), 1):
+            features = None
+            if future is None:
+                print(f"    ⚠️  {os.path.basename(path)} crashed its worker process")
+            else:
+                try:
+                    features, file_timings = future.result()
+                    if timings is not None:
+                        timings[path] = file_timings
+                except Exception as e:
+                    print(f"    ⚠️  Failed to extract features from {os.path.basename(path)}: {e}")
+            results[path] = features
+            if features is not None:
+                extracted += 1
+                if store is not None:
+                    store.put(keys[path], features)
+            status = "ok" if features is not None else "FAILED"
+            print(f"  [{i}/{len(todo)}] {os.path.basename(path)} ({status})")
+    except KeyboardInterrupt:
+        print("Interrupted; finished files are saved and will be skipped next run.")
+        raise
+    finally:
+        if store is not None:
+            store.flush()
+
+    elapsed = time.time() - started
+    print(f"Extracted {extracted}/{len(todo)} files in {elapsed:.1f}s ({len(todo) / max(elapsed, 1e-9):.2f} files/s)")
+    return results
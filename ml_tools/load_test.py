@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+
+# Ensure we can import from app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_tools.benchmark import synthetic_clip, environment, NATIVE_SAMPLE_RATE
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BASE_DIR, 'ml_tools', 'benchmarks', 'load_baseline.json')
+TEST_AUDIO = os.path.join(BASE_DIR, 'test_audio.wav')
+API_KEY = "sk_test_123456789"
+
+# Synthetic clip lengths in seconds (test_audio.wav is always included)
+CLIP_SECONDS = (5, 30)
+CONCURRENCY_LEVELS = (1, 2, 4, 8, 16, 32)
+# Seconds of closed-loop load per concurrency level
+LEVEL_SECONDS = 10.0
+WARMUP_REQUESTS = 3
+# A sweep stops once this fraction of a level's requests fail (the service is past saturation)
+STOP_ERROR_RATE = 0.5
+# Capacity is the highest concurrency whose p99 stays within this many milliseconds
+P99_SLO_MS = 2000.0
+# A level regresses when throughput drops or p99 grows by more than this fraction
+DEFAULT_THRESHOLD = 0.25
+REQUEST_TIMEOUT = 300.0
+READY_TIMEOUT = 180.0
+
+
+class ProcessSampler:
+    """
+    Samples the RSS and CPU time of a process and its descendants from /proc while a
+    level runs. Reports None off Linux.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.available = os.path.exists(f"/proc/{pid}/stat")
+        self._ticks = os.sysconf("SC_CLK_TCK") if self.available else 1
+        self._page = os.sysconf("SC_PAGE_SIZE") if self.available else 1
+        self._stop = threading.Event()
+        self._thread = None
+        self.peak_rss = 0
+        self._cpu = {}
+
+    def _stats(self):
+        """{pid: (ppid, cpu seconds, rss bytes)} for every readable process."""
+        stats = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            stats[int(name)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / self._ticks,
+                                int(fields[21]) * self._page)
+        return stats
+
+    def sample(self):
+        stats = self._stats()
+        tree, frontier = set(), [self.pid]
+        while frontier:
+            pid = frontier.pop()
+            if pid in stats and pid not in tree:
+                tree.add(pid)
+                frontier += [child for child, (ppid, _, _) in stats.items() if ppid == pid]
+        self.peak_rss = max(self.peak_rss, sum(stats[pid][2] for pid in tree))
+        for pid in tree:
+            # Per-process CPU, so workers that exit mid-level keep their last reading
+            first, _ = self._cpu.get(pid, (stats[pid][1], None))
+            self._cpu[pid] = (first, stats[pid][1])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        if self.available:
+            self.sample()
+            self._started = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.sample()
+            self._elapsed = time.perf_counter() - self._started
+
+    def result(self):
+        if not self.available:
+            return {"rss_mb_peak": None, "cpu_percent": None}
+        cpu = sum(last - first for first, last in self._cpu.values())
+        return {"rss_mb_peak": round(self.peak_rss / 2 ** 20, 1),
+                "cpu_percent": round(cpu / self._elapsed * 100, 1)}
+
+
+def start_server(port: int, web_workers: int = 1, env=None):
+    """
+    Starts the API with the result cache and fingerprint index off (every request runs
+    the pipeline); returns the process.
+    """
+    server_env = dict(os.environ, RESULT_CACHE_SIZE="0", RESULT_CACHE_DIR="", FINGERPRINT_INDEX_SIZE="0",
+                      **(env or {}))
+    if web_workers > 1:
+        server_env.update(PORT=str(port), WEB_WORKERS=str(web_workers))
+        cmd = [sys.executable, "start.py"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=server_env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url: str, process=None, timeout: float = READY_TIMEOUT):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=2.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} was not ready within {timeout:.0f}s")
+
+
+def summarize(results, elapsed: float, concurrency: int):
+    """Throughput, success-latency percentiles and error breakdown for one level's (seconds, status) pairs."""
+    latencies = np.array([seconds for seconds, status in results if status == 200]) * 1000.0
+    errors = {}
+    for _, status in results:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    percentile = lambda q: round(float(np.percentile(latencies, q)), 1) if len(latencies) else None
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "error_rate": round(sum(errors.values()) / max(len(results), 1), 4),
+        "errors": errors,
+    }
+
+
+async def run_level(url: str, clip: bytes, filename: str, concurrency: int, seconds: float,
+                    api_key: str = API_KEY, form=None):
+    """Closed loop: each of `concurrency` users sends the clip, waits for the answer, and repeats."""
+    import httpx
+
+    results = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def user():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, files={"file": (filename, clip, "audio/wav")},
+                                                 data=form or {}, headers={"x-api-key": api_key})
+                    status = response.status_code
+                except httpx.TransportError as e:
+                    status = type(e).__name__
+                results.append((time.perf_counter() - started, status))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(results, elapsed, concurrency)
+
+
+def capacity(curve, slo_ms: float = P99_SLO_MS):
+    """Highest level that answered without errors with p99 within the SLO (None if even 1 user misses it)."""
+    ok = [level for level in curve
+          if level["error_rate"] == 0 and level["p99_ms"] is not None and level["p99_ms"] <= slo_ms]
+    if not ok:
+        return None
+    best = max(ok, key=lambda level: level["concurrency"])
+    return {"concurrency": best["concurrency"], "throughput_rps": best["throughput_rps"], "p99_ms": best["p99_ms"]}
+
+
+def run(base_url: str, clips, levels=CONCURRENCY_LEVELS, seconds=LEVEL_SECONDS, server_pid=None,
+        profile=None, slo_ms=P99_SLO_MS, stop_error_rate=STOP_ERROR_RATE):
+    """Sweeps every clip through the concurrency levels; returns {"environment", "curves", "capacity"}."""
+    import httpx
+
+    url = f"{base_url}/api/voice-detection"
+    form = {"profile": profile} if profile else {}
+    results = {"environment": environment(profile or "full"), "level_seconds": seconds,
+               "p99_slo_ms": slo_ms, "curves": {}, "capacity": {}}
+    for name, path in clips.items():
+        with open(path, "rb") as f:
+            data = f.read()
+        for _ in range(WARMUP_REQUESTS):
+            httpx.post(url, files={"file": (os.path.basename(path), data, "audio/wav")}, data=form,
+                       headers={"x-api-key": API_KEY}, timeout=REQUEST_TIMEOUT)
+
+        curve = results["curves"][name] = []
+        print(f"\n{name}")
+        print(f"{'users':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'RSS MB':>9}{'CPU %':>8}")
+        for concurrency in levels:
+            sampler = ProcessSampler(server_pid) if server_pid else None
+            if sampler is not None:
+                with sampler:
+                    level = asyncio.run(run_level(url, data, os.path.basename(path), concurrency, seconds, form=form))
+                level.update(sampler.result())
+            else:
+                level = asyncio.run(run_level(url, data, os.path.basename(path), concurrency, seconds, form=form))
+                level.update(rss_mb_peak=None, cpu_percent=None)
+            curve.append(level)
+            cell = lambda v, fmt: format(v, fmt) if v is not None else "-"
+            print(f"{concurrency:>6}{level['throughput_rps']:>9.2f}{cell(level['p50_ms'], '>10.1f')}"
+                  f"{cell(level['p95_ms'], '>10.1f')}{cell(level['p99_ms'], '>10.1f')}"
+                  f"{level['error_rate']:>8.1%}{cell(level['rss_mb_peak'], '>9.1f')}{cell(level['cpu_percent'], '>8.0f')}")
+            if level["error_rate"] >= stop_error_rate:
+                print(f"  stopping: {level['error_rate']:.0%} of requests failed ({level['errors']})")
+                break
+        results["capacity"][name] = capacity(curve, slo_ms)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Returns [(clip, concurrency, metric, baseline, current)] for levels that lost throughput or p99."""
+    regressions = []
+    for clip, curve in results["curves"].items():
+        base_levels = {level["concurrency"]: level for level in baseline.get("curves", {}).get(clip, [])}
+        for level in curve:
+            base = base_levels.get(level["concurrency"])
+            if base is None:
+                continue
+            if base["throughput_rps"] and level["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+                regressions.append((clip, level["concurrency"], "throughput_rps", base["throughput_rps"],
+                                    level["throughput_rps"]))
+            if base["p99_ms"] and (level["p99_ms"] is None or level["p99_ms"] > base["p99_ms"] * (1 + threshold)):
+                regressions.append((clip, level["concurrency"], "p99_ms", base["p99_ms"], level["p99_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load test: saturation curve of the detection API.")
+    parser.add_argument("--url", help="Test a running server (e.g. http://127.0.0.1:8000) instead of starting one; "
+                                      "RSS/CPU are then only sampled with --server-pid")
+    parser.add_argument("--server-pid", type=int, help="Process to sample RSS/CPU from when using --url")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the server started by this tool")
+    parser.add_argument("--web-workers", type=int, default=1, help="Start the server in pre-fork mode with N workers")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the started server (repeatable), e.g. INFERENCE_WORKERS=4")
+    parser.add_argument("--clip-seconds", type=float, nargs="+", default=list(CLIP_SECONDS),
+                        help="Synthetic clip lengths, in addition to test_audio.wav")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(CONCURRENCY_LEVELS),
+                        help="Concurrent users per level")
+    parser.add_argument("--seconds", type=float, default=LEVEL_SECONDS, help="Duration of each level")
+    parser.add_argument("--profile", help="Feature profile to request (default: the server's)")
+    parser.add_argument("--slo-ms", type=float, default=P99_SLO_MS, help="p99 target used to report capacity")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed throughput drop / p99 growth as a fraction of the baseline")
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        base_url, server_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        env = dict(item.split("=", 1) for item in args.env)
+        process = start_server(args.port, args.web_workers, env)
+        base_url, server_pid = f"http://127.0.0.1:{args.port}", process.pid
+    try:
+        print(f"Waiting for {base_url}/ready...")
+        wait_ready(base_url, process)
+        with tempfile.TemporaryDirectory() as workdir:
+            clips = {"test_audio.wav": TEST_AUDIO}
+            for seconds in args.clip_seconds:
+                seconds = int(seconds) if float(seconds).is_integer() else seconds
+                path = os.path.join(workdir, f"synthetic_{seconds}s.wav")
+                sf.write(path, synthetic_clip(seconds), NATIVE_SAMPLE_RATE)
+                clips[f"synthetic_{seconds}s"] = path
+            results = run(base_url, clips, args.concurrency, args.seconds, server_pid, args.profile, args.slo_ms)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    results["server"] = {"web_workers": args.web_workers, "env": args.env} if process else {"url": base_url}
+
+    print(f"\nCapacity at p99 <= {args.slo_ms:.0f} ms:")
+    for clip, cap in results["capacity"].items():
+        print(f"  {clip:<20} " + (f"{cap['concurrency']} users, {cap['throughput_rps']:.2f} req/s, "
+                                   f"p99 {cap['p99_ms']:.0f} ms" if cap else "not met at the lowest level"))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != results["environment"]:
+        print("Note: baseline was recorded in a different environment; comparisons are approximate.")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} level(s) regressed by more than {args.threshold:.0%}:")
+        for clip, users, metric, base, current in regressions:
+            print(f"  {clip:<20} {users:>4} users {metric:<15} {base} -> {current}")
+        sys.exit(1)
+    print(f"\n✅ No level regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Latency-aware model selection for train_model.py.
+
+Every candidate (random forests and extra-trees of several sizes and depths,
+gradient boosting, logistic regression; all behind the same StandardScaler) is
+cross-validated on the already extracted feature matrix, in parallel. Each is then
+fitted on all rows and timed the way the API scores: with the compiled forest
+engine when the model compiles, else sklearn's predict_proba, for one row and for
+a micro-batch, and its serialized size is measured. The smallest candidate whose
+accuracy is within the tolerance of the best one is selected.
+"""
+import io
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Ensure we can import from app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.batching import BATCH_MAX_SIZE
+from app.forest_engine import CompiledForest
+
+# Selected: the smallest candidate whose CV accuracy is at most this far below the best
+ACCURACY_TOLERANCE = 0.01
+CV_FOLDS = 5
+# Rows per scoring call for the batched latency: the largest batch the micro-batcher forms
+BATCH_SIZE = BATCH_MAX_SIZE
+# Timed calls per candidate and batch size (the median is reported)
+REPEATS = 50
+SELECTION_FILE = "model_selection.json"
+
+
+def candidates():
+    """(name, classifier) pairs searched by select_model; each is wrapped in the scaler pipeline."""
+    grid = []
+    for n_estimators in (20, 40, 100, 200):
+        for max_depth in (4, 8, 16, None):
+            grid.append((f"random_forest n={n_estimators} depth={max_depth or 'full'}", RandomForestClassifier(
+                n_estimators=n_estimators, max_depth=max_depth, class_weight='balanced', random_state=42
+            )))
+    for n_estimators in (40, 200):
+        for max_depth in (8, None):
+            grid.append((f"extra_trees n={n_estimators} depth={max_depth or 'full'}", ExtraTreesClassifier(
+                n_estimators=n_estimators, max_depth=max_depth, class_weight='balanced', random_state=42
+            )))
+    grid.append(("gradient_boosting", HistGradientBoostingClassifier(class_weight='balanced', random_state=42)))
+    grid.append(("logistic_regression", LogisticRegression(class_weight='balanced', max_iter=2000)))
+    return grid
+
+
+def make_pipeline(clf):
+    return Pipeline([('scaler', StandardScaler()), ('clf', clf)])
+
+
+def _cross_validate(clf, X, y, folds: int):
+    """Runs in a worker process: fold accuracies, and the pipeline fitted on every row."""
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    scores = cross_val_score(make_pipeline(clf), X, y, cv=cv)
+    return scores, make_pipeline(clf).fit(X, y)
+
+
+def _median_ms(fn, X, repeats: int = REPEATS):
+    fn(X)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1000.0
+
+
+def serving_cost(model, X):
+    """Single-row and batched scoring latency (as the API would score) and serialized size."""
+    try:
+        predict = CompiledForest.from_pipeline(model).predict_proba
+        compiled = True
+    except ValueError:
+        predict = model.predict_proba
+        compiled = False
+    batch = X[np.arange(BATCH_SIZE) % len(X)]
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return {
+        "compiled": compiled,
+        "single_row_ms": round(_median_ms(predict, X[:1]), 4),
+        "batch_ms_per_row": round(_median_ms(predict, batch) / BATCH_SIZE, 4),
+        "size_kb": round(len(buffer.getvalue()) / 1024, 1),
+    }
+
+
+def pareto_front(rows):
+    """Marks the rows no other row beats on both accuracy and single-row latency."""
+    for row in rows:
+        row["pareto"] = not any(
+            other["cv_accuracy"] >= row["cv_accuracy"] and other["single_row_ms"] <= row["single_row_ms"]
+            and (other["cv_accuracy"] > row["cv_accuracy"] or other["single_row_ms"] < row["single_row_ms"])
+            for other in rows
+        )
+    return rows
+
+
+def select_model(X, y, tolerance: float = ACCURACY_TOLERANCE, folds: int = CV_FOLDS, jobs: int = None,
+                 grid=None):
+    """
+    Cross-validates every candidate in parallel (jobs processes, default one per CPU), measures
+    its serving cost and returns (selected fitted pipeline, report). The report holds the
+    candidate table, best first, with the Pareto front and the selection marked.
+    """
+    from joblib import Parallel, delayed
+
+    grid = grid if grid is not None else candidates()
+    folds = min(folds, int(np.bincount(y.astype(int)).min()))
+    if folds < 2:
+        raise ValueError("Model selection needs at least 2 samples of each class")
+    print(f"Model selection: {len(grid)} candidates, {folds}-fold CV on {len(X)} samples...")
+    started = time.perf_counter()
+    results = Parallel(n_jobs=jobs or -1)(delayed(_cross_validate)(clf, X, y, folds) for _, clf in grid)
+    print(f"Cross-validated in {time.perf_counter() - started:.1f}s; measuring serving cost...")
+
+    # Timed one at a time in this process, so candidates do not compete for the CPU
+    rows, models = [], {}
+    for (name, clf), (scores, model) in zip(grid, results):
+        params = clf.get_params()
+        rows.append({
+            "name": name,
+            "family": type(clf).__name__,
+            "n_estimators": params.get("n_estimators"),
+            "max_depth": params.get("max_depth"),
+            "cv_accuracy": round(float(scores.mean()), 4),
+            "cv_std": round(float(scores.std()), 4),
+            **serving_cost(model, X),
+        })
+        models[name] = model
+    rows.sort(key=lambda row: (-row["cv_accuracy"], row["single_row_ms"]))
+    pareto_front(rows)
+
+    best = rows[0]["cv_accuracy"]
+    eligible = [row for row in rows if row["cv_accuracy"] >= best - tolerance]
+    selected = min(eligible, key=lambda row: (row["size_kb"], row["single_row_ms"]))
+    for row in rows:
+        row["selected"] = row is selected
+    report = {
+        "selected": selected["name"],
+        "best_cv_accuracy": best,
+        "accuracy_tolerance": tolerance,
+        "cv_folds": folds,
+        "batch_size": BATCH_SIZE,
+        "candidates": rows,
+    }
+    return models[selected["name"]], report
+
+
+def print_selection(report):
+    print(f"\n{'candidate':<34} {'cv acc':>7} {'±':>6} {'1 row ms':>9} {'row ms @' + str(report['batch_size']):>11} "
+          f"{'size KB':>9}  ")
+    for row in report["candidates"]:
+        marks = ("*" if row["selected"] else " ") + ("p" if row["pareto"] else " ")
+        print(f"{row['name']:<34} {row['cv_accuracy']:>7.2%} {row['cv_std']:>6.3f} {row['single_row_ms']:>9.3f} "
+              f"{row['batch_ms_per_row']:>11.4f} {row['size_kb']:>9.1f}  {marks}")
+    print(f"* selected (smallest within {report['accuracy_tolerance']:.1%} of the best CV accuracy), "
+          f"p = accuracy/latency Pareto front")
@@ -0,0 +1,285 @@
+"""
+Offline bulk scoring for backfills: classifies unlabelled archives without the API.
+
+Inputs are directories, glob patterns or file lists. `--shard i/n` keeps the files
+whose path hashes to shard i, so n nodes given the same inputs split the work
+without coordination. Features are extracted on a local process pool and scored
+in batches; results are written in chunks (CSV, or Parquet with pyarrow installed)
+named after the shard, each written atomically. The chunks are the checkpoint: a
+re-run skips every file already in one, so a killed job resumes where it stopped.
+Files that cannot be decoded are recorded with their error and are not retried;
+a file whose extraction kills its worker process is left out and retried next run.
+
+    python ml_tools/score.py "archive/**/*.mp3" --shard 0/4 --output-dir scores/
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Ensure we can import from app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.feature_extractor import PROFILES, STAGES, extract_features
+from app.classifier import classifiers, DEFAULT_PROFILE
+from ml_tools.feature_store import pool_map
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+LABELS = ("AI_GENERATED", "HUMAN")  # Label 0 = AI_GENERATED, 1 = HUMAN
+# Files per output chunk; a killed job redoes at most this many
+CHUNK_SIZE = 1000
+FORMATS = ("csv", "parquet")
+COLUMNS = ("path", "status", "classification", "confidence", "human_probability", "model_version",
+           "profile", "analyzed_seconds", "extract_ms", "error")
+
+
+def input_files(sources):
+    """
+    Audio files from each source: a directory (walked recursively), a file list
+    (.txt with one path per line, or .csv with a 'path' column) or a glob pattern
+    (** recurses). Sorted and de-duplicated.
+    """
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, names in os.walk(source):
+                paths.update(os.path.join(root, name) for name in names if name.lower().endswith(AUDIO_EXTENSIONS))
+        elif os.path.isfile(source) and source.lower().endswith((".txt", ".csv")):
+            base = os.path.dirname(os.path.abspath(source))
+            with open(source, newline="", encoding="utf-8") as f:
+                if source.lower().endswith(".csv"):
+                    listed = [row["path"] for row in csv.DictReader(f) if row.get("path")]
+                else:
+                    listed = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+            paths.update(p if os.path.isabs(p) else os.path.join(base, p) for p in listed)
+        else:
+            paths.update(p for p in glob.glob(source, recursive=True) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def parse_shard(text: str):
+    """'i/n' -> (i, n), with shards numbered from 0."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/n, got '{text}'")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in 0..{count - 1}, got '{text}'")
+    return index, count
+
+
+def in_shard(path: str, shard) -> bool:
+    """Stable assignment by path hash: the same file lands in the same shard on every node and run."""
+    index, count = shard
+    # A cryptographic hash, since CRC-style hashes of near-identical paths share their low bits
+    return int.from_bytes(hashlib.sha1(path.encode("utf-8")).digest()[:8], "big") % count == index
+
+
+def shard_name(shard) -> str:
+    return f"shard-{shard[0]:04d}-of-{shard[1]:04d}"
+
+
+class ChunkWriter:
+    """Writes result rows as numbered chunk files of one shard; each appears atomically."""
+
+    def __init__(self, output_dir: str, shard, fmt: str = "csv"):
+        if fmt == "parquet":
+            # Optional dependency, only needed for Parquet output
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow (pip install pyarrow), or use --format csv")
+        self.output_dir = output_dir
+        self.prefix = shard_name(shard)
+        self.fmt = fmt
+        # Numbered after the highest existing chunk, so a gap left by a deleted chunk is never overwritten
+        numbers = [int(path.rsplit("-", 1)[1].split(".")[0]) for path in self.existing()]
+        self.next_number = max(numbers) + 1 if numbers else 0
+        self.chunks = len(numbers)
+
+    def existing(self):
+        pattern = os.path.join(self.output_dir, f"{self.prefix}-part-*.{self.fmt}")
+        return sorted(glob.glob(pattern))
+
+    def completed(self):
+        """Paths recorded in this shard's chunks (the checkpoint)."""
+        done = set()
+        for path in self.existing():
+            try:
+                done.update(self._read_paths(path))
+            except Exception as e:
+                print(f"Skipping unreadable chunk {path}: {e}")
+        return done
+
+    def _read_paths(self, path):
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_table(path, columns=["path"]).column("path").to_pylist()
+        with open(path, newline="", encoding="utf-8") as f:
+            return [row["path"] for row in csv.DictReader(f)]
+
+    def write(self, rows):
+        if not rows:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{self.prefix}-part-{self.next_number:06d}.{self.fmt}")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.Table.from_pylist([{c: row.get(c) for c in COLUMNS} for row in rows]), temp_path)
+        else:
+            with open(temp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+        # Atomic rename: a chunk is either complete or absent, so resumes never read half a chunk
+        os.replace(temp_path, path)
+        self.next_number += 1
+        self.chunks += 1
+        return path
+
+
+def extract_file(path: str, profile: str, max_seconds: float = None):
+    """Runs in a pool process: (features or None, per-stage timings, error message or None)."""
+    timings = {}
+    try:
+        features = extract_features(path, timings=timings, profile=profile, max_seconds=max_seconds)
+    except Exception as e:
+        return None, timings, f"{type(e).__name__}: {e}"
+    if features is None:
+        return None, timings, "Could not extract features from audio"
+    return features, timings, None
+
+
+def score_rows(bundle, rows, features):
+    """Scores the chunk's extracted rows in one batched predict_proba call and fills in their verdicts."""
+    scored = [i for i, row in enumerate(rows) if row["status"] == "success"]
+    if not scored:
+        return
+    probs = bundle.predict_proba(np.vstack([features[i] for i in scored]))
+    for i, (ai_prob, human_prob) in zip(scored, probs):
+        label = int(human_prob >= ai_prob)
+        rows[i].update(classification=LABELS[label], confidence=round(float(max(ai_prob, human_prob)), 4),
+                       human_probability=round(float(human_prob), 4), model_version=bundle.version)
+
+
+def score(sources, output_dir: str, shard=(0, 1), profile: str = DEFAULT_PROFILE, workers: int = None,
+          chunk_size: int = CHUNK_SIZE, fmt: str = "csv", model_version: str = None, max_seconds: float = None):
+    """
+    Classifies this shard's files and writes them as result chunks under output_dir,
+    skipping files already in one. Returns the run summary (also printed).
+    model_version scores with a registry version (default: the one the API would serve);
+    max_seconds analyses at most that much audio per file, like the API's budget.
+    """
+    classifier = classifiers[profile]
+    bundle = classifier.bundle_for(model_version)
+    if bundle is None:
+        raise SystemExit(f"No model for the '{profile}' profile: {classifier.error}")
+
+    writer = ChunkWriter(output_dir, shard, fmt)
+    paths = [p for p in input_files(sources) if in_shard(p, shard)]
+    done = writer.completed()
+    todo = [p for p in paths if p not in done]
+    workers = workers or os.cpu_count() or 1
+    print(f"{shard_name(shard)}: {len(paths)} files, {len(paths) - len(todo)} already scored, {len(todo)} to score "
+          f"({profile} profile, model {bundle.version}, {workers} workers)")
+
+    summary = {"shard": list(shard), "profile": profile, "model_version": bundle.version,
+               "files": len(paths), "skipped": len(paths) - len(todo), "scored": 0, "failed": 0, "crashed": 0}
+    stage_seconds = dict.fromkeys(STAGES, 0.0)
+    rows, features = [], []
+    started = time.perf_counter()
+
+    def flush():
+        score_rows(bundle, rows, features)
+        writer.write(rows)
+        summary["scored"] += sum(row["status"] == "success" for row in rows)
+        summary["failed"] += sum(row["status"] != "success" for row in rows)
+        elapsed = time.perf_counter() - started
+        finished = summary["scored"] + summary["failed"]
+        print(f"  [{finished}/{len(todo)}] {finished / elapsed:.1f} files/s, {summary['failed']} failed")
+        rows.clear()
+        features.clear()
+
+    try:
+        # At most a few extractions per worker are queued, so millions of files never sit in memory as futures
+        for path, future in pool_map(extract_file, todo, workers, profile, max_seconds):
+            if future is None:
+                # Killed its worker process: no row, so the next run tries it again
+                print(f"  ⚠️  {path} crashed its worker process")
+                summary["crashed"] += 1
+                continue
+            try:
+                vector, timings, error = future.result()
+            except Exception as e:
+                vector, timings, error = None, {}, f"{type(e).__name__}: {e}"
+            for stage in STAGES:
+                stage_seconds[stage] += timings.get(stage, 0.0)
+            rows.append({
+                "path": path, "status": "error" if error else "success", "profile": profile,
+                "analyzed_seconds": round(timings["audio_seconds"], 3) if "audio_seconds" in timings else None,
+                "extract_ms": round(sum(timings.get(s, 0.0) for s in STAGES) * 1000, 1), "error": error,
+            })
+            features.append(vector)
+            if len(rows) >= chunk_size:
+                flush()
+    except KeyboardInterrupt:
+        print("Interrupted; scored files are saved and will be skipped next run.")
+        raise
+    finally:
+        # Whatever finished before an interruption still becomes a chunk
+        if rows:
+            flush()
+
+    seconds = time.perf_counter() - started
+    processed = summary["scored"] + summary["failed"]
+    summary.update(
+        seconds=round(seconds, 2),
+        files_per_second=round(processed / seconds, 2) if processed else None,
+        stage_ms_per_file={stage: round(total / processed * 1000, 2) for stage, total in stage_seconds.items()}
+        if processed else None,
+        chunks=writer.chunks,
+    )
+    print_summary(summary)
+    return summary
+
+
+def print_summary(summary):
+    crashed = f", 💥 {summary['crashed']} crashed (retried next run)" if summary.get("crashed") else ""
+    print(f"\n✅ {summary['scored']} scored, ❌ {summary['failed']} failed{crashed}, {summary['skipped']} skipped "
+          f"in {summary['seconds']}s", end="")
+    if summary["files_per_second"] is None:
+        print()
+        return
+    print(f" ({summary['files_per_second']} files/s)")
+    print("\nMean extraction time per file by stage:")
+    for stage, ms in summary["stage_ms_per_file"].items():
+        print(f"  {stage:<10} {ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify many archived audio files offline, in resumable shards")
+    parser.add_argument("sources", nargs="+",
+                        help="Directories, glob patterns (quote them; ** recurses) or file lists (.txt, or .csv with a 'path' column)")
+    parser.add_argument("--output-dir", default="scores", help="Where result chunks are written (default: scores)")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1),
+                        help="i/n: score only shard i (from 0) of n, e.g. 2/8 on the third of eight nodes")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="Chunk format (parquet needs pyarrow)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Files per result chunk")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE, help="Feature profile (and model)")
+    parser.add_argument("--model-version", help="Registry version to score with (default: the one the API would serve)")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: one per CPU)")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Analyse at most this much audio per file")
+    parser.add_argument("--summary", help="Also write the run summary as JSON to this path")
+    args = parser.parse_args()
+    result = score(args.sources, args.output_dir, args.shard, args.profile, args.workers, args.chunk_size,
+                   args.format, args.model_version, args.max_seconds)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(result, f, indent=2)
@@ -3,23 +3,28 @@ import joblib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
+import argparse
 import os
 import sys
 import glob
 
 # Ensure we can import from app
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from app.feature_extractor import extract_features
+from ml_tools.feature_store import extract_many
+from ml_tools.model_selection import ACCURACY_TOLERANCE, CV_FOLDS, SELECTION_FILE, print_selection, select_model
+from app import model_registry
+from app.feature_extractor import PROFILES, CHEAP_FEATURE_COUNT, profile_version
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODEL_PATH = os.path.join(BASE_DIR, 'app', 'model.joblib')
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
-def train_model():
+def train_model(workers=None, use_store=True, profiles=("full",), search=True,
+                tolerance=ACCURACY_TOLERANCE, folds=CV_FOLDS):
     """
     Main training function.
-    Checks for real data first. If found, trains on it.
+    Checks for real data first. If found, trains on it (one model per feature profile).
     Otherwise, trains a dummy model for testing.
     """
     human_files = glob.glob(os.path.join(DATA_DIR, 'human', '*.mp3')) + \
@@ -30,35 +35,40 @@ def train_model():
     
     if human_files and ai_files:
         print(f"Found {len(human_files)} Human samples and {len(ai_files)} AI samples.")
-        train_real_model(human_files, ai_files)
+        for profile in profiles:
+            train_real_model(human_files, ai_files, workers=workers, use_store=use_store, profile=profile,
+                             search=search, tolerance=tolerance, folds=folds)
     else:
         print("Real data not found in 'data/human' or 'data/ai'.")
         print("Training DUMMY model with synthetic noise (FOR TESTING ONLY).")
         train_dummy_model()
 
-def train_real_model(human_files, ai_files):
+def train_real_model(human_files, ai_files, workers=None, use_store=True, profile="full", search=True,
+                     tolerance=ACCURACY_TOLERANCE, folds=CV_FOLDS):
+    """
+    Extracts features on a process pool, reusing the on-disk feature store,
+    so a retrain only extracts new or changed files and an interrupted run resumes.
+    With search, the model is the smallest candidate within tolerance of the best
+    cross-validated accuracy (see model_selection.py), and the candidate table is
+    saved with it; otherwise a fixed 200-tree forest is trained.
+    The model and the cascade's first stage (trained on the same rows) are saved
+    as a new model registry version; the API picks it up on its next start or
+    through POST /admin/models/reload.
+    """
     X = []
     y = []
     
-    print("Extracting features from Human files...")
-    for i, f in enumerate(human_files, 1):
-        print(f"  [{i}/{len(human_files)}] Processing: {os.path.basename(f)}")
-        feats = extract_features(f)
-        if feats is not None:
-            X.append(feats)
-            y.append(1) # 1 = HUMAN
-        else:
-            print(f"    ⚠️  Failed to extract features")
+    print(f"Extracting features from Human and AI files ({profile} profile)...")
+    features = extract_many(human_files + ai_files, workers=workers, use_store=use_store, profile=profile)
 
-    print("Extracting features from AI files...")
-    for i, f in enumerate(ai_files, 1):
-        print(f"  [{i}/{len(ai_files)}] Processing: {os.path.basename(f)}")
-        feats = extract_features(f)
-        if feats is not None:
-            X.append(feats)
-            y.append(0) # 0 = AI_GENERATED
-        else:
-            print(f"    ⚠️  Failed to extract features")
+    for files, label in ((human_files, 1), (ai_files, 0)):  # 1 = HUMAN, 0 = AI_GENERATED
+        for f in files:
+            feats = features.get(f)
+            if feats is not None:
+                X.append(feats)
+                y.append(label)
+            else:
+                print(f"    ⚠️  Failed to extract features: {os.path.basename(f)}")
             
     X = np.array(X)
     y = np.array(y)
@@ -67,18 +77,52 @@ def train_real_model(human_files, ai_files):
         print("Error: No valid features extracted.")
         return
 
-    # Train
-    pipeline = Pipeline([
+    metrics = {"n_samples": int(len(X)), "n_human": int(np.sum(y == 1)), "n_ai": int(np.sum(y == 0))}
+    reports = {}
+    if search and min(metrics["n_human"], metrics["n_ai"]) >= 2:
+        # Train: every candidate is cross-validated on the extracted matrix, none re-extracts
+        pipeline, selection = select_model(X, y, tolerance=tolerance, folds=folds)
+        print_selection(selection)
+        metrics.update(cv_accuracy=next(row["cv_accuracy"] for row in selection["candidates"] if row["selected"]),
+                       model=selection["selected"])
+        reports[SELECTION_FILE] = selection
+    else:
+        # Train
+        pipeline = Pipeline([
+            ('scaler', StandardScaler()),
+            # Out-of-bag accuracy comes free with bagging and does not change the trees
+            ('clf', RandomForestClassifier(n_estimators=200, class_weight='balanced', oob_score=True, random_state=42))
+        ])
+
+        print(f"Training on {len(X)} samples with {X.shape[1]} features...")
+        pipeline.fit(X, y)
+        metrics["oob_accuracy"] = round(float(pipeline.named_steps['clf'].oob_score_), 4)
+    # The API refuses to serve an artifact under a profile it was not trained on
+    pipeline.feature_profile = profile
+    stage1 = train_stage1_model(X, y)
+
+    entry = model_registry.save_version(pipeline, {
+        "feature_profile": profile,
+        "n_features": int(X.shape[1]),
+        "extractor_version": profile_version(profile),
+        "metrics": metrics,
+    }, stage1=stage1, reports=reports)
+    print(f"Model saved successfully as version {entry.version} (Real Data, {profile} profile) in {entry.path}")
+
+def train_stage1_model(X, y):
+    """
+    Trains the cascade's first stage: a small forest on the cheap MFCC/delta
+    features only, used at serving time to skip HPSS and pitch tracking when it
+    is confident (see CASCADE_THRESHOLD). Saved alongside the model's registry version.
+    """
+    stage1 = Pipeline([
         ('scaler', StandardScaler()),
-        ('clf', RandomForestClassifier(n_estimators=200, class_weight='balanced', random_state=42))
+        ('clf', RandomForestClassifier(n_estimators=50, max_depth=8, class_weight='balanced', random_state=42))
     ])
-    
-    print(f"Training on {len(X)} samples with {X.shape[1]} features...")
-    pipeline.fit(X, y)
-    
-    print(f"Saving model to {MODEL_PATH}...")
-    joblib.dump(pipeline, MODEL_PATH)
-    print("Model saved successfully (Real Data).")
+    print(f"Training cascade first stage on {CHEAP_FEATURE_COUNT} cheap features...")
+    stage1.fit(X[:, :CHEAP_FEATURE_COUNT], y)
+    stage1.cascade_stage = 1
+    return stage1
 
 def train_dummy_model():
     print("Generating synthetic data for prototype...")
@@ -116,4 +160,19 @@ def train_dummy_model():
     print("Model saved successfully.")
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the AI voice detection model")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Feature extraction processes (default: one per CPU)")
+    parser.add_argument("--no-feature-store", action="store_true",
+                        help="Re-extract every file instead of reusing data/.feature_store")
+    parser.add_argument("--profile", choices=[*PROFILES, "all"], default="full",
+                        help="Feature profile to train a model for (default: full)")
+    parser.add_argument("--no-search", action="store_true",
+                        help="Train the fixed 200-tree forest instead of searching for the smallest accurate model")
+    parser.add_argument("--accuracy-tolerance", type=float, default=ACCURACY_TOLERANCE,
+                        help="Select the smallest model at most this far below the best CV accuracy (default: 0.01)")
+    parser.add_argument("--cv-folds", type=int, default=CV_FOLDS, help="Cross-validation folds for the search")
+    args = parser.parse_args()
+    profiles = PROFILES if args.profile == "all" else (args.profile,)
+    train_model(workers=args.workers, use_store=not args.no_feature_store, profiles=profiles,
+                search=not args.no_search, tolerance=args.accuracy_tolerance, folds=args.cv_folds)
@@ -4,14 +4,27 @@ import os
 if __name__ == "__main__":
     # Get port from environment variable (Railway sets this) or default to 8000
     port = int(os.environ.get("PORT", 8000))
-    print(f"Starting server on port {port}...")
-    
-    # Run uvicorn programmatically
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=port,
-        log_level="info",
-        proxy_headers=True,
-        forwarded_allow_ips="*"
-    )
+    # WEB_WORKERS > 1: preload the model once and fork workers that share it (see app/prefork.py)
+    workers = int(os.environ.get("WEB_WORKERS", 1))
+    print(f"Starting server on port {port} ({workers} worker{'s' if workers > 1 else ''})...")
+
+    if workers > 1:
+        from app.prefork import serve
+        serve(
+            "0.0.0.0",
+            port,
+            workers,
+            log_level="info",
+            proxy_headers=True,
+            forwarded_allow_ips="*"
+        )
+    else:
+        # Run uvicorn programmatically
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=port,
+            log_level="info",
+            proxy_headers=True,
+            forwarded_allow_ips="*"
+        )
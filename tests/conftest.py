@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import model_registry, pipeline
+from app.jobs import job_queue
+from app.cache import ResultCache
+from app.classifier import classifiers
+from app.fingerprint import FingerprintIndex
+from app.feature_extractor import DEFAULT_PROFILE, PROFILES
+from app.inference_pool import inference_pool
+
+VALID_KEY = "sk_test_123456789"
+TEST_AUDIO = os.path.join(os.path.dirname(__file__), "..", "test_audio.wav")
+
+
+@pytest.fixture
+def configure_service(monkeypatch):
+    """Sizes the global inference pool and gives the test empty result caches and fingerprint indexes (off unless sized)."""
+    def configure(workers=0, capacity=4, fingerprint_clips=0):
+        monkeypatch.setattr(inference_pool, "workers", workers)
+        monkeypatch.setattr(inference_pool, "capacity", capacity)
+        caches = {profile: ResultCache(disk_dir=None) for profile in PROFILES}
+        monkeypatch.setattr(pipeline, "result_caches", caches)
+        indexes = {profile: FingerprintIndex(max_entries=fingerprint_clips, disk_dir=None) for profile in PROFILES}
+        monkeypatch.setattr(pipeline, "fingerprint_indexes", indexes)
+        return caches[DEFAULT_PROFILE]
+    return configure
+
+
+@pytest.fixture(autouse=True)
+def isolated_model_registry(tmp_path, monkeypatch):
+    """Points the model registry at an empty directory, so tests serve the legacy artifacts."""
+    registry = tmp_path / "model_registry"
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", str(registry))
+    for classifier in classifiers.values():
+        # Availability is resolved once per classifier; resolve it again against this registry
+        monkeypatch.setattr(classifier, "_available", None)
+    return registry
+
+
+@pytest.fixture(autouse=True)
+def isolated_job_store(tmp_path, monkeypatch):
+    """Gives the job queue an empty store; the app's lifespan starts its workers in TestClient blocks."""
+    store = tmp_path / "jobs"
+    monkeypatch.setattr(job_queue, "directory", str(store))
+    return store
@@ -0,0 +1,86 @@
+"""
+In-process tests for the streamed NDJSON batch endpoint.
+"""
+import io
+import json
+import os
+import sys
+import tarfile
+import zipfile
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import batch_detection, main
+from conftest import TEST_AUDIO, VALID_KEY
+
+
+def read_lines(response):
+    return sorted((json.loads(line) for line in response.iter_lines() if line), key=lambda r: r["index"])
+
+
+def test_batch_streams_one_line_per_file(configure_service):
+    configure_service(workers=0, capacity=2)
+    with open(TEST_AUDIO, "rb") as f:
+        audio = f.read()
+    files = [
+        ("files", ("a.wav", audio, "audio/wav")),
+        ("files", ("broken.mp3", b"not audio", "audio/mpeg")),
+        ("files", ("b.wav", audio, "audio/wav")),
+    ]
+    with TestClient(main.app) as client:
+        response = client.post("/api/voice-detection/batch", files=files, headers={"x-api-key": VALID_KEY})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = read_lines(response)
+    assert [line["filename"] for line in lines] == ["a.wav", "broken.mp3", "b.wav"]
+    assert [line["status"] for line in lines] == ["success", "error", "success"]
+    assert lines[0]["classification"] == lines[2]["classification"]
+
+
+def test_batch_expands_archives(configure_service):
+    configure_service(workers=0, capacity=2)
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as archive:
+        archive.write(TEST_AUDIO, "clips/one.wav")
+        archive.write(TEST_AUDIO, "clips/two.wav")
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode="w:gz") as archive:
+        archive.add(TEST_AUDIO, "three.wav")
+
+    files = [
+        ("files", ("clips.zip", zip_buffer.getvalue(), "application/zip")),
+        ("files", ("more.tar.gz", tar_buffer.getvalue(), "application/gzip")),
+    ]
+    with TestClient(main.app) as client:
+        response = client.post("/api/voice-detection/batch", files=files, headers={"x-api-key": VALID_KEY})
+
+    lines = read_lines(response)
+    assert [line["filename"] for line in lines] == ["clips/one.wav", "clips/two.wav", "three.wav"]
+    assert all(line["status"] == "success" for line in lines)
+
+
+def test_batch_requires_files(configure_service):
+    configure_service()
+    with TestClient(main.app) as client:
+        response = client.post("/api/voice-detection/batch", data={"language": "English"},
+                               headers={"x-api-key": VALID_KEY})
+    assert response.status_code == 400
+
+
+def test_oversized_archive_members_are_not_inflated(configure_service, monkeypatch):
+    configure_service(workers=0, capacity=2)
+    monkeypatch.setattr(batch_detection, "BATCH_MAX_MEMBER_BYTES", os.path.getsize(TEST_AUDIO))
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.write(TEST_AUDIO, "clip.wav")
+        archive.writestr("bomb.wav", b"\0" * (os.path.getsize(TEST_AUDIO) + 1))
+
+    files = [("files", ("clips.zip", zip_buffer.getvalue(), "application/zip"))]
+    with TestClient(main.app) as client:
+        response = client.post("/api/voice-detection/batch", files=files, headers={"x-api-key": VALID_KEY})
+
+    lines = read_lines(response)
+    assert [line["status"] for line in lines] == ["success", "error"]
+    assert "larger than" in lines[1]["message"]
@@ -0,0 +1,89 @@
+"""
+Tests for the micro-batching scheduler in front of VoiceClassifier.
+"""
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.batching import MicroBatcher
+from app.classifier import classifier
+
+
+def test_concurrent_submissions_share_one_call():
+    calls = []
+
+    def score(X):
+        calls.append(len(X))
+        return [float(row.sum()) for row in X]
+
+    async def run():
+        batcher = MicroBatcher(score, max_size=8, max_wait_ms=50)
+        rows = [np.full(3, i, dtype=float) for i in range(5)]
+        results = await asyncio.gather(*(batcher.submit(r) for r in rows))
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert calls == [5]
+    assert results == [0.0, 3.0, 6.0, 9.0, 12.0]
+    assert batcher.stats()["batches"] == 1
+    assert batcher.stats()["mean_batch_size"] == 5
+
+
+def test_full_batch_flushes_without_waiting():
+    calls = []
+
+    def score(X):
+        calls.append(len(X))
+        return list(range(len(X)))
+
+    async def run():
+        batcher = MicroBatcher(score, max_size=2, max_wait_ms=10_000)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(np.zeros(2)) for _ in range(4))), timeout=5
+        )
+
+    asyncio.run(run())
+    assert calls == [2, 2]
+
+
+def test_scoring_errors_reach_every_caller():
+    def score(X):
+        raise RuntimeError("boom")
+
+    async def run():
+        batcher = MicroBatcher(score, max_size=4, max_wait_ms=1)
+        return await asyncio.gather(
+            *(batcher.submit(np.zeros(2)) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_predict_batch_matches_single_rows():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(6, 67)) * 50
+    batched = classifier.predict_batch(X)
+    single = [classifier.predict_batch(row.reshape(1, -1))[0] for row in X]
+    assert batched == single
+
+
+def test_options_are_passed_per_row():
+    calls = []
+
+    def score(X, options=None):
+        calls.append(options)
+        return [option for option in options or [None] * len(X)]
+
+    async def run():
+        batcher = MicroBatcher(score, max_size=8, max_wait_ms=50)
+        plain = await batcher.submit(np.zeros(2))
+        mixed = await asyncio.gather(batcher.submit(np.zeros(2), "full"), batcher.submit(np.zeros(2)))
+        return plain, mixed
+
+    plain, mixed = asyncio.run(run())
+    assert calls == [None, ["full", None]]
+    assert plain is None and mixed == ["full", None]
@@ -0,0 +1,26 @@
+"""
+Stage timing hooks and the benchmark's regression check.
+"""
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.feature_extractor import extract_features, STAGES
+from ml_tools.benchmark import compare
+from conftest import TEST_AUDIO
+
+
+def test_extract_features_reports_every_stage():
+    timings = {}
+    assert extract_features(TEST_AUDIO, timings=timings) is not None
+    assert set(timings) == set(STAGES) | {"audio_seconds"}
+    assert all(seconds >= 0 for seconds in timings.values())
+    assert timings["audio_seconds"] > 0
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"clips": {"10s": {"hpss": 100.0, "zcr": 0.5, "stft": 10.0}}}
+    results = {"clips": {"10s": {"hpss": 140.0, "zcr": 1.5, "stft": 11.0, "new_stage": 5.0}}}
+    regressions = compare(results, baseline, threshold=0.25, min_delta_ms=2.0)
+    # zcr tripled but by only 1 ms; stft is within the threshold; new stages have no baseline
+    assert regressions == [("10s", "hpss", 100.0, 140.0)]
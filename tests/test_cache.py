@@ -0,0 +1,50 @@
+"""
+Tests for the content-addressed result cache.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.cache import ResultCache
+
+RESULT = {"classification": "HUMAN", "confidence": 0.9, "explanation": "test"}
+
+
+def test_lru_eviction_and_counters():
+    cache = ResultCache(max_entries=2, ttl=0, disk_dir=None)
+    cache.put("a", "m1", RESULT)
+    cache.put("b", "m1", RESULT)
+    assert cache.get("a", "m1") == RESULT  # "a" is now most recent
+    cache.put("c", "m1", RESULT)           # evicts "b"
+    assert cache.get("b", "m1") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_ttl_expiry():
+    cache = ResultCache(max_entries=10, ttl=0.05, disk_dir=None)
+    cache.put("a", "m1", RESULT)
+    time.sleep(0.1)
+    assert cache.get("a", "m1") is None
+
+
+def test_model_change_invalidates(tmp_path):
+    cache = ResultCache(max_entries=10, ttl=0, disk_dir=str(tmp_path))
+    cache.put("a", "m1", RESULT)
+    assert cache.get("a", "m2") is None
+    # Another worker may still serve m1: its disk tier is kept until nobody writes to it
+    other_worker = ResultCache(max_entries=10, ttl=0, disk_dir=str(tmp_path))
+    assert other_worker.get("a", "m1") == RESULT
+
+    stale = time.time() - 2 * 3600
+    os.utime(tmp_path / "m1", (stale, stale))
+    cache.get("a", "m3")
+    assert not (tmp_path / "m1").exists()
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    ResultCache(max_entries=10, ttl=0, disk_dir=str(tmp_path)).put("a", "m1", RESULT)
+    restarted = ResultCache(max_entries=10, ttl=0, disk_dir=str(tmp_path))
+    assert restarted.get("a", "m1") == RESULT
+    assert restarted.stats()["disk_hits"] == 1
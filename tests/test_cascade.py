@@ -0,0 +1,62 @@
+"""
+Two-stage cascade: a confident first stage skips the expensive features.
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import classifier as classifier_module, main, pipeline
+from app.batching import MicroBatcher
+from app.classifier import VoiceClassifier, classifiers
+from app.feature_extractor import CHEAP_FEATURE_COUNT, FEATURE_NAMES, extract_features
+from conftest import TEST_AUDIO, VALID_KEY
+
+
+def cascade_classifier(tmp_path, monkeypatch, threshold):
+    rng = np.random.default_rng(0)
+    stage1 = Pipeline([('scaler', StandardScaler()), ('clf', RandomForestClassifier(n_estimators=5, random_state=0))])
+    stage1.fit(rng.normal(size=(40, CHEAP_FEATURE_COUNT)), np.arange(40) % 2)
+    stage1.cascade_stage = 1
+    path = str(tmp_path / "model_stage1.joblib")
+    joblib.dump(stage1, path)
+    monkeypatch.setattr(classifier_module, "STAGE1_MODEL_PATH", path)
+    monkeypatch.setattr(classifier_module, "CASCADE_THRESHOLD", threshold)
+    clf = VoiceClassifier()
+    assert clf.ensure_loaded() and clf.stage1 is not None
+    return clf
+
+
+def test_gate_stops_extraction_after_cheap_features(tmp_path, monkeypatch):
+    confident = cascade_classifier(tmp_path, monkeypatch, threshold=0.5)
+    timings = {}
+    features = extract_features(TEST_AUDIO, timings=timings, gate=confident.cascade_gate())
+    assert features.shape == (CHEAP_FEATURE_COUNT,)
+    assert "hpss" not in timings and "piptrack" not in timings
+    label, confidence, _ = confident.predict_batch(features.reshape(1, -1))[0]
+    assert label in ("AI_GENERATED", "HUMAN") and confidence >= 0.5
+
+    # A threshold no first stage can reach always takes the full path
+    never = cascade_classifier(tmp_path, monkeypatch, threshold=1.01)
+    assert extract_features(TEST_AUDIO, gate=never.cascade_gate()).shape == (len(FEATURE_NAMES),)
+
+
+def test_api_reports_deciding_stage(configure_service, tmp_path, monkeypatch):
+    configure_service(workers=0)
+    clf = cascade_classifier(tmp_path, monkeypatch, threshold=0.5)
+    monkeypatch.setitem(classifiers, "full", clf)
+    monkeypatch.setitem(pipeline.batchers, "full", MicroBatcher(clf.score_batch))
+    with open(TEST_AUDIO, "rb") as f:
+        response = TestClient(main.app).post(
+            "/api/voice-detection",
+            files={"file": ("test.wav", f, "audio/wav")},
+            headers={"x-api-key": VALID_KEY},
+        )
+    assert response.status_code == 200
+    assert response.json()["cascadeStage"] == 1
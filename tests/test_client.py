@@ -0,0 +1,63 @@
+"""
+Bulk client: retries with backoff, incremental output and resume.
+"""
+import json
+import os
+import sys
+
+import asyncio
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import client
+
+
+def make_files(tmp_path, n):
+    audio = tmp_path / "audio"
+    audio.mkdir()
+    for i in range(n):
+        (audio / f"clip{i}.wav").write_bytes(b"RIFF" + bytes(i))
+    (audio / "notes.txt").write_text("not audio")
+    return client.collect_files(str(audio))
+
+
+def test_retries_then_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(client, "BACKOFF_SECONDS", 0.001)
+    paths = make_files(tmp_path, 4)
+    assert len(paths) == 4
+    calls = {}
+
+    def handler(request):
+        name = request.content.split(b'filename="')[1].split(b'"')[0].decode()
+        calls[name] = calls.get(name, 0) + 1
+        if name == "clip0.wav" and calls[name] == 1:
+            return httpx.Response(503, json={"status": "error", "message": "busy"}, headers={"Retry-After": "0"})
+        if name == "clip3.wav":
+            return httpx.Response(400, json={"status": "error", "message": "bad audio"})
+        return httpx.Response(200, json={"status": "success", "classification": "HUMAN", "modelVersion": "v1"})
+
+    output = str(tmp_path / "results.jsonl")
+    stats = asyncio.run(client.run_bulk(paths, output, concurrency=3, transport=httpx.MockTransport(handler)))
+    assert stats["succeeded"] == 3 and stats["failed"] == 1
+    rows = {json.loads(line)["path"]: json.loads(line) for line in open(output)}
+    clip0 = rows[paths[0]]
+    assert clip0["attempts"] == 2 and clip0["classification"] == "HUMAN" and "message" not in clip0
+    assert rows[paths[3]]["error"] == "bad audio"
+
+    # A re-run only sends the file that failed
+    stats = asyncio.run(client.run_bulk(paths, output, transport=httpx.MockTransport(handler)))
+    assert stats["skipped"] == 3 and stats["sent"] == 1
+    assert calls["clip1.wav"] == 1 and calls["clip3.wav"] == 2
+
+
+def test_csv_output_and_manifest(tmp_path):
+    paths = make_files(tmp_path, 2)
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# clips\naudio/clip0.wav\naudio/clip1.wav\n")
+    assert client.collect_files(str(manifest)) == paths
+
+    output = str(tmp_path / "results.csv")
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"classification": "AI_GENERATED"}))
+    asyncio.run(client.run_bulk(paths, output, transport=transport))
+    assert client.completed_paths(output) == set(paths)
+    assert open(output).readline().startswith("path,status_code")
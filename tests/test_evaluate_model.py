@@ -0,0 +1,42 @@
+"""
+Batched evaluation: quality metrics and the JSON report.
+"""
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_tools.evaluate_model import evaluate, quality_report
+from conftest import TEST_AUDIO
+
+
+def test_quality_report_metrics():
+    truths = np.array([1, 1, 1, 0, 0, 0])
+    human_prob = np.array([0.9, 0.8, 0.3, 0.6, 0.1, 0.2])
+    report = quality_report(truths, human_prob)
+    assert report["accuracy"] == 4 / 6
+    assert report["confusion_matrix"]["rows_true_cols_predicted"] == [[2, 1], [1, 2]]
+    assert report["per_class"]["HUMAN"]["recall"] == 2 / 3
+    assert report["roc_auc"] == pytest.approx(8 / 9)
+    assert sum(r["count"] for r in report["calibration"]["reliability"]) == 6
+    assert 0 < report["calibration"]["brier_score"] < 1
+
+
+def test_evaluate_writes_json_report(tmp_path):
+    for folder in ("human", "ai"):
+        (tmp_path / folder).mkdir()
+        shutil.copy(TEST_AUDIO, tmp_path / folder / "clip.wav")
+    output = tmp_path / "report.json"
+    report = evaluate("full", str(tmp_path), workers=1, use_store=False, output=str(output))
+
+    with open(output) as f:
+        saved = json.load(f)
+    assert saved["n_files"] == 2 and saved["model_version"] == report["model_version"]
+    # The same clip is in both classes, so exactly one is misclassified
+    assert saved["accuracy"] == 0.5 and len(saved["misclassified"]) == 1
+    assert saved["throughput"]["files_extracted"] == 2
+    assert saved["throughput"]["extract_ms_per_file"] > 0
@@ -0,0 +1,69 @@
+"""
+Opt-in explanations built from the forest's decision-path attributions.
+"""
+import os
+import sys
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import main
+from app.classifier import classifier
+from app.feature_extractor import FEATURE_NAMES
+from conftest import TEST_AUDIO, VALID_KEY
+
+
+def sample_rows(n=4):
+    classifier.ensure_loaded()
+    scaler = classifier.model.named_steps["scaler"]
+    return scaler.mean_ + scaler.scale_ * np.random.default_rng(7).normal(size=(n, len(FEATURE_NAMES)))
+
+
+def test_score_batch_explain_modes():
+    X = sample_rows()
+    none, summary, full = (classifier.score_batch(X, mode) for mode in ("none", "summary", "full"))
+    # The verdict never depends on the explanation detail
+    assert [r[:2] for r in none] == [r[:2] for r in summary] == [r[:2] for r in full]
+    assert all(r[2] is None and r[4] is None for r in none)
+    assert all(r[2] and r[4] is None for r in summary)
+    if classifier.engine is None:
+        return
+    for (label, confidence, _, _, detail), proba in zip(full, classifier.bundle.predict_proba(X)):
+        total = detail["base"] + sum(item["contribution"] for item in detail["features"])
+        assert abs(total - proba[1]) < 1e-9
+        contributions = [abs(item["contribution"]) for item in detail["features"]]
+        assert contributions == sorted(contributions, reverse=True)
+
+    # Modes can differ row by row within one call
+    mixed = classifier.score_batch(X[:2], ["none", "full"])
+    assert mixed[0][2] is None and mixed[1][4] is not None
+
+
+def test_api_explain_option(configure_service):
+    configure_service(workers=0)
+    client = TestClient(main.app)
+
+    def detect(explain=None):
+        data = {"explain": explain} if explain else {}
+        with open(TEST_AUDIO, "rb") as f:
+            return client.post("/api/voice-detection", files={"file": ("test.wav", f, "audio/wav")},
+                               data=data, headers={"x-api-key": VALID_KEY})
+
+    assert detect("verbose").status_code == 400
+
+    first = detect("none").json()
+    assert first["explanation"] is None and first["attributions"] is None
+    # A result cached without an explanation cannot answer a request for one
+    summary = detect().json()
+    assert summary["cached"] is False and summary["explanation"]
+    assert summary["attributions"] is None
+
+    full = detect("full").json()
+    assert full["cached"] is False
+    if classifier.engine is not None:
+        assert full["attributions"] and {"feature", "value", "contribution"} <= set(full["attributions"][0])
+        assert full["attributionBase"] is not None
+    # The detailed result now answers every mode
+    assert detect("summary").json()["cached"] is True
+    assert detect("none").json()["explanation"] is None
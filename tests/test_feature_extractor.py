@@ -0,0 +1,62 @@
+"""
+Parity checks for the shared-STFT feature extractor.
+The reference below is the original extractor, which ran a separate STFT per feature.
+"""
+import os
+import sys
+
+import librosa
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.feature_extractor import (
+    FEATURE_NAMES, PARITY_ATOL, PARITY_RTOL, SAMPLE_RATE,
+    compute_features, describe_extractor, extract_features,
+)
+
+TEST_AUDIO = os.path.join(os.path.dirname(__file__), "..", "test_audio.wav")
+
+
+def reference_features(y, sr):
+    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
+    mfcc_delta = librosa.feature.delta(mfccs)
+    cent = librosa.feature.spectral_centroid(y=y, sr=sr)
+    flatness = librosa.feature.spectral_flatness(y=y)
+    zcr = librosa.feature.zero_crossing_rate(y)
+    harmonic, percussive = librosa.effects.hpss(y)
+    pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
+    pitch_vals = pitches[magnitudes > np.mean(magnitudes)]
+    return np.hstack([
+        np.mean(mfccs, axis=1), np.var(mfccs, axis=1),
+        np.mean(mfcc_delta, axis=1),
+        np.mean(cent), np.var(cent),
+        np.mean(flatness),
+        np.mean(zcr), np.var(zcr),
+        np.mean(harmonic**2) / (np.mean(percussive**2) + 1e-6),
+        np.var(pitch_vals) if len(pitch_vals) > 0 else 0
+    ])
+
+
+def test_parity_on_test_audio():
+    y, sr = librosa.load(TEST_AUDIO, sr=SAMPLE_RATE)
+    np.testing.assert_allclose(
+        compute_features(y, sr), reference_features(y, sr), rtol=PARITY_RTOL, atol=PARITY_ATOL
+    )
+
+
+def test_parity_on_synthetic_voice():
+    rng = np.random.default_rng(0)
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    f0 = 140 + 10 * np.sin(2 * np.pi * 0.5 * t)
+    y = (0.4 * np.sin(2 * np.pi * np.cumsum(f0) / SAMPLE_RATE)
+         + 0.05 * rng.standard_normal(t.shape)).astype(np.float32)
+    np.testing.assert_allclose(
+        compute_features(y), reference_features(y, SAMPLE_RATE), rtol=PARITY_RTOL, atol=PARITY_ATOL
+    )
+
+
+def test_extract_features_reports_order():
+    features = extract_features(TEST_AUDIO)
+    info = describe_extractor()
+    assert features.shape == (len(FEATURE_NAMES),) == (info["n_features"],)
+    assert info["feature_names"] == FEATURE_NAMES
@@ -0,0 +1,75 @@
+"""
+Feature store: resumed runs reuse stored rows, changed files are re-extracted and a
+worker process that dies does not lose or poison the other files.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.feature_extractor import FEATURE_NAMES
+from ml_tools import feature_store
+from ml_tools.feature_store import FeatureStore, extract_many
+
+
+def fake_extract(path, profile):
+    """Stands in for extraction in the pool processes: crash.wav kills its worker, empty files fail."""
+    if os.path.basename(path) == "crash.wav":
+        os._exit(1)
+    size = os.path.getsize(path)
+    features = np.full(len(FEATURE_NAMES), float(size)) if size else None
+    return features, {"stft": 0.001}
+
+
+def make_clips(directory, names):
+    paths = []
+    for name in names:
+        path = directory / name
+        path.write_bytes(b"x" * 10)
+        paths.append(str(path))
+    return paths
+
+
+def test_resumes_and_reextracts_changed_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, "_extract_timed", fake_extract)
+    store_dir = str(tmp_path / "store")
+    paths = make_clips(tmp_path, ["a.wav", "b.wav", "c.wav"])
+    (tmp_path / "empty.wav").write_bytes(b"")
+    paths.append(str(tmp_path / "empty.wav"))
+
+    timings = {}
+    results = extract_many(paths, store_dir, workers=1, timings=timings)
+    assert sorted(timings) == sorted(paths)
+    assert results[paths[3]] is None and results[paths[0]][0] == 10
+    assert len(FeatureStore(store_dir)) == 3  # The failure is not stored
+
+    # Resumed: only the failed file runs again
+    timings = {}
+    results = extract_many(paths, store_dir, workers=1, timings=timings)
+    assert list(timings) == [paths[3]] and results[paths[1]][0] == 10
+
+    # A file that changed is re-extracted; the others still come from the store
+    with open(paths[1], "ab") as f:
+        f.write(b"more")
+    timings = {}
+    results = extract_many(paths[:3], store_dir, workers=1, timings=timings)
+    assert list(timings) == [paths[1]] and results[paths[1]][0] == 14
+
+
+def test_worker_crash_only_fails_the_crashing_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, "_extract_timed", fake_extract)
+    store_dir = str(tmp_path / "store")
+    paths = make_clips(tmp_path, ["a.wav", "b.wav", "crash.wav", "d.wav", "e.wav", "f.wav"])
+
+    results = extract_many(paths, store_dir, workers=2)
+    crashed = str(tmp_path / "crash.wav")
+    assert results[crashed] is None
+    assert all(results[p] is not None for p in paths if p != crashed)
+    assert len(FeatureStore(store_dir)) == 5
+
+    # The crash was not recorded, so the next run tries that file again
+    timings = {}
+    extract_many(paths, store_dir, workers=2, timings=timings)
+    assert list(timings) == []
+    assert len(FeatureStore(store_dir)) == 5
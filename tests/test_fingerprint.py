@@ -0,0 +1,113 @@
+"""
+Perceptual fingerprints: near-duplicate clips are answered from the index.
+"""
+import io
+import os
+import sys
+
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import main
+from app.fingerprint import FingerprintIndex, fingerprint_in_worker
+from conftest import VALID_KEY
+
+SR = 22050
+RESULT = {"classification": "HUMAN", "confidence": 0.9, "explanation": "test", "explain": "summary"}
+
+
+def voice_like(seed, seconds=8.0):
+    """A harmonic tone with a wandering pitch and syllable-like loudness, unique per seed."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SR)
+    t = np.arange(n) / SR
+    f0 = 120 + 40 * np.sin(2 * np.pi * rng.uniform(0.2, 0.6) * t + rng.uniform(0, 6))
+    phase = 2 * np.pi * np.cumsum(f0) / SR
+    y = sum(np.sin(k * phase) * rng.uniform(0.2, 1) / k for k in range(1, 25))
+    envelope = np.convolve(np.repeat(rng.uniform(0, 1, int(seconds * 5)) ** 2, SR // 5)[:n], np.ones(800) / 800, "same")
+    return (0.3 * y * envelope).astype(np.float32)
+
+
+def wav_bytes(y, sr=SR):
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format="WAV")
+    return buffer.getvalue()
+
+
+def test_matches_altered_copies_only():
+    index = FingerprintIndex(max_entries=10, disk_dir=None)
+    original = voice_like(0)
+    index.put("a", fingerprint_in_worker(wav_bytes(original)), "m1", RESULT)
+    index.put("b", fingerprint_in_worker(wav_bytes(voice_like(1))), "m1", RESULT)
+
+    quieter = original * 0.4
+    trimmed = original[int(1.37 * SR):]
+    noisy = original + np.random.default_rng(2).normal(0, original.std() / 30, len(original)).astype(np.float32)
+    for copy in (quieter, trimmed, noisy):
+        result, matched, similarity = index.lookup(fingerprint_in_worker(wav_bytes(copy)), "m1")
+        assert result == RESULT and matched == "a" and similarity >= index.similarity
+
+    assert index.lookup(fingerprint_in_worker(wav_bytes(voice_like(3))), "m1") is None
+    # Other models' verdicts and other budgets never match
+    assert index.lookup(fingerprint_in_worker(wav_bytes(quieter)), "m1", budget=5.0) is None
+    assert index.lookup(fingerprint_in_worker(wav_bytes(quieter)), "m2") is None
+
+
+def test_eviction_and_persistence(tmp_path):
+    prints = [fingerprint_in_worker(wav_bytes(voice_like(seed))) for seed in range(3)]
+    index = FingerprintIndex(max_entries=2, disk_dir=str(tmp_path))
+    for name, fingerprint in zip("abc", prints):
+        index.put(name, fingerprint, "m1", RESULT)
+    assert index.stats()["evictions"] == 1
+    assert index.lookup(prints[0], "m1") is None
+    assert sorted(os.listdir(tmp_path / "m1")) == ["b.json", "c.json"]
+
+    restarted = FingerprintIndex(max_entries=2, disk_dir=str(tmp_path))
+    assert restarted.lookup(prints[2], "m1")[1] == "c"
+    assert restarted.stats()["clips"] == 2
+
+
+def test_clips_sharing_only_a_section_do_not_match():
+    index = FingerprintIndex(max_entries=10, disk_dir=None)
+    intro = voice_like(5, seconds=4.0)
+    first = np.concatenate([intro, voice_like(6, seconds=16.0)])
+    second = np.concatenate([intro, voice_like(7, seconds=16.0)])
+    index.put("a", fingerprint_in_worker(wav_bytes(first)), "m1", RESULT)
+    assert index.lookup(fingerprint_in_worker(wav_bytes(second)), "m1") is None
+    # Nor does the shared section on its own, although all of it lines up
+    assert index.lookup(fingerprint_in_worker(wav_bytes(intro)), "m1") is None
+
+
+def test_api_answers_reencoded_copy(configure_service):
+    configure_service(workers=0, fingerprint_clips=100)
+    client = TestClient(main.app)
+    original = voice_like(4, seconds=4.0)
+
+    def detect(data, name):
+        return client.post("/api/voice-detection", files={"file": (name, data, "audio/wav")},
+                           headers={"x-api-key": VALID_KEY}).json()
+
+    first = detect(wav_bytes(original), "original.wav")
+    assert first["cached"] is False and first["matchedFingerprint"] is None
+    # Different bytes: a different sample rate and volume
+    import librosa
+    copy = librosa.resample(original * 0.5, orig_sr=SR, target_sr=16000)
+    second = detect(wav_bytes(copy, sr=16000), "copy.wav")
+    assert second["cached"] is True and second["matchedFingerprint"]
+    assert second["classification"] == first["classification"]
+    assert second["confidenceScore"] == first["confidenceScore"]
+
+
+def test_postings_budget_bounds_memory():
+    prints = [fingerprint_in_worker(wav_bytes(voice_like(seed))) for seed in range(4)]
+    per_clip = len(set(zip(*prints[0])))
+    index = FingerprintIndex(max_entries=100, disk_dir=None, max_postings=int(per_clip * 2.5))
+    for name, fingerprint in zip("abcd", prints):
+        index.put(name, fingerprint, "m1", RESULT)
+    stats = index.stats()
+    assert stats["clips"] == 2 and stats["postings"] <= index.max_postings
+    assert stats["memory_bytes"] <= 10 * 4 * per_clip * 1.5  # 10 bytes a landmark, evicted rows included
+    assert index.lookup(prints[0], "m1") is None
+    assert index.lookup(prints[3], "m1")[1] == "d"
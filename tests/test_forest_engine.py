@@ -0,0 +1,94 @@
+"""
+The compiled forest must reproduce sklearn's predict_proba bit for bit.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.classifier import MODEL_PATH, classifier
+from app.forest_engine import CompiledForest, _fold_thresholds
+
+
+def boundary_rows(pipeline, per_node=40):
+    """Rows that sit exactly on, and a few float32/float64 steps around, split thresholds."""
+    scaler, forest = pipeline.named_steps["scaler"], pipeline.named_steps["clf"]
+    rows = []
+    for estimator in forest.estimators_[:5]:
+        tree = estimator.tree_
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature < 0:
+                continue
+            z = np.float32(threshold)
+            for candidate in (np.nextafter(z, np.float32(-np.inf)), z, np.nextafter(z, np.float32(np.inf))):
+                x = float(candidate) * scaler.scale_[feature] + scaler.mean_[feature]
+                for step in range(-per_node // 2, per_node // 2):
+                    row = scaler.mean_.copy()
+                    row[feature] = x + step * np.spacing(x)
+                    rows.append(row)
+    return np.array(rows)
+
+
+def test_folded_thresholds_are_exact():
+    rng = np.random.default_rng(3)
+    threshold = rng.normal(size=500)
+    mean = rng.normal(scale=100, size=500)
+    scale = rng.uniform(0.01, 50, size=500)
+    folded = _fold_thresholds(threshold, mean, scale)
+
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32).astype(np.float64) <= threshold
+
+    assert goes_left(folded).all()
+    assert not goes_left(np.nextafter(folded, np.inf)).any()
+
+
+def test_matches_sklearn_on_random_pipeline():
+    rng = np.random.default_rng(4)
+    X = rng.normal(loc=5, scale=3, size=(400, 12))
+    y = (X[:, 0] + rng.normal(size=400) > 5).astype(int)
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+        ('clf', RandomForestClassifier(n_estimators=30, class_weight='balanced', random_state=0))
+    ]).fit(X, y)
+    engine = CompiledForest.from_pipeline(pipeline)
+
+    X_test = np.vstack([rng.normal(loc=5, scale=4, size=(500, 12)), boundary_rows(pipeline)])
+    assert np.array_equal(engine.predict_proba(X_test), pipeline.predict_proba(X_test))
+
+
+def test_matches_shipped_model():
+    if not os.path.exists(MODEL_PATH):
+        pytest.skip(f"No shipped model at {MODEL_PATH}")
+    assert classifier.ensure_loaded()
+    assert classifier.engine is not None, "the shipped model did not compile to a forest engine"
+    model = classifier.model
+    scaler = model.named_steps["scaler"]
+    rng = np.random.default_rng(5)
+    X = scaler.mean_ + scaler.scale_ * rng.normal(scale=2, size=(2000, len(scaler.mean_)))
+    X = np.vstack([X, boundary_rows(model, per_node=6)])
+    for batch in (X[:1], X[:8], X[:64], X):
+        assert np.array_equal(classifier.engine.predict_proba(batch), model.predict_proba(batch))
+
+
+def test_contributions_add_up_to_probability():
+    rng = np.random.default_rng(6)
+    X = rng.normal(loc=5, scale=3, size=(300, 8))
+    y = (X[:, 2] - X[:, 5] + rng.normal(size=300) > 0).astype(int)
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+        ('clf', RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0))
+    ]).fit(X, y)
+    engine = CompiledForest.from_pipeline(pipeline)
+
+    X_test = rng.normal(loc=5, scale=4, size=(50, 8))
+    bias, contributions = engine.contributions(X_test)
+    assert contributions.shape == X_test.shape
+    assert np.allclose(bias + contributions.sum(axis=1), engine.predict_proba(X_test)[:, 1])
+    # The informative features carry most of the attribution
+    assert set(np.argsort(-np.abs(contributions).sum(axis=0))[:2]) == {2, 5}
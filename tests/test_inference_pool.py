@@ -0,0 +1,67 @@
+"""
+In-process tests for the bounded inference pool and its 503 backpressure.
+"""
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import main
+from app.inference_pool import InferencePool, QueueFullError
+from conftest import TEST_AUDIO, VALID_KEY
+
+
+def test_admission_is_bounded():
+    pool = InferencePool(workers=0, capacity=1)
+    with pool.admit():
+        assert pool.stats()["queue_depth"] == 1
+        with pytest.raises(QueueFullError):
+            with pool.admit():
+                pass
+    assert pool.stats()["queue_depth"] == 0
+    assert pool.stats()["rejected"] == 1
+
+
+def test_full_queue_returns_503_with_retry_after(configure_service):
+    configure_service(workers=0, capacity=0)
+    with TestClient(main.app) as client, open(TEST_AUDIO, "rb") as f:
+        response = client.post(
+            "/api/voice-detection",
+            files={"file": ("test.wav", f, "audio/wav")},
+            headers={"x-api-key": VALID_KEY},
+        )
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert response.json()["status"] == "error"
+
+
+def test_detection_runs_in_pool(configure_service):
+    configure_service(workers=1, capacity=2)
+    with TestClient(main.app) as client, open(TEST_AUDIO, "rb") as f:
+        response = client.post(
+            "/api/voice-detection",
+            files={"file": ("test.wav", f, "audio/wav")},
+            headers={"x-api-key": VALID_KEY},
+        )
+        health = client.get("/health").json()
+    assert response.status_code == 200
+    assert response.json()["classification"] in ("AI_GENERATED", "HUMAN")
+    assert response.json()["decodePath"] == "memory"
+    assert health["inference"]["queue_depth"] == 0
+
+
+def test_resubmitted_clip_is_served_from_cache(configure_service):
+    configure_service(workers=0, capacity=2)
+    with TestClient(main.app) as client:
+        responses = []
+        for _ in range(2):
+            with open(TEST_AUDIO, "rb") as f:
+                responses.append(client.post(
+                    "/api/voice-detection",
+                    files={"file": ("test.wav", f, "audio/wav")},
+                    headers={"x-api-key": VALID_KEY},
+                ).json())
+    assert [r["cached"] for r in responses] == [False, True]
+    assert responses[0]["classification"] == responses[1]["classification"]
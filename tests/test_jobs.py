@@ -0,0 +1,169 @@
+"""
+Asynchronous job API: jobs are queued durably, deduplicated by content, leased to
+workers and reclaimed when a worker dies.
+"""
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import jobs, main
+from app.jobs import JobQueue, check_callback_url, job_queue
+from conftest import TEST_AUDIO, VALID_KEY
+
+
+def upload(data=b"RIFF audio", filename="clip.wav"):
+    return SimpleNamespace(filename=filename, file=io.BytesIO(data))
+
+
+def test_submissions_are_durable_and_deduplicated(tmp_path):
+    queue = JobQueue(directory=str(tmp_path), workers=0)
+    job, deduplicated = queue.submit(upload(), "hash-a", profile="full")
+    assert job["status"] == "queued" and not deduplicated
+    assert open(job["upload_path"], "rb").read() == b"RIFF audio"
+
+    same, deduplicated = queue.submit(upload(), "hash-a", profile="full")
+    assert deduplicated and same["id"] == job["id"]
+    other, deduplicated = queue.submit(upload(), "hash-a", profile="full", explain="full")
+    assert not deduplicated and other["id"] != job["id"]
+    assert len(os.listdir(tmp_path / "uploads")) == 2
+
+    # A new process sees the queue as it was left
+    restarted = JobQueue(directory=str(tmp_path), workers=0)
+    assert restarted.stats()["queued"] == 2
+    assert restarted.claim()["id"] == job["id"]
+
+    # A failed job does not answer resubmissions
+    assert restarted.finish(restarted.claim(), error="Bad audio")
+    retried, deduplicated = restarted.submit(upload(), "hash-a", profile="full", explain="full")
+    assert not deduplicated and retried["id"] != other["id"]
+
+
+def test_deduplication_respects_callbacks_and_model_version(tmp_path):
+    queue = JobQueue(directory=str(tmp_path), workers=0)
+    job, _ = queue.submit(upload(), "hash-a", callback_url="http://a.example/done", namespace="v1-ns")
+    # Another client's callback must fire too, so it gets its own job
+    other, deduplicated = queue.submit(upload(), "hash-a", callback_url="http://b.example/done", namespace="v1-ns")
+    assert not deduplicated and other["id"] != job["id"]
+
+    queue.finish(queue.claim(), {"status": "success"}, namespace="v1-ns")
+    same, deduplicated = queue.submit(upload(), "hash-a", callback_url="http://a.example/done", namespace="v1-ns")
+    assert deduplicated and same["id"] == job["id"]
+    # After a reload, the previous model's verdict is not reused
+    fresh, deduplicated = queue.submit(upload(), "hash-a", callback_url="http://a.example/done", namespace="v2-ns")
+    assert not deduplicated and fresh["id"] != job["id"]
+
+
+def test_callback_urls_must_be_public(monkeypatch):
+    for url in ["ftp://example.com/", "http://127.0.0.1:8000/admin", "http://localhost/", "http://10.1.2.3/",
+                "http://169.254.169.254/latest/meta-data", "http://[::1]/"]:
+        with pytest.raises(ValueError):
+            check_callback_url(url)
+    check_callback_url("https://93.184.216.34/hook")
+
+    monkeypatch.setattr(jobs, "CALLBACK_ALLOWED_HOSTS", {"hooks.internal"})
+    check_callback_url("http://hooks.internal/done")
+    with pytest.raises(ValueError, match="not allowed"):
+        check_callback_url("https://93.184.216.34/hook")
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(tmp_path, monkeypatch):
+    queue = JobQueue(directory=str(tmp_path), workers=0)
+    job, _ = queue.submit(upload(), "hash-a")
+    claimed = queue.claim()
+    assert claimed["status"] == "running" and claimed["attempts"] == 1
+    assert queue.claim() is None  # Leased to the first worker
+
+    # The worker died: its lease runs out and another worker picks the job up
+    queue._update(job["id"], leased_until=time.time() - 1)
+    reclaimed = queue.claim()
+    assert reclaimed["attempts"] == 2
+    assert queue.release(reclaimed)
+    assert queue.get(job["id"])["status"] == "queued" and queue.get(job["id"])["attempts"] == 1
+
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 2)
+    queue.claim()
+    queue._update(job["id"], leased_until=time.time() - 1)
+    assert queue.claim() is None
+    failed = queue.get(job["id"])
+    assert failed["status"] == "failed" and "2 attempts" in failed["error"]
+    assert not os.path.exists(failed["upload_path"])
+
+    stats = queue.stats()
+    assert stats["failed"] == 1 and stats["queued"] == 0 and stats["oldest_queued_seconds"] == 0.0
+
+
+def test_worker_that_lost_its_lease_cannot_touch_the_job(tmp_path):
+    queue = JobQueue(directory=str(tmp_path), workers=0)
+    job, _ = queue.submit(upload(), "hash-a")
+    stale = queue.claim()
+    queue._update(job["id"], leased_until=time.time() - 1)
+    current = queue.claim()
+    assert current["attempts"] == 2
+
+    # The first worker comes back: its heartbeat, release and outcome are all refused
+    assert not queue.renew(stale)
+    assert not queue.release(stale)
+    assert not queue.finish(stale, {"status": "success", "classification": "HUMAN"})
+    row = queue.get(job["id"])
+    assert row["status"] == "running" and row["result"] is None and row["attempts"] == 2
+    assert os.path.exists(row["upload_path"])
+
+    assert queue.renew(current)
+    assert queue.finish(current, {"status": "success", "classification": "AI_GENERATED"})
+    row = queue.get(job["id"])
+    assert row["status"] == "succeeded" and json.loads(row["result"])["classification"] == "AI_GENERATED"
+    assert not os.path.exists(row["upload_path"])
+
+
+def test_job_api_runs_job_and_calls_back(configure_service, monkeypatch):
+    configure_service(workers=0)
+    callbacks = []
+
+    def receive(request):
+        callbacks.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    monkeypatch.setattr(job_queue, "callback_transport", httpx.MockTransport(receive))
+    monkeypatch.setattr(jobs, "JOB_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(jobs, "CALLBACK_ALLOWED_HOSTS", {"example.com"})
+    with open(TEST_AUDIO, "rb") as f:
+        audio = f.read()
+
+    with TestClient(main.app) as client:
+        def submit(**data):
+            return client.post("/api/jobs", files={"file": ("test.wav", audio, "audio/wav")}, data=data,
+                               headers={"x-api-key": VALID_KEY})
+
+        assert submit(callback_url="ftp://example.com").status_code == 400
+        assert submit(callback_url="http://127.0.0.1/admin").status_code == 400
+        response = submit(callback_url="http://example.com/done")
+        assert response.status_code == 202
+        body = response.json()
+        assert body["jobStatus"] == "queued" and not body["deduplicated"]
+        assert body["statusUrl"].endswith(f"/api/jobs/{body['jobId']}")
+
+        deadline = time.time() + 60
+        while True:
+            status = client.get(f"/api/jobs/{body['jobId']}", headers={"x-api-key": VALID_KEY}).json()
+            if status["jobStatus"] in ("succeeded", "failed") and status["callbackStatus"] or time.time() > deadline:
+                break
+            time.sleep(0.1)
+
+        assert status["jobStatus"] == "succeeded" and status["attempts"] == 1
+        assert status["result"]["classification"] in ("AI_GENERATED", "HUMAN")
+        assert status["callbackStatus"] == "200"
+        assert callbacks[0]["jobId"] == body["jobId"] and callbacks[0]["result"] == status["result"]
+
+        again = submit(callback_url="http://example.com/done").json()
+        assert again["deduplicated"] and again["jobId"] == body["jobId"]
+        assert client.get("/api/jobs/missing", headers={"x-api-key": VALID_KEY}).status_code == 404
+        assert client.get(f"/api/jobs/{body['jobId']}").status_code == 401
+        assert client.get("/health").json()["jobs"]["succeeded"] == 1
@@ -0,0 +1,41 @@
+"""
+Load-test harness: level summaries, capacity, regression checks and process sampling.
+"""
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_tools.load_test import ProcessSampler, capacity, compare, summarize
+
+
+def level(concurrency, rps, p99, error_rate=0.0):
+    return {"concurrency": concurrency, "throughput_rps": rps, "p99_ms": p99, "error_rate": error_rate}
+
+
+def test_summarize_separates_errors_from_latency():
+    results = [(0.1 * i, 200) for i in range(1, 101)] + [(0.001, 503)] * 25
+    summary = summarize(results, elapsed=10.0, concurrency=4)
+    assert summary["throughput_rps"] == 10.0
+    assert summary["p50_ms"] == 5050.0
+    assert summary["error_rate"] == 0.2 and summary["errors"] == {"503": 25}
+
+
+def test_capacity_and_regressions():
+    curve = [level(1, 2.0, 500), level(2, 3.5, 900), level(4, 3.6, 2500), level(8, 3.0, 900, error_rate=0.1)]
+    assert capacity(curve, slo_ms=1000) == {"concurrency": 2, "throughput_rps": 3.5, "p99_ms": 900}
+    assert capacity(curve, slo_ms=100) is None
+
+    baseline = {"curves": {"clip": curve}}
+    slower = {"curves": {"clip": [level(1, 2.0, 500), level(2, 2.0, 900), level(4, 3.6, 4000)]}}
+    assert [(c, m) for _, c, m, _, _ in compare(slower, baseline)] == [(2, "throughput_rps"), (4, "p99_ms")]
+
+
+def test_sampler_reads_this_process():
+    sampler = ProcessSampler(os.getpid(), interval=0.01)
+    with sampler:
+        sum(i * i for i in range(200_000))
+    result = sampler.result()
+    if sampler.available:
+        assert result["rss_mb_peak"] > 10 and result["cpu_percent"] > 0
+    else:
+        assert result == {"rss_mb_peak": None, "cpu_percent": None}
@@ -0,0 +1,55 @@
+"""
+Prometheus exposition and the hot-path stage timings behind /metrics.
+"""
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import main
+from app.metrics import Metrics, Histogram
+from conftest import TEST_AUDIO, VALID_KEY
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Metrics()
+    histogram = Histogram(registry, "test_seconds", "Test", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "decode")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="decode",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="decode"} 3' in lines
+
+
+def test_disabled_registry_records_nothing():
+    registry = Metrics(enabled=False)
+    registry.requests.inc("/", "success", "200")
+    registry.observe_extraction({"decode": 0.1, "stft": 0.2, "audio_seconds": 3.0})
+    assert "voice_api_requests_total{" not in registry.render()
+    assert "voice_api_stage_duration_seconds_count" not in registry.render()
+
+
+def test_metrics_endpoint_reports_pipeline_stages(configure_service):
+    configure_service(workers=0, capacity=4)
+    with TestClient(main.app) as client, open(TEST_AUDIO, "rb") as f:
+        response = client.post(
+            "/api/voice-detection",
+            files={"file": ("test.wav", f, "audio/wav")},
+            headers={"x-api-key": VALID_KEY},
+        )
+        assert response.status_code == 200
+        body = client.get("/metrics").text
+
+    for stage in ("upload", "decode", "extract", "inference", "explanation"):
+        assert f'voice_api_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert 'voice_api_feature_stage_duration_seconds_count{stage="hpss"}' in body
+    assert 'voice_api_requests_total{endpoint="/api/voice-detection",outcome="success",status="200"}' in body
+    assert "voice_api_audio_duration_seconds_count" in body
+    assert "voice_api_upload_bytes_count" in body
+    # Running totals are counters, point-in-time readings gauges
+    assert "# TYPE voice_api_cache_misses_total counter" in body and "\nvoice_api_cache_misses_total " in body
+    assert "# TYPE voice_api_queue_rejected_total counter" in body
+    assert "# TYPE voice_api_queue_depth gauge" in body
@@ -0,0 +1,127 @@
+"""
+Versioned model registry and hot reload: a validated version is swapped in
+atomically and every response names the version that scored it.
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import auth, main, model_registry, pipeline
+from app.batching import MicroBatcher
+from app.classifier import MODEL_PATH, ModelReloadError, VoiceClassifier, classifiers
+from app.feature_extractor import FEATURE_NAMES, profile_version
+from conftest import TEST_AUDIO, VALID_KEY
+
+ADMIN_KEY = "admin_test_key"
+
+
+def register(version, model=None, **metadata):
+    model = model if model is not None else joblib.load(MODEL_PATH)
+    return model_registry.save_version(model, {
+        "version": version,
+        "feature_profile": "full",
+        "n_features": len(FEATURE_NAMES),
+        "extractor_version": profile_version("full"),
+        "metrics": {"oob_accuracy": 0.9},
+        **metadata,
+    })
+
+
+def test_registry_tracks_versions_and_pins():
+    register("v1", trained_at="2026-01-01T00:00:00Z")
+    register("v2", trained_at="2026-02-01T00:00:00Z")
+    assert [v.version for v in model_registry.list_versions("full")] == ["v1", "v2"]
+    assert model_registry.list_versions("fast") == []
+    assert model_registry.active_version("full").version == "v2"
+
+    model_registry.set_active("full", "v1")
+    assert model_registry.active_version("full").version == "v1"
+    with pytest.raises(ValueError):
+        register("v1")
+
+
+def test_reload_swaps_without_disturbing_captured_bundle():
+    clf = VoiceClassifier()
+    assert clf.ensure_loaded() and clf.model_version.startswith("legacy-")
+    in_flight = clf.bundle
+    X = np.random.default_rng(0).normal(size=(3, len(FEATURE_NAMES)))
+
+    register("v2")
+    clf.reload()
+    assert clf.model_version == "v2"
+    assert model_registry.active_version("full").version == "v2"
+    # A request that captured the old bundle finishes on it
+    assert {r[3] for r in clf.score_batch(X, bundle=in_flight)} == {in_flight.version}
+    assert {r[3] for r in clf.score_batch(X)} == {"v2"}
+    assert clf.cache_namespace.startswith("v2-")
+    assert clf.bundle_for(in_flight.version) is in_flight
+
+
+def test_invalid_version_is_rejected():
+    clf = VoiceClassifier()
+    clf.ensure_loaded()
+    serving = clf.model_version
+
+    narrow = Pipeline([('scaler', StandardScaler()), ('clf', RandomForestClassifier(n_estimators=3))])
+    narrow.fit(np.random.default_rng(0).normal(size=(20, 10)), np.arange(20) % 2)
+    register("bad", model=narrow)
+    with pytest.raises(ModelReloadError, match="features"):
+        clf.reload("bad")
+    with pytest.raises(ModelReloadError):
+        clf.reload("missing")
+    assert clf.model_version == serving
+
+
+def test_admin_reload_and_response_version(configure_service, monkeypatch):
+    configure_service(workers=0)
+    clf = VoiceClassifier()
+    monkeypatch.setitem(classifiers, "full", clf)
+    monkeypatch.setitem(pipeline.batchers, "full", MicroBatcher(clf.score_batch))
+    monkeypatch.setattr(auth, "ADMIN_API_KEYS", {ADMIN_KEY})
+    client = TestClient(main.app)
+
+    def detect():
+        with open(TEST_AUDIO, "rb") as f:
+            return client.post("/api/voice-detection", files={"file": ("test.wav", f, "audio/wav")},
+                               headers={"x-api-key": VALID_KEY}).json()
+
+    assert detect()["modelVersion"].startswith("legacy-")
+
+    register("v2")
+    assert client.post("/admin/models/reload", json={}).status_code == 401
+    assert client.post("/admin/models/reload", json={}, headers={"x-admin-key": "wrong"}).status_code == 403
+    response = client.post("/admin/models/reload", json={"version": "v2"}, headers={"x-admin-key": ADMIN_KEY})
+    assert response.status_code == 200
+    assert response.json()["modelVersion"] == "v2"
+    assert response.json()["previousVersion"].startswith("legacy-")
+
+    body = detect()
+    assert body["modelVersion"] == "v2" and body["cached"] is False
+    listing = client.get("/admin/models", headers={"x-admin-key": ADMIN_KEY}).json()
+    assert listing["serving"]["full"] == "v2"
+    assert [v["version"] for v in listing["versions"]] == ["v2"]
+
+
+def test_versions_saved_together_do_not_collide():
+    model = joblib.load(MODEL_PATH)
+    saved = [model_registry.save_version(model, {"feature_profile": profile}) for profile in ("full", "fast", "full")]
+    assert len({entry.version for entry in saved}) == 3
+    assert saved[1].version.endswith("-fast")
+    assert [v.version for v in model_registry.list_versions("full")] == [saved[0].version, saved[2].version]
+
+
+def test_availability_is_not_read_per_request(monkeypatch):
+    clf = VoiceClassifier()
+    reads = []
+    real = model_registry.active_version
+    monkeypatch.setattr(model_registry, "active_version", lambda *a, **k: reads.append(a) or real(*a, **k))
+    assert all(clf.available() for _ in range(5))
+    assert len(reads) == 1
@@ -0,0 +1,51 @@
+"""
+Latency-aware model selection: the smallest model close enough to the best one wins.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import model_registry
+from ml_tools.model_selection import SELECTION_FILE, select_model
+
+
+def test_selects_smallest_within_tolerance():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(120, 6))
+    y = (X[:, 0] > 0).astype(int)
+    grid = [
+        ("big forest", RandomForestClassifier(n_estimators=60, random_state=0)),
+        ("small forest", RandomForestClassifier(n_estimators=5, max_depth=3, random_state=0)),
+        ("linear", LogisticRegression()),
+    ]
+    model, report = select_model(X, y, tolerance=0.05, folds=3, jobs=1, grid=grid)
+
+    rows = {row["name"]: row for row in report["candidates"]}
+    assert set(rows) == {"big forest", "small forest", "linear"}
+    assert rows["big forest"]["compiled"] and not rows["linear"]["compiled"]
+    eligible = [row for row in rows.values() if row["cv_accuracy"] >= report["best_cv_accuracy"] - 0.05]
+    assert rows[report["selected"]]["size_kb"] == min(row["size_kb"] for row in eligible)
+    assert rows[report["selected"]]["selected"] and sum(row["selected"] for row in rows.values()) == 1
+    # The most accurate candidate is always on the Pareto front
+    assert report["candidates"][0]["pareto"]
+    assert model.predict(X[:5]).shape == (5,)
+
+    # Without tolerance only the most accurate candidates qualify
+    _, strict = select_model(X, y, tolerance=0.0, folds=3, jobs=1, grid=grid)
+    assert next(r for r in strict["candidates"] if r["selected"])["cv_accuracy"] == strict["best_cv_accuracy"]
+
+
+def test_table_is_saved_with_the_version():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(40, 4))
+    y = np.arange(40) % 2
+    model, report = select_model(X, y, folds=2, jobs=1, grid=[("linear", LogisticRegression())])
+    entry = model_registry.save_version(model, {"feature_profile": "full"}, reports={SELECTION_FILE: report})
+    with open(os.path.join(entry.path, SELECTION_FILE)) as f:
+        assert json.load(f)["selected"] == "linear"
+    assert os.path.exists(entry.model_path)
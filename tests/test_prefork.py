@@ -0,0 +1,105 @@
+"""
+Pre-fork serving: CPU slices per worker, native thread caps, and the supervisor's
+respawn, crash-loop backoff, SIGHUP roll and stop paths (with stub workers).
+"""
+import os
+import signal
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import prefork
+from app.prefork import THREAD_LIMIT_VARS, cpu_slices, limit_threads
+
+
+def test_cpu_slices_are_disjoint_and_cover_every_cpu():
+    slices = cpu_slices(list(range(8)), 3)
+    assert [len(s) for s in slices] == [2, 3, 3]
+    assert sorted(c for s in slices for c in s) == list(range(8))
+    # More workers than CPUs: single cores, shared round-robin
+    assert cpu_slices([4, 5], 3) == [[4], [5], [4]]
+
+
+def test_limit_threads_keeps_explicit_settings(monkeypatch):
+    for name in THREAD_LIMIT_VARS:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("OMP_NUM_THREADS", "7")
+    limit_threads(2)
+    assert os.environ["OMP_NUM_THREADS"] == "7"
+    assert all(os.environ[name] == "2" for name in THREAD_LIMIT_VARS[1:])
+
+
+def crash_on_start(log_path):
+    def target(slot):
+        with open(log_path, "a") as f:
+            f.write(f"{slot} {time.monotonic()}\n")
+        os._exit(3)
+    return target
+
+
+def sleep_after_start(log_path):
+    def wrapped(slot):
+        with open(log_path, "a") as f:
+            f.write(f"{slot} {time.monotonic()}\n")
+        time.sleep(60)
+    return wrapped
+
+
+def supervisor(target):
+    return prefork.Supervisor(None, None, [[0], [0]], {}, target=target)
+
+
+def test_crash_loop_backs_off_and_gives_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(prefork, "SUPERVISE_INTERVAL", 0.01)
+    monkeypatch.setattr(prefork, "WORKER_RESPAWN_BACKOFF", 0.05)
+    monkeypatch.setattr(prefork, "WORKER_CRASH_LIMIT", 3)
+    log = tmp_path / "starts"
+
+    assert supervisor(crash_on_start(log)).run(2) is False
+    starts = [line.split() for line in log.read_text().splitlines()]
+    times = sorted(float(t) for slot, t in starts if slot == "0")
+    assert len(starts) == 6 and len(times) == 3
+    # 0.05 s, then 0.1 s between attempts
+    assert times[1] - times[0] >= 0.05 and times[2] - times[1] >= 0.1
+
+
+def test_respawn_roll_and_stop(tmp_path, monkeypatch):
+    monkeypatch.setattr(prefork, "SUPERVISE_INTERVAL", 0.01)
+    monkeypatch.setattr(prefork, "WORKER_RESPAWN_BACKOFF", 0.01)
+    monkeypatch.setattr(prefork, "reload_models", lambda: None)
+    log = tmp_path / "starts"
+    sup = supervisor(sleep_after_start(log))
+    seen = {}
+
+    def wait_for(condition):
+        deadline = time.monotonic() + 10
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def drive():
+        try:
+            assert wait_for(lambda: len(sup.children) == 2)
+            seen["first"] = dict(sup.children)
+            crashed = next(pid for pid, slot in seen["first"].items() if slot == 0)
+            os.kill(crashed, signal.SIGKILL)
+            assert wait_for(lambda: crashed not in sup.children and len(sup.children) == 2)
+            seen["respawned"] = dict(sup.children)
+
+            os.kill(os.getpid(), signal.SIGHUP)
+            assert wait_for(lambda: not sup.retiring and len(sup.children) == 2
+                            and not set(sup.children) & set(seen["respawned"]))
+            seen["rolled"] = dict(sup.children)
+        finally:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    driver = threading.Thread(target=drive)
+    driver.start()
+    assert sup.run(2) is True
+    driver.join()
+
+    assert sorted(seen["respawned"].values()) == [0, 1] and sorted(seen["rolled"].values()) == [0, 1]
+    assert sup.crashes[0] == 1 and not sup.abandoned
+    assert not sup.children
+    assert len(log.read_text().splitlines()) == 5  # 2 started, 1 respawned, 2 rolled
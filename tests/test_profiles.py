@@ -0,0 +1,87 @@
+"""
+Feature profiles: the fast estimators, profile-tagged artifacts and per-request selection.
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import main, pipeline
+from app.batching import MicroBatcher
+from app.classifier import VoiceClassifier, classifiers
+from app.feature_extractor import FEATURE_NAMES, analyze_frames, extract_features, load_audio
+from conftest import TEST_AUDIO, VALID_KEY
+
+
+def post(client, **data):
+    with open(TEST_AUDIO, "rb") as f:
+        return client.post(
+            "/api/voice-detection",
+            files={"file": ("test.wav", f, "audio/wav")},
+            data=data,
+            headers={"x-api-key": VALID_KEY},
+        )
+
+
+def train_artifact(path, profile=None):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(40, len(FEATURE_NAMES)))
+    y = np.arange(40) % 2
+    model = Pipeline([('scaler', StandardScaler()), ('clf', RandomForestClassifier(n_estimators=5, random_state=0))])
+    model.fit(X, y)
+    if profile is not None:
+        model.feature_profile = profile
+    joblib.dump(model, path)
+    return path
+
+
+def test_fast_hnr_tracks_full_profile():
+    y, sr = load_audio(TEST_AUDIO)
+    full, fast = analyze_frames(y, sr, profile="full"), analyze_frames(y, sr, profile="fast")
+    for key in ("harmonic_power", "percussive_power"):
+        assert np.isclose(fast[key], full[key], rtol=0.05)
+    assert len(fast["pitch"]) > 0
+    # Everything outside the HNR and pitch stages is shared between profiles
+    assert np.array_equal(fast["mfcc"], full["mfcc"])
+
+
+def test_fast_features_have_the_same_layout():
+    features = extract_features(TEST_AUDIO, profile="fast")
+    assert features.shape == (len(FEATURE_NAMES),)
+    assert np.isfinite(features).all()
+
+
+def test_artifact_for_another_profile_is_refused(tmp_path):
+    clf = VoiceClassifier(train_artifact(str(tmp_path / "model_fast.joblib")), "fast")
+    assert not clf.ensure_loaded()
+    assert clf.state == "failed" and "full" in clf.error
+
+
+def test_unknown_or_untrained_profile_is_a_400(configure_service, monkeypatch):
+    configure_service(workers=0)
+    monkeypatch.setattr(classifiers["fast"], "model_path", "/nonexistent/model_fast.joblib")
+    client = TestClient(main.app)
+    assert post(client, profile="turbo").status_code == 400
+    response = post(client, profile="fast")
+    assert response.status_code == 400
+    assert "fast" in response.json()["message"]
+
+
+def test_request_selects_profile(configure_service, monkeypatch, tmp_path):
+    configure_service(workers=0)
+    fast = VoiceClassifier(train_artifact(str(tmp_path / "model_fast.joblib"), "fast"), "fast")
+    monkeypatch.setitem(classifiers, "fast", fast)
+    monkeypatch.setitem(pipeline.batchers, "fast", MicroBatcher(fast.score_batch))
+    client = TestClient(main.app)
+
+    assert post(client).json()["featureProfile"] == "full"
+    response = post(client, profile="fast")
+    assert response.status_code == 200
+    assert response.json()["featureProfile"] == "fast"
+    assert response.json()["classification"] in ("AI_GENERATED", "HUMAN")
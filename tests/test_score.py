@@ -0,0 +1,84 @@
+"""
+Offline bulk scoring: sharding, chunked output and resuming.
+"""
+import csv
+import glob
+import os
+import shutil
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.feature_extractor import FEATURE_NAMES
+from ml_tools import score as score_module
+from ml_tools.score import in_shard, input_files, parse_shard, score
+from conftest import TEST_AUDIO
+
+
+def read_rows(output_dir):
+    rows = []
+    for path in sorted(glob.glob(os.path.join(output_dir, "*.csv"))):
+        with open(path, newline="") as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+
+def test_shards_partition_the_inputs(tmp_path):
+    for i in range(20):
+        (tmp_path / f"clip_{i}.wav").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("not audio")
+    paths = input_files([str(tmp_path)])
+    assert len(paths) == 20
+    assert input_files([str(tmp_path / "clip_1*.wav")]) == [p for p in paths if "clip_1" in p]
+
+    shards = [[p for p in paths if in_shard(p, (i, 3))] for i in range(3)]
+    assert sorted(sum(shards, [])) == paths
+    assert parse_shard("2/3") == (2, 3)
+
+
+def test_scores_in_chunks_and_resumes(tmp_path):
+    audio_dir = tmp_path / "audio"
+    audio_dir.mkdir()
+    for i in range(3):
+        shutil.copy(TEST_AUDIO, audio_dir / f"clip_{i}.wav")
+    (audio_dir / "broken.wav").write_bytes(b"RIFF not really audio")
+    output = tmp_path / "scores"
+
+    summary = score([str(audio_dir)], str(output), workers=1, chunk_size=2)
+    assert (summary["scored"], summary["failed"], summary["chunks"]) == (3, 1, 2)
+    rows = read_rows(output)
+    assert len(rows) == 4
+    assert {r["classification"] for r in rows if r["status"] == "success"} <= {"AI_GENERATED", "HUMAN"}
+    assert [r["error"] for r in rows if r["path"].endswith("broken.wav")][0]
+    assert summary["stage_ms_per_file"]["stft"] > 0
+
+    # A killed job lost its last chunk: only those files are scored again
+    os.remove(sorted(glob.glob(str(output / "*.csv")))[0])
+    resumed = score([str(audio_dir)], str(output), workers=1, chunk_size=2)
+    assert resumed["skipped"] == 2 and resumed["scored"] + resumed["failed"] == 2
+    assert resumed["chunks"] == 2
+    assert sorted(r["path"] for r in read_rows(output)) == sorted(input_files([str(audio_dir)]))
+
+
+def crash_on_marker(path, profile, max_seconds=None):
+    if "crash" in os.path.basename(path):
+        os._exit(1)
+    return np.zeros(len(FEATURE_NAMES)), {"stft": 0.001}, None
+
+
+def test_worker_crash_is_retried_not_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(score_module, "extract_file", crash_on_marker)
+    audio_dir = tmp_path / "audio"
+    audio_dir.mkdir()
+    for name in ["a.wav", "b.wav", "crash.wav", "d.wav", "e.wav", "f.wav"]:
+        (audio_dir / name).write_bytes(b"")
+    output = tmp_path / "scores"
+
+    summary = score([str(audio_dir)], str(output), workers=2, chunk_size=100)
+    assert (summary["scored"], summary["failed"], summary["crashed"]) == (5, 0, 1)
+    rows = read_rows(output)
+    assert len(rows) == 5 and all(r["status"] == "success" for r in rows)
+
+    resumed = score([str(audio_dir)], str(output), workers=2, chunk_size=100)
+    assert (resumed["skipped"], resumed["crashed"]) == (5, 1)
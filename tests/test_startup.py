@@ -0,0 +1,42 @@
+"""
+Staged startup: the model loads lazily, /ready only reports 200 once warm, and
+importing the app does not import the audio stack.
+"""
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import main
+from app.classifier import VoiceClassifier
+
+
+def test_model_loads_on_first_use():
+    clf = VoiceClassifier()
+    assert clf.state == "not_loaded" and clf.model is None
+    assert clf.ensure_loaded()
+    assert clf.state == "loaded"
+    assert "model_load_ms" in clf.status()["timings"]
+
+
+def test_ready_reports_warm_instance(monkeypatch):
+    clf = VoiceClassifier()
+    monkeypatch.setattr(main, "classifier", clf)
+    # No lifespan here, so nothing starts the classifier in the background
+    client = TestClient(main.app)
+    assert client.get("/ready").status_code == 503
+    clf.startup(warmup=False)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["state"] == "ready"
+    assert response.json()["model_fingerprint"]
+
+
+def test_importing_the_app_defers_librosa():
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    code = ("import sys, app.main; "
+            "print(sorted(m for m in sys.modules if m.split('.')[0] == 'librosa' or m.startswith('scipy.ndimage')))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,109 @@
+"""
+Tests for bounded-memory segmented analysis of long recordings.
+"""
+import os
+import sys
+
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import main
+from app.feature_extractor import extract_features
+from app.streaming import (
+    RunningMoments, effective_budget, extract_segment_features, iter_segments, plan_windows
+)
+from conftest import VALID_KEY
+
+
+def write_voice(path, seconds, sr=44100):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    f0 = 140 + 10 * np.sin(2 * np.pi * 0.5 * t)
+    y = 0.4 * np.sin(2 * np.pi * np.cumsum(f0) / sr) + 0.05 * rng.standard_normal(t.shape)
+    sf.write(path, y.astype(np.float32), sr)
+    return path
+
+
+def test_running_moments_merge_matches_numpy():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=(3, 1000))
+    moments = RunningMoments(3)
+    for chunk in np.array_split(values, 7, axis=1):
+        moments.update(chunk)
+    np.testing.assert_allclose(moments.mean, values.mean(axis=1))
+    np.testing.assert_allclose(moments.var, values.var(axis=1))
+
+
+def test_segments_cover_the_recording(tmp_path):
+    path = write_voice(str(tmp_path / "long.wav"), 25.4)
+    bounds = [(start, end) for start, end, _, _ in iter_segments(path, 10)]
+    assert len(bounds) == 3 and bounds[0][0] == 0.0
+    assert all(abs((end - start) - 10) < 0.05 for start, end in bounds[:2])
+    assert all(a[1] == b[0] for a, b in zip(bounds, bounds[1:]))
+    assert abs(bounds[-1][1] - 25.4) < 1e-3
+
+    # A trailing piece shorter than MIN_SEGMENT_SECONDS is folded into the last segment
+    path = write_voice(str(tmp_path / "short_tail.wav"), 20.5)
+    assert len(list(iter_segments(path, 10))) == 2
+
+
+def test_aggregate_matches_full_extraction(tmp_path):
+    path = write_voice(str(tmp_path / "long.wav"), 25.4)
+    segments, aggregate, duration = extract_segment_features(path, 10)
+    full = extract_features(path)
+    assert len(segments) == 3
+    # Everything but pitch_variance (per-segment threshold) matches up to round-off
+    np.testing.assert_allclose(aggregate[:-1], full[:-1], rtol=1e-3, atol=1e-3)
+    np.testing.assert_allclose(aggregate[-1], full[-1], rtol=0.05)
+
+
+def test_segments_endpoint(configure_service, tmp_path):
+    configure_service(workers=0, capacity=2)
+    path = write_voice(str(tmp_path / "long.wav"), 12.5)
+    with TestClient(main.app) as client, open(path, "rb") as f:
+        response = client.post(
+            "/api/voice-detection/segments",
+            files={"file": ("long.wav", f, "audio/wav")},
+            data={"segment_seconds": "5"},
+            headers={"x-api-key": VALID_KEY},
+        )
+    body = response.json()
+    assert response.status_code == 200
+    assert len(body["segments"]) == 3
+    assert body["segments"][0]["start"] == 0.0 and body["segments"][-1]["end"] == 12.5
+    assert body["classification"] in ("AI_GENERATED", "HUMAN")
+    assert body["durationSeconds"] == 12.5
+
+
+def test_windows_are_spread_within_budget():
+    windows = plan_windows(600, 30)
+    assert sum(length for _, length in windows) == 30
+    assert windows[0][0] > 0 and windows[-1][0] + windows[-1][1] < 600
+    starts = [start for start, _ in windows]
+    assert np.allclose(np.diff(starts), 100)
+
+    # A request may lower the deployment ceiling but never raise it
+    assert effective_budget(10, ceiling=30) == 10
+    assert effective_budget(60, ceiling=30) == 30
+    assert effective_budget(None, ceiling=0) is None
+
+
+def test_budget_bounds_analyzed_audio(configure_service, tmp_path):
+    configure_service(workers=0, capacity=2)
+    path = write_voice(str(tmp_path / "long.wav"), 40)
+    with TestClient(main.app) as client:
+        bodies = []
+        for max_seconds in ("10", "60"):
+            with open(path, "rb") as f:
+                bodies.append(client.post(
+                    "/api/voice-detection",
+                    files={"file": ("long.wav", f, "audio/wav")},
+                    data={"max_seconds": max_seconds},
+                    headers={"x-api-key": VALID_KEY},
+                ).json())
+    assert bodies[0]["analyzedSeconds"] == 10.0
+    # A budget longer than the clip analyses all of it
+    assert bodies[1]["analyzedSeconds"] == 40.0
+    assert not bodies[1]["cached"]
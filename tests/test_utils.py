@@ -0,0 +1,38 @@
+"""
+Tests for upload handling: in-memory decoding vs. the temp-file fallback.
+"""
+import io
+import os
+import sys
+
+from fastapi import UploadFile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.feature_extractor import extract_features
+from app.utils import cleanup_file, load_upload
+
+TEST_AUDIO = os.path.join(os.path.dirname(__file__), "..", "test_audio.wav")
+
+
+def make_upload(data, filename):
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+def test_wav_is_decoded_in_memory():
+    with open(TEST_AUDIO, "rb") as f:
+        data = f.read()
+    source, decode_path = load_upload(make_upload(data, "clip.wav"))
+    assert decode_path == "memory"
+    assert source == data
+    assert (extract_features(source) == extract_features(TEST_AUDIO)).all()
+
+
+def test_other_formats_fall_back_to_temp_file():
+    data = b'\xFF\xFB\x90\x64\x00\x00\x00\x00\x00\x00\x00' * 100
+    source, decode_path = load_upload(make_upload(data, "clip.mp3"))
+    try:
+        assert decode_path == "tempfile"
+        with open(source, "rb") as f:
+            assert f.read() == data
+    finally:
+        cleanup_file(source)